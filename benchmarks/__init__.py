@@ -0,0 +1,8 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import os
+from src.logs import configure_logging
+
+configure_logging(level=os.getenv("LOG_LEVEL"))
@@ -0,0 +1,173 @@
+"""End-to-end Conductor benchmark against the local mock Assistants API."""
+
+import json, time, argparse, threading
+from typing import override
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
+from src.tool import Tool
+from src.conductor import Conductor, StreamHandler
+from src.agent.config import AgentConfiguration, RunConfiguration
+from .mock_server import MockAssistantsServer, SCENARIOS
+from .stats import summarize
+
+agent_config = AgentConfiguration(
+    assistant_id="asst_mock",
+    instructions="You are a benchmark.",
+    model="gpt-4o",
+    temperature=1.0,
+)
+run_config = RunConfiguration(instructions=None, parallel_tool_calls=True)
+
+
+class Echo(Tool):
+
+    @override
+    @classmethod
+    def name(self) -> str:
+        return "echo"
+
+    @override
+    @property
+    def obj(self) -> dict:
+        return {
+            "name": Echo.name(),
+            "description": "Echoes its input.",
+            "strict": True,
+            "parameters": {
+                "type": "object",
+                "properties": {"value": {"type": "string"}},
+                "additionalProperties": False,
+                "required": ["value"],
+            },
+        }
+
+    @override
+    def call(self, args: dict) -> str:
+        return args["value"]
+
+
+class TimingHandler(StreamHandler):
+
+    def __init__(self):
+        self.started_at = None
+        self.first_token_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+
+    @override
+    def on_text_changed(self, delta: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+
+def run_session(client: OpenAI, turns: int, samples: dict, lock: threading.Lock):
+    handler = TimingHandler()
+    conductor = Conductor(client=client, config=agent_config, stream_handler=handler)
+    conductor.registry.add_tool(Echo())
+
+    for _ in range(turns):
+        handler.start()
+        conductor.add_message(text="Hello")
+        conductor.run(config=run_config)
+        finished = time.perf_counter()
+
+        with lock:
+            samples["turn"].append(finished - handler.started_at)
+            samples["api_requests"].append(conductor.api_requests)
+            if handler.first_token_at:
+                samples["ttft"].append(handler.first_token_at - handler.started_at)
+
+
+def benchmark(server: MockAssistantsServer, sessions: int, turns: int) -> dict:
+    client = OpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+    samples = {"turn": [], "ttft": [], "api_requests": []}
+    lock = threading.Lock()
+    server.reset_stats()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [
+            pool.submit(run_session, client, turns, samples, lock)
+            for _ in range(sessions)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    total_turns = len(samples["turn"])
+    return {
+        "scenario": server.scenario.name,
+        "sessions": sessions,
+        "turns": total_turns,
+        "turns_per_second": total_turns / elapsed if elapsed else 0.0,
+        "ttft": summarize(samples["ttft"]),
+        "turn": summarize(samples["turn"]),
+        "tool_round_trip": summarize(server.tool_round_trips),
+        "api_requests_per_turn": (
+            sum(samples["api_requests"]) / total_turns if total_turns else 0.0
+        ),
+        "server_requests_per_turn": (
+            len(server.requests) / total_turns if total_turns else 0.0
+        ),
+    }
+
+
+def report(result: dict):
+    ms = lambda s: f"{s * 1000:8.2f}"
+    print(
+        f"{result['scenario']:<11} {result['sessions']:>4} "
+        f"{result['turns_per_second']:>9.1f} "
+        f"{ms(result['ttft']['p50'])} {ms(result['ttft']['p95'])} "
+        f"{ms(result['turn']['p50'])} {ms(result['turn']['p95'])} "
+        f"{ms(result['tool_round_trip']['p50'])} "
+        f"{result['api_requests_per_turn']:>7.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenario", nargs="*", default=list(SCENARIOS.keys()))
+    parser.add_argument("--sessions", nargs="*", type=int, default=[1, 10, 100])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Simulated server latency per request, in seconds.",
+    )
+    parser.add_argument(
+        "--delta-interval",
+        type=float,
+        default=0.0,
+        help="Delay between streamed text deltas, in seconds.",
+    )
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'scenario':<11} {'sess':>4} {'turns/s':>9} "
+        f"{'ttft p50':>8} {'ttft p95':>8} {'turn p50':>8} {'turn p95':>8} "
+        f"{'tool rt':>8} {'req/turn':>7}"
+    )
+    for name in args.scenario:
+        server = MockAssistantsServer(
+            scenario=SCENARIOS[name],
+            latency=args.latency,
+            delta_interval=args.delta_interval,
+        )
+        with server:
+            for sessions in args.sessions:
+                result = benchmark(server, sessions=sessions, turns=args.turns)
+                results.append(result)
+                report(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
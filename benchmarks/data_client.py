@@ -0,0 +1,176 @@
+"""Throughput of the sync DataClient against the AsyncDataClient on a local stub API."""
+
+import json, time, asyncio, argparse, threading, logging
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.tools.api import (
+    Provider,
+    DataClient,
+    AsyncDataClient,
+    CacheConfig,
+    CacheBackend,
+    RateLimitConfig,
+)
+from src.tools.api.session import async_client_pool
+from .stats import summarize
+
+Log = logging.getLogger("StubApi")
+
+
+class Server(ThreadingHTTPServer):
+
+    daemon_threads = True
+    # Read when the socket starts listening, so it must be set on the class.
+    request_queue_size = 1024
+
+
+class StubApi:
+    """
+    Serves a JSON array of `items` objects for any GET path, after `latency`.
+    """
+
+    def __init__(self, latency: float = 0.0, items: int = 30, port: int = 0):
+        body = json.dumps(
+            [{"sha": f"{i:040x}", "message": "Commit message"} for i in range(items)]
+        ).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if latency:
+                    time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                Log.debug(format % args)
+
+        self.httpd = Server(("127.0.0.1", port), Handler)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubApi":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def provider(base_url: str, concurrency: int) -> Provider:
+    # Every request goes to the stub: no cache, no throttling.
+    return Provider(
+        id="stub",
+        name="Stub",
+        auth_config=None,
+        endpoint=base_url,
+        headers={},
+        cache_config=CacheConfig(backend=CacheBackend.NONE),
+        rate_limit=RateLimitConfig(rate=1e9, burst=1_000_000),
+        client_config={"pool_maxsize": concurrency},
+    )
+
+
+def run_sync(base_url: str, requests: int, concurrency: int) -> dict:
+    client = DataClient(provider(base_url, concurrency))
+    latencies = []
+
+    def fetch(i: int):
+        started = time.perf_counter()
+        client.get(path=f"/items/{i}")
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fetch, range(requests)))
+    return _result("sync", requests, concurrency, started, latencies)
+
+
+async def run_async(base_url: str, requests: int, concurrency: int) -> dict:
+    client = AsyncDataClient(provider(base_url, concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def fetch(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.get(path=f"/items/{i}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[fetch(i) for i in range(requests)])
+    result = _result("async", requests, concurrency, started, latencies)
+    await async_client_pool.aclose()
+    return result
+
+
+def _result(
+    client: str, requests: int, concurrency: int, started: float, latencies: list
+) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "client": client,
+        "concurrency": concurrency,
+        "requests": requests,
+        "requests_per_second": requests / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies),
+    }
+
+
+def report(result: dict):
+    ms = lambda s: f"{s * 1000:8.2f}"
+    print(
+        f"{result['client']:<6} {result['concurrency']:>5} "
+        f"{result['requests_per_second']:>9.1f} "
+        f"{ms(result['latency']['p50'])} {ms(result['latency']['p95'])} "
+        f"{ms(result['latency']['p99'])}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", nargs="*", type=int, default=[1, 10, 50])
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.02,
+        help="Simulated server latency per request, in seconds.",
+    )
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'client':<6} {'conc':>5} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    with StubApi(latency=args.latency) as api:
+        for concurrency in args.concurrency:
+            for result in (
+                run_sync(api.base_url, args.requests, concurrency),
+                asyncio.run(run_async(api.base_url, args.requests, concurrency)),
+            ):
+                results.append(result)
+                report(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Per-turn overhead of logging large payloads, against the local mock Assistants API."""
+
+import os, json, time, logging, argparse, tempfile
+from typing import override
+from openai import OpenAI
+from src.conductor import Conductor, StreamHandler
+from src.logs import configure_logging
+from .conductor import agent_config, run_config, Echo
+from .mock_server import MockAssistantsServer, SCENARIOS
+from .stats import summarize
+
+MODES = ["off", "sync", "queue"]
+"""
+`off` logs at the default WARNING level, `sync` at INFO with a handler on the
+root logger, as `logging.basicConfig` sets up, and `queue` at INFO through
+`configure_logging`.
+"""
+
+
+class Blob(Echo):
+    """
+    Echoes its input `size` times, standing in for a tool with a large output.
+    """
+
+    size = 1_000_000
+
+    @override
+    def call(self, args: dict) -> str:
+        return args["value"] * self.size
+
+
+def benchmark(server: MockAssistantsServer, mode: str, turns: int, path: str) -> dict:
+    _install(mode, path)
+    client = OpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+    conductor = Conductor(
+        client=client,
+        config=agent_config,
+        stream_handler=StreamHandler(),
+        # Submitted as they are, so the whole output reaches the log calls.
+        output_budget=None,
+    )
+    conductor.registry.add_tool(Blob())
+
+    samples = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        conductor.add_message(text="Hello")
+        conductor.run(config=run_config)
+        samples.append(time.perf_counter() - started)
+
+    _install("off", path)
+    return {"mode": mode, "turn": summarize(samples)}
+
+
+def _install(mode: str, path: str):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(logging.WARNING)
+
+    if mode == "sync":
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    elif mode == "queue":
+        configure_logging(level=logging.INFO, handler=logging.FileHandler(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", nargs="*", choices=MODES, default=MODES)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument(
+        "--size", type=int, default=Blob.size, help="Characters of tool output."
+    )
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+    Blob.size = args.size
+
+    results = []
+    print(f"{'mode':<6} {'turn p50':>8} {'turn p95':>8} {'mean':>8}")
+    with MockAssistantsServer(scenario=SCENARIOS["tool"]) as server:
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in args.mode:
+                path = os.path.join(directory, f"{mode}.log")
+                result = benchmark(server, mode, args.turns, path)
+                results.append(result)
+                turn = result["turn"]
+                print(
+                    f"{mode:<6} {turn['p50'] * 1000:8.2f} "
+                    f"{turn['p95'] * 1000:8.2f} {turn['mean'] * 1000:8.2f}"
+                )
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
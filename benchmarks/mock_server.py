@@ -0,0 +1,451 @@
+import json, time, uuid, logging, threading
+from typing import Optional
+from pydantic import BaseModel
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__all__ = [
+    "MockAssistantsServer",
+    "Scenario",
+    "TextStep",
+    "ToolStep",
+    "SCENARIOS",
+]
+
+Log = logging.getLogger("MockAssistantsServer")
+
+
+class TextStep(BaseModel):
+
+    deltas: list[str]
+
+
+class ToolStep(BaseModel):
+
+    tool_calls: list[tuple[str, dict]]
+    """
+    (name, arguments) pairs the run asks the client to execute.
+    """
+
+
+class Scenario(BaseModel):
+
+    name: str
+    steps: list[TextStep | ToolStep]
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "text": Scenario(
+        name="text",
+        steps=[TextStep(deltas=["Hello", ",", " world", "!"] * 8)],
+    ),
+    "tool": Scenario(
+        name="tool",
+        steps=[
+            ToolStep(tool_calls=[("echo", {"value": "a"})]),
+            TextStep(deltas=["Done", "."]),
+        ],
+    ),
+    "multi_step": Scenario(
+        name="multi_step",
+        steps=[
+            ToolStep(tool_calls=[("echo", {"value": "a"}), ("echo", {"value": "b"})]),
+            ToolStep(tool_calls=[("echo", {"value": "c"})]),
+            TextStep(deltas=["All", " steps", " done", "."]),
+        ],
+    ),
+}
+
+
+class RunState:
+
+    def __init__(self, run_id: str, thread_id: str, scenario: Scenario):
+        self.run_id = run_id
+        self.thread_id = thread_id
+        self.scenario = scenario
+        self.step = 0
+        self.status = "queued"
+        self.requires_action_at: Optional[float] = None
+
+
+class MockAssistantsServer:
+    """
+    A local stand-in for the Assistants threads/messages/runs API. Runs stream
+    scripted text deltas and tool calls over SSE so the client hot path can be
+    measured without spending real OpenAI calls.
+    """
+
+    def __init__(
+        self,
+        scenario: Scenario = SCENARIOS["text"],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        delta_interval: float = 0.0,
+    ):
+        self.scenario = scenario
+        self.latency = latency
+        self.delta_interval = delta_interval
+        self.runs: dict[str, RunState] = {}
+        self.files: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.requests: list[tuple[str, str]] = []
+        self.tool_round_trips: list[float] = []
+
+        server = self
+
+        class Handler(MockRequestHandler):
+            mock = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockAssistantsServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        Log.info(f"Mock Assistants API listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = []
+            self.tool_round_trips = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    mock: MockAssistantsServer = None
+
+    def log_message(self, format, *args):
+        Log.debug(format % args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        path = self.path.split("?")[0].rstrip("/")
+        parts = path.split("/")[2:]  # drop "", "v1"
+
+        with self.mock.lock:
+            self.mock.requests.append((method, path))
+
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+
+        # /threads
+        if parts == ["threads"] and method == "POST":
+            return self._json(_thread(_id("thread")))
+
+        # /threads/{thread_id}
+        if len(parts) == 2 and parts[0] == "threads" and method == "DELETE":
+            return self._json(
+                {"id": parts[1], "object": "thread.deleted", "deleted": True}
+            )
+
+        # /threads/runs
+        if parts == ["threads", "runs"] and method == "POST":
+            run = RunState(_id("run"), _id("thread"), self.mock.scenario)
+            with self.mock.lock:
+                self.mock.runs[run.run_id] = run
+            return self._stream_run(run, created=True, thread_created=True)
+
+        # /files
+        if parts == ["files"] and method == "POST":
+            file = {
+                "id": _id("file"),
+                "object": "file",
+                "bytes": length,
+                "created_at": _now(),
+                "filename": "upload",
+                "purpose": "assistants",
+                "status": "processed",
+            }
+            with self.mock.lock:
+                self.mock.files[file["id"]] = file
+            return self._json(file)
+
+        # /files/{file_id}
+        if len(parts) == 2 and parts[0] == "files":
+            with self.mock.lock:
+                file = (
+                    self.mock.files.pop(parts[1], None)
+                    if method == "DELETE"
+                    else self.mock.files.get(parts[1])
+                )
+            if not file:
+                return self._json({"error": {"message": "No such file."}}, 404)
+            if method == "DELETE":
+                return self._json({"id": file["id"], "object": "file", "deleted": True})
+            return self._json(file)
+
+        if len(parts) >= 3 and parts[0] == "threads":
+            thread_id = parts[1]
+
+            # /threads/{thread_id}/messages
+            if parts[2:] == ["messages"] and method == "POST":
+                return self._json(_message(_id("msg"), thread_id, "user", "completed"))
+
+            # /threads/{thread_id}/runs
+            if parts[2:] == ["runs"] and method == "POST":
+                run = RunState(_id("run"), thread_id, self.mock.scenario)
+                with self.mock.lock:
+                    self.mock.runs[run.run_id] = run
+                return self._stream_run(run, created=True)
+
+            if len(parts) >= 4 and parts[2] == "runs":
+                run = self.mock.runs.get(parts[3])
+                if not run:
+                    return self._json({"error": {"message": "Run not found."}}, 404)
+
+                # /threads/{thread_id}/runs/{run_id}
+                if len(parts) == 4 and method == "GET":
+                    return self._json(_run(run))
+
+                # /threads/{thread_id}/runs/{run_id}/submit_tool_outputs
+                if parts[4:] == ["submit_tool_outputs"] and method == "POST":
+                    if run.requires_action_at:
+                        with self.mock.lock:
+                            self.mock.tool_round_trips.append(
+                                time.perf_counter() - run.requires_action_at
+                            )
+                        run.requires_action_at = None
+                    run.step += 1
+                    return self._stream_run(run, created=False)
+
+                # /threads/{thread_id}/runs/{run_id}/cancel
+                if parts[4:] == ["cancel"] and method == "POST":
+                    run.status = "cancelled"
+                    return self._json(_run(run))
+
+        self._json({"error": {"message": f"Unknown route {method} {path}"}}, 404)
+
+    # Mark: - Responses
+
+    def _json(self, data: dict, status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_run(self, run: RunState, created: bool, thread_created: bool = False):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        if thread_created:
+            self._event("thread.created", _thread(run.thread_id))
+        if created:
+            self._event("thread.run.created", _run(run))
+        run.status = "in_progress"
+        self._event("thread.run.in_progress", _run(run))
+
+        steps = run.scenario.steps
+        while run.step < len(steps):
+            step = steps[run.step]
+            step_id = _id("step")
+
+            if isinstance(step, ToolStep):
+                tool_calls = [
+                    {
+                        "id": _id("call"),
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(args)},
+                    }
+                    for name, args in step.tool_calls
+                ]
+                self._event(
+                    "thread.run.step.created", _step(step_id, run, "tool_calls")
+                )
+                for index, tool_call in enumerate(tool_calls):
+                    self._event(
+                        "thread.run.step.delta",
+                        {
+                            "id": step_id,
+                            "object": "thread.run.step.delta",
+                            "delta": {
+                                "step_details": {
+                                    "type": "tool_calls",
+                                    "tool_calls": [{"index": index, **tool_call}],
+                                }
+                            },
+                        },
+                    )
+                run.status = "requires_action"
+                self._event("thread.run.requires_action", _run(run, tool_calls))
+                run.requires_action_at = time.perf_counter()
+                return self._end()
+
+            message_id = _id("msg")
+            self._event(
+                "thread.run.step.created",
+                _step(step_id, run, "message_creation", message_id),
+            )
+            message = _message(message_id, run.thread_id, "assistant", "in_progress")
+            self._event("thread.message.created", message)
+            for delta in step.deltas:
+                if self.mock.delta_interval:
+                    time.sleep(self.mock.delta_interval)
+                self._event(
+                    "thread.message.delta",
+                    {
+                        "id": message_id,
+                        "object": "thread.message.delta",
+                        "delta": {
+                            "content": [
+                                {
+                                    "index": 0,
+                                    "type": "text",
+                                    "text": {"value": delta, "annotations": []},
+                                }
+                            ]
+                        },
+                    },
+                )
+            message["status"] = "completed"
+            message["content"] = [
+                {
+                    "type": "text",
+                    "text": {"value": "".join(step.deltas), "annotations": []},
+                }
+            ]
+            self._event("thread.message.completed", message)
+            self._event(
+                "thread.run.step.completed",
+                _step(step_id, run, "message_creation", message_id, status="completed"),
+            )
+            run.step += 1
+
+        run.status = "completed"
+        self._event("thread.run.completed", _run(run))
+        self._end()
+
+    def _event(self, name: str, data: dict):
+        self._chunk(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+
+    def _end(self):
+        self._chunk(b"event: done\ndata: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+# Mark: - Payloads
+
+
+def _id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def _thread(thread_id: str) -> dict:
+    return {
+        "id": thread_id,
+        "object": "thread",
+        "created_at": _now(),
+        "metadata": {},
+        "tool_resources": None,
+    }
+
+
+def _message(message_id: str, thread_id: str, role: str, status: str) -> dict:
+    return {
+        "id": message_id,
+        "object": "thread.message",
+        "thread_id": thread_id,
+        "role": role,
+        "status": status,
+        "content": [],
+        "attachments": [],
+        "metadata": {},
+        "created_at": _now(),
+        "assistant_id": None,
+        "run_id": None,
+    }
+
+
+def _run(run: RunState, tool_calls: list[dict] = None) -> dict:
+    return {
+        "id": run.run_id,
+        "object": "thread.run",
+        "thread_id": run.thread_id,
+        "assistant_id": "asst_mock",
+        "status": run.status,
+        "created_at": _now(),
+        "instructions": "",
+        "model": "gpt-4o",
+        "tools": [],
+        "parallel_tool_calls": True,
+        "metadata": {},
+        "required_action": (
+            {
+                "type": "submit_tool_outputs",
+                "submit_tool_outputs": {"tool_calls": tool_calls},
+            }
+            if tool_calls
+            else None
+        ),
+    }
+
+
+def _step(
+    step_id: str,
+    run: RunState,
+    type: str,
+    message_id: str = None,
+    status: str = "in_progress",
+) -> dict:
+    if type == "tool_calls":
+        step_details = {"type": "tool_calls", "tool_calls": []}
+    else:
+        step_details = {
+            "type": "message_creation",
+            "message_creation": {"message_id": message_id},
+        }
+
+    return {
+        "id": step_id,
+        "object": "thread.run.step",
+        "run_id": run.run_id,
+        "thread_id": run.thread_id,
+        "assistant_id": "asst_mock",
+        "type": type,
+        "status": status,
+        "step_details": step_details,
+        "created_at": _now(),
+    }
@@ -0,0 +1,118 @@
+"""Replays a recorded Conductor session offline, to profile the client without network."""
+
+import os, json, time, argparse, tempfile
+from typing import Optional
+from openai import OpenAI
+from src.cassette import Cassette
+from src.conductor import Conductor, StreamHandler
+from src.tracing import SpanSummary, tracer
+from .conductor import agent_config, run_config, Echo
+from .mock_server import MockAssistantsServer, SCENARIOS
+from .stats import summarize
+
+
+def record(path: str, scenario: str, turns: int, latency: float):
+    """
+    Records `turns` turns of a session against the mock Assistants API.
+    """
+    with MockAssistantsServer(scenario=SCENARIOS[scenario], latency=latency) as server:
+        client = OpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+        with Cassette.record(path) as cassette:
+            conductor = Conductor(
+                client=client,
+                config=agent_config,
+                stream_handler=StreamHandler(),
+                cassette=cassette,
+            )
+            conductor.registry.add_tool(Echo())
+            for _ in range(turns):
+                conductor.add_message(text="Hello")
+                conductor.run(config=run_config)
+
+
+def replay(path: str, speed: Optional[float], repeat: int) -> dict:
+    # Spans of the replays only, the client's own overhead once network and
+    # tools take no time.
+    spans = SpanSummary()
+    tracer.add_processor(spans)
+
+    samples = []
+    for _ in range(repeat):
+        cassette = Cassette.replay(path, speed=speed)
+        conductor = Conductor(
+            # Never used to connect, the cassette answers every request.
+            client=OpenAI(api_key="replay", max_retries=0),
+            config=agent_config,
+            stream_handler=StreamHandler(),
+            cassette=cassette,
+        )
+        started = time.perf_counter()
+        conductor.replay()
+        samples.append(time.perf_counter() - started)
+        if cassette.remaining:
+            print(f"warning: {cassette.remaining} recorded interactions not replayed")
+
+    tracer.processors.remove(spans)
+    return {
+        "speed": speed,
+        "session": summarize(samples),
+        "spans": {name: s.model_dump() for name, s in spans.summary().items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cassette",
+        help="Cassette to replay. Without one, a session on the mock server is "
+        "recorded first.",
+    )
+    parser.add_argument("--scenario", default="multi_step", choices=SCENARIOS)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.02,
+        help="Simulated server latency per request while recording, in seconds.",
+    )
+    parser.add_argument(
+        "--speed",
+        nargs="*",
+        type=float,
+        default=[1.0, 0.0],
+        help="Replay speeds relative to the recording, 0 for as fast as possible.",
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.cassette
+        if not path:
+            path = os.path.join(directory, "session.jsonl.gz")
+            record(path, args.scenario, args.turns, args.latency)
+            print(f"Recorded {args.turns} turns, {os.path.getsize(path)} bytes")
+
+        results = []
+        for speed in args.speed:
+            result = replay(path, speed or None, args.repeat)
+            results.append(result)
+            session = result["session"]
+            print(
+                f"\nspeed {speed or 'max'}: session p50 "
+                f"{session['p50'] * 1000:.2f} ms, p95 {session['p95'] * 1000:.2f} ms"
+            )
+            print(f"{'span':<26} {'count':>6} {'p50 ms':>8} {'p95 ms':>8}")
+            for name, stats in result["spans"].items():
+                print(
+                    f"{name:<26} {stats['count']:>6} "
+                    f"{stats['p50'] * 1000:8.3f} {stats['p95'] * 1000:8.3f}"
+                )
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
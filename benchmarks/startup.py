@@ -0,0 +1,58 @@
+"""Measures the cost of creating a Registry and registering tools in a fresh interpreter."""
+
+import sys, json, argparse, subprocess
+from typing import Optional
+from .stats import summarize
+
+SNIPPET = """
+import sys, time, json
+started = time.perf_counter()
+from src.registry import Registry
+registry = Registry()
+names = {tools!r}
+for name in registry.available_tools if names is None else names:
+    registry.register_tool(name=name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed": elapsed, "modules": len(sys.modules)}}))
+"""
+
+CASES: dict[str, Optional[list[str]]] = {
+    "registry only": [],
+    "read_file": ["read_file"],
+    "all tools": None,
+}
+"""
+Registering every tool is what the eager registry paid on every import.
+"""
+
+
+def measure(tools: Optional[list[str]], samples: int) -> dict:
+    elapsed, modules = [], 0
+    for _ in range(samples):
+        output = subprocess.check_output(
+            [sys.executable, "-c", SNIPPET.format(tools=tools)],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+        result = json.loads(output.strip().splitlines()[-1])
+        elapsed.append(result["elapsed"])
+        modules = result["modules"]
+    return {"elapsed": summarize(elapsed), "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'case':<14} {'p50 ms':>8} {'p95 ms':>8} {'modules':>8}")
+    for case, tools in CASES.items():
+        result = measure(tools, args.samples)
+        print(
+            f"{case:<14} {result['elapsed']['p50'] * 1000:>8.1f} "
+            f"{result['elapsed']['p95'] * 1000:>8.1f} {result['modules']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-import logging
+from src.logs import configure_logging
 
-logging.basicConfig(level=os.getenv("LOG_LEVEL"))
\ No newline at end of file
+configure_logging(level=os.getenv("LOG_LEVEL"))
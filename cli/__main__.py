@@ -1,5 +1,17 @@
 """Terrarium CLI: Build and run AI Agents."""
-import cli.app as app
+
+import sys
 
 if __name__ == "__main__":
-    app.main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        import cli.server as server
+
+        server.main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "stats":
+        import cli.stats as stats
+
+        stats.main(sys.argv[2:])
+    else:
+        import cli.app as app
+
+        app.main()
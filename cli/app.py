@@ -1,10 +1,10 @@
 import os, json
 import logging
 from openai import OpenAI
-from typing import override
 from .utils import announce, prompt_list, prompt_confirm, prompt_string
 from src.agent.config import AgentConfiguration, RunConfiguration
 from src.conductor import Conductor, StreamHandler
+from src.render import BufferedRenderer, TerminalSink
 
 __all__ = ["main"]
 
@@ -28,7 +28,9 @@ def chat_mode():
     config_file = "./resources/agent_config.json"
     agent_config = AgentConfiguration(**json.load(open(config_file)))
 
-    conductor = Conductor(client=client, config=agent_config, stream_handler=Handler())
+    conductor = Conductor(
+        client=client, config=agent_config, stream_handler=_stream_handler()
+    )
 
     run_config = RunConfiguration(instructions=None, parallel_tool_calls=True)
 
@@ -57,7 +59,9 @@ def manual_mode():
         config_file = "./resources/agent_config.json"
         agent_config = AgentConfiguration(**json.load(open(config_file)))
 
-    conductor = Conductor(client=client, config=agent_config, stream_handler=Handler())
+    conductor = Conductor(
+        client=client, config=agent_config, stream_handler=_stream_handler()
+    )
 
     custom_run_config = prompt_confirm(
         "Would you like to use a custom run configuration?", default=False
@@ -125,16 +129,7 @@ def manual_mode():
             break
 
 
-class Handler(StreamHandler):
-
-    @override
-    def on_text_started(self):
-        print("\n🤖 Agent: ", end="")
-
-    @override
-    def on_text_changed(self, delta: str):
-        announce(delta, end="", flush=True)
-
-    @override
-    def on_text_done(self, text: str):
-        print("\n")
+def _stream_handler() -> StreamHandler:
+    # Deltas are written once per frame from the renderer's thread, never from
+    # the thread reading the stream.
+    return BufferedRenderer(TerminalSink(markdown=True))
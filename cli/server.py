@@ -0,0 +1,389 @@
+import os, json, time, uuid, queue, logging, argparse, threading
+from typing import override
+from openai import OpenAI
+from flask import Flask, Response, jsonify, request
+from src.agent import ThreadPool
+from src.agent.config import AgentConfiguration, RunConfiguration
+from src.conductor import Conductor, StreamHandler
+from src.tracing import meter, span_summary
+
+__all__ = ["main", "SessionManager", "create_app"]
+
+Log = logging.getLogger("Server")
+
+
+class QueueHandler(StreamHandler):
+    """
+    Forwards stream events into a queue that the SSE response drains, so the
+    thread reading the OpenAI stream never waits on the HTTP client.
+    """
+
+    def __init__(self):
+        self.events: queue.Queue = queue.Queue()
+
+    @override
+    def on_text_started(self):
+        self.events.put(("text_started", {}))
+
+    @override
+    def on_text_changed(self, delta: str):
+        self.events.put(("text_delta", {"delta": delta}))
+
+    @override
+    def on_text_done(self, text: str):
+        self.events.put(("text_done", {"text": text}))
+
+    @override
+    def on_error(self, error: Exception):
+        self.events.put(("error", {"error": str(error)}))
+
+
+class Session:
+
+    def __init__(self, conductor: Conductor):
+        self.id = uuid.uuid4().hex
+        self.conductor = conductor
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+
+    @property
+    def is_running(self) -> bool:
+        return self.lock.locked()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+
+    def __init__(
+        self,
+        client: OpenAI,
+        agent_config: AgentConfiguration,
+        max_sessions: int = 1000,
+        max_concurrent_runs: int = 64,
+        idle_timeout: float = 900,
+        allowed_tools: list[str] = None,
+        thread_pool: ThreadPool = None,
+    ):
+        self.client = client
+        self.thread_pool = thread_pool
+        self.agent_config = agent_config
+        self.allowed_tools = allowed_tools
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[str, Session] = {}
+        self.reserved = 0
+        """
+        Sessions being created, counted against `max_sessions`.
+        """
+        self.lock = threading.Lock()
+        self.runs = threading.BoundedSemaphore(max_concurrent_runs)
+
+        threading.Thread(target=self._evict_loop, daemon=True).start()
+
+    def create(self, tools: list[str] = None, thread_id: str = None) -> Session:
+        for tool in tools or []:
+            self._check_allowed(tool)
+
+        # The slot is reserved while the conductor is built outside the lock,
+        # so concurrent creates can't exceed the limit.
+        with self.lock:
+            if len(self.sessions) + self.reserved >= self.max_sessions:
+                self._evict(force=True)
+            if len(self.sessions) + self.reserved >= self.max_sessions:
+                raise SessionLimitError("Too many active sessions.")
+            self.reserved += 1
+
+        session = None
+        try:
+            conductor = Conductor(
+                client=self.client,
+                config=self.agent_config,
+                stream_handler=QueueHandler(),
+                thread_id=thread_id,
+                thread_pool=self.thread_pool,
+            )
+            for tool in tools or []:
+                self.register_tool(conductor, tool)
+            session = Session(conductor=conductor)
+        finally:
+            with self.lock:
+                self.reserved -= 1
+                if session:
+                    self.sessions[session.id] = session
+
+        Log.info(f"Session created > {session.id}")
+        return session
+
+    def register_tool(self, conductor: Conductor, name: str):
+        self._check_allowed(name)
+        conductor.registry.register_tool(name=name)
+
+    def _check_allowed(self, name: str):
+        if self.allowed_tools is not None and name not in self.allowed_tools:
+            raise Exception(f"Tool with name {name} is not allowed.")
+
+    def get(self, session_id: str) -> Session | None:
+        session = self.sessions.get(session_id)
+        if session:
+            session.touch()
+        return session
+
+    def delete(self, session_id: str):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session:
+            session.conductor.executor.shutdown(wait=False)
+            Log.info(f"Session deleted > {session_id}")
+
+    def _evict_loop(self):
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 4))
+            with self.lock:
+                self._evict()
+
+    def _evict(self, force: bool = False):
+        # Must be called with self.lock held. With `force`, the least recently
+        # active idle session is evicted even if it has not timed out yet.
+        now = time.monotonic()
+        idle = sorted(
+            (s for s in self.sessions.values() if not s.is_running),
+            key=lambda s: s.last_active,
+        )
+        expired = [s for s in idle if now - s.last_active > self.idle_timeout]
+        if force and not expired and idle:
+            expired = idle[:1]
+
+        for session in expired:
+            self.sessions.pop(session.id, None)
+            session.conductor.executor.shutdown(wait=False)
+            Log.info(f"Session evicted > {session.id}")
+
+
+class SessionLimitError(Exception):
+    pass
+
+
+def create_app(manager: SessionManager) -> Flask:
+    app = Flask(__name__)
+
+    def session_or_404(session_id: str):
+        session = manager.get(session_id)
+        if not session:
+            return None, (jsonify({"error": "Session not found."}), 404)
+        return session, None
+
+    @app.post("/sessions")
+    def create_session():
+        body = request.get_json(silent=True) or {}
+        try:
+            session = manager.create(
+                tools=body.get("tools"), thread_id=body.get("thread_id")
+            )
+        except SessionLimitError as e:
+            return jsonify({"error": str(e)}), 503
+        except Exception as e:
+            Log.exception(e)
+            return jsonify({"error": str(e)}), 400
+
+        return (
+            jsonify(
+                {
+                    "session_id": session.id,
+                    "thread_id": session.conductor.agent.thread_id,
+                    "tools": list(session.conductor.registry.registered_tools.keys()),
+                }
+            ),
+            201,
+        )
+
+    @app.get("/stats")
+    def stats():
+        thread_pool = manager.thread_pool
+        return jsonify(
+            {
+                "sessions": len(manager.sessions),
+                "thread_pool": thread_pool.stats.model_dump() if thread_pool else None,
+                "spans": {
+                    name: stats.model_dump()
+                    for name, stats in span_summary.summary().items()
+                },
+                "metrics": meter.snapshot(),
+            }
+        )
+
+    @app.delete("/sessions/<session_id>")
+    def delete_session(session_id: str):
+        manager.delete(session_id)
+        return "", 204
+
+    @app.get("/sessions/<session_id>/tools")
+    def list_tools(session_id: str):
+        session, error = session_or_404(session_id)
+        if error:
+            return error
+
+        registry = session.conductor.registry
+        available = registry.available_tools
+        if manager.allowed_tools is not None:
+            available = [t for t in available if t in manager.allowed_tools]
+
+        return jsonify(
+            {
+                "available": available,
+                "registered": list(registry.registered_tools.keys()),
+            }
+        )
+
+    @app.post("/sessions/<session_id>/tools")
+    def register_tool(session_id: str):
+        session, error = session_or_404(session_id)
+        if error:
+            return error
+
+        name = (request.get_json(silent=True) or {}).get("name")
+        try:
+            manager.register_tool(session.conductor, name)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"registered": name}), 201
+
+    @app.delete("/sessions/<session_id>/tools/<name>")
+    def deregister_tool(session_id: str, name: str):
+        session, error = session_or_404(session_id)
+        if error:
+            return error
+
+        if name in session.conductor.registry.registered_tools:
+            session.conductor.registry.deregister_tool(name=name)
+        return "", 204
+
+    @app.post("/sessions/<session_id>/messages")
+    def post_message(session_id: str):
+        session, error = session_or_404(session_id)
+        if error:
+            return error
+
+        text = (request.get_json(silent=True) or {}).get("text")
+        if not text:
+            return jsonify({"error": "Text is required."}), 400
+
+        # Held while queueing, so a run starting meanwhile can't take the
+        # pending messages halfway through.
+        if not session.lock.acquire(blocking=False):
+            return jsonify({"error": "A run is already in progress."}), 409
+        try:
+            session.conductor.add_message(text=text)
+        finally:
+            session.lock.release()
+        return jsonify({"status": "accepted"}), 202
+
+    @app.post("/sessions/<session_id>/stream")
+    def stream_response(session_id: str):
+        session, error = session_or_404(session_id)
+        if error:
+            return error
+
+        body = request.get_json(silent=True) or {}
+        run_config = RunConfiguration(
+            instructions=body.get("instructions"),
+            parallel_tool_calls=body.get("parallel_tool_calls", True),
+        )
+
+        if not session.lock.acquire(blocking=False):
+            return jsonify({"error": "A run is already in progress."}), 409
+        if not manager.runs.acquire(blocking=False):
+            session.lock.release()
+            return jsonify({"error": "Too many concurrent runs."}), 429
+
+        # A fresh handler per run, so events of an abandoned stream never leak
+        # into the next one.
+        handler = QueueHandler()
+        session.conductor.stream_handler = handler
+        done = object()
+
+        def run():
+            try:
+                session.conductor.run(config=run_config)
+            finally:
+                handler.events.put((done, None))
+                manager.runs.release()
+                session.touch()
+                session.lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+        def generate():
+            while True:
+                event, data = handler.events.get()
+                if event is done:
+                    break
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+            # New sessions only get a thread with their first run.
+            summary = {
+                "api_requests": session.conductor.api_requests,
+                "thread_id": session.conductor.agent.thread_id,
+            }
+            yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+        return Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return app
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cli serve", description="Serve Terrarium over HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", default="./resources/agent_config.json")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--max-concurrent-runs", type=int, default=64)
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=900,
+        help="Seconds of inactivity after which a session is evicted.",
+    )
+    parser.add_argument(
+        "--allowed-tools",
+        nargs="*",
+        help="Tools sessions may register. Defaults to all available tools.",
+    )
+    parser.add_argument(
+        "--thread-pool",
+        type=int,
+        default=0,
+        help="Empty threads to keep created ahead of new sessions.",
+    )
+    args = parser.parse_args(argv)
+
+    agent_config = AgentConfiguration(**json.load(open(args.config)))
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    thread_pool = (
+        ThreadPool(client, size=args.thread_pool) if args.thread_pool else None
+    )
+
+    manager = SessionManager(
+        client=client,
+        agent_config=agent_config,
+        max_sessions=args.max_sessions,
+        max_concurrent_runs=args.max_concurrent_runs,
+        idle_timeout=args.idle_timeout,
+        allowed_tools=args.allowed_tools,
+        thread_pool=thread_pool,
+    )
+
+    Log.info(f"Serving on http://{args.host}:{args.port}")
+    try:
+        create_app(manager).run(host=args.host, port=args.port, threaded=True)
+    finally:
+        if thread_pool:
+            thread_pool.close()
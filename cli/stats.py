@@ -0,0 +1,63 @@
+import sys, json, argparse
+from src.tracing import TRACES_FILE, SpanStats, SpanSummary
+
+__all__ = ["main", "summarize"]
+
+
+def summarize(path: str) -> dict[str, SpanStats]:
+    """
+    Duration percentiles per span name of a JSONL file written with
+    `TRACES_FILE`.
+    """
+    summary = SpanSummary()
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                span = json.loads(line)
+            except ValueError:
+                # A line cut short by a process that was killed mid-write.
+                continue
+            error = span.get("status", {}).get("status_code") == "ERROR"
+            summary.record(span["name"], span["duration"], error)
+    return summary.summary()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cli stats",
+        description="Print span latency percentiles from a traces file.",
+    )
+    parser.add_argument(
+        "--file",
+        default=TRACES_FILE,
+        help="JSONL file spans were exported to. Defaults to $TRACES_FILE.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON instead.")
+    args = parser.parse_args(argv)
+
+    if not args.file:
+        parser.error("no traces file, pass --file or set TRACES_FILE")
+
+    try:
+        summary = summarize(args.file)
+    except FileNotFoundError:
+        parser.error(f"{args.file} not found")
+
+    if args.json:
+        json.dump({name: s.model_dump() for name, s in summary.items()}, sys.stdout)
+        print()
+        return
+
+    width = max([len("span")] + [len(name) for name in summary])
+    print(
+        f"{'span':<{width}} {'count':>7} {'errors':>6}"
+        f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    for name, stats in summary.items():
+        print(
+            f"{name:<{width}} {stats.count:>7} {stats.errors:>6}"
+            f" {stats.p50 * 1000:>9.1f} {stats.p95 * 1000:>9.1f}"
+            f" {stats.p99 * 1000:>9.1f} {stats.max * 1000:>9.1f}"
+        )
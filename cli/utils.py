@@ -1,4 +1,5 @@
 from InquirerPy import prompt
+from src.tokens import num_tokens
 
 __all__ = ["prompt_confirm", "prompt_string", "prompt_list", "announce", "num_tokens"]
 
@@ -47,4 +48,4 @@ def prompt_list(question_message, choices, default=None):
             "choices": choices,
             "default": default,
         }
-    ).get("name")
\ No newline at end of file
+    ).get("name")
@@ -5,4 +5,6 @@ load_dotenv()
 import os
 import logging
 
-logging.basicConfig(level=os.getenv("LOG_LEVEL"))
\ No newline at end of file
+# The scripts run before requirements are installed, so they can't import src.
+# If they do later, configure_logging moves this handler behind its queue.
+logging.basicConfig(level=os.getenv("LOG_LEVEL"))
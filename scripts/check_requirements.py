@@ -1,40 +1,116 @@
-import subprocess, sys, logging
+import os, re, sys, site, hashlib, logging, subprocess
+from importlib import metadata
 
 Log = logging.getLogger("CheckRequirements")
 
-def get_installed_packages():
+REQUIREMENTS_FILE = "requirements/cli.txt"
+STAMP_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "terrarium"
+)
+
+
+def fingerprint(requirements: bytes) -> str:
+    # Installing or removing a distribution adds or removes its *.dist-info
+    # directory, which bumps the mtime of the site-packages directory.
+    digest = hashlib.sha256(requirements)
+    digest.update(sys.executable.encode())
+    digest.update(sys.version.encode())
+    site_dirs = site.getsitepackages() + [site.getusersitepackages()]
+    for path in site_dirs:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        digest.update(f"{path}:{mtime}".encode())
+    return digest.hexdigest()
+
+
+def stamp_path(requirements: bytes) -> str:
+    return os.path.join(STAMP_DIR, f"requirements-{fingerprint(requirements)}.stamp")
+
+
+def write_stamp(requirements: bytes):
     try:
-        result = subprocess.check_output([sys.executable, '-m', 'pip', 'freeze'], universal_newlines=True)
-        installed_packages = {line.strip().lower() for line in result.splitlines() if line.strip()}
-        return installed_packages
-    except subprocess.CalledProcessError:
-        Log.error("Error retrieving installed packages.")
-        sys.exit(1)
+        os.makedirs(STAMP_DIR, exist_ok=True)
+        with open(stamp_path(requirements), "w"):
+            pass
+    except OSError:
+        Log.debug("Could not write requirements stamp.")
+
+
+def _requirement_class():
+    try:
+        from packaging.requirements import Requirement
+    except ImportError:
+        from pip._vendor.packaging.requirements import Requirement
+    return Requirement
+
+
+def get_missing_packages(lines: list[str]) -> list[str]:
+    Requirement = _requirement_class()
+    missing = []
+
+    for line in lines:
+        # Comments start at a # at the start of the line or after whitespace.
+        line = re.sub(r"(^|\s)#.*", "", line).strip()
+        # Options such as -r, -e and --index-url aren't requirements.
+        if not line or line.startswith("-"):
+            continue
+
+        try:
+            requirement = Requirement(line)
+        except ValueError:
+            # InvalidRequirement, e.g. a URL or path. pip decides.
+            Log.debug(f"  - Can't check {line}")
+            missing.append(line)
+            continue
+
+        if requirement.marker and not requirement.marker.evaluate():
+            continue
+
+        try:
+            installed = metadata.version(requirement.name)
+        except metadata.PackageNotFoundError:
+            missing.append(line)
+            continue
+
+        if not requirement.specifier.contains(installed, prereleases=True):
+            Log.debug(f"  - {requirement.name} {installed} does not satisfy {line}")
+            missing.append(line)
+
+    return missing
+
 
 def check_requirements():
     try:
-        with open('requirements/cli.txt', 'r') as file:
-            required_packages = {line.strip().lower() for line in file.readlines() if line.strip()}
+        with open(REQUIREMENTS_FILE, "rb") as file:
+            requirements = file.read()
     except FileNotFoundError:
-        Log.error("Error: requirements/cli.txt not found.")
+        Log.error(f"Error: {REQUIREMENTS_FILE} not found.")
         sys.exit(1)
 
-    installed_packages = get_installed_packages()
+    if os.path.exists(stamp_path(requirements)):
+        return
 
-    missing_packages = required_packages - installed_packages
+    missing_packages = get_missing_packages(requirements.decode().splitlines())
 
-    if missing_packages and len(missing_packages) > 0:
+    if missing_packages:
         Log.info("Missing packages:")
         for package in missing_packages:
             Log.debug(f"  - {package}")
         Log.info("Installing missing packages...")
         try:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', *missing_packages])
+            subprocess.check_call(
+                [sys.executable, "-m", "pip", "install", *missing_packages]
+            )
         except subprocess.CalledProcessError:
             Log.error("Error installing missing packages.")
             sys.exit(1)
     else:
         Log.info("All required packages are installed.")
 
+    write_stamp(requirements)
+
+
 if __name__ == "__main__":
-    check_requirements()
\ No newline at end of file
+    check_requirements()
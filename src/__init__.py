@@ -3,6 +3,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-import logging
+from .logs import configure_logging
 
-logging.basicConfig(level=os.getenv("LOG_LEVEL"))
+configure_logging(level=os.getenv("LOG_LEVEL"))
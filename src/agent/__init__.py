@@ -1,3 +1,14 @@
 from .agent import Agent, AgentEventHandler, AgentToolCall, AgentToolCallOutput
+from .async_agent import AsyncAgent, AsyncAgentEventHandler
+from .thread_pool import ThreadPool, ThreadPoolStats
 
-__all__ = ["Agent", "AgentEventHandler", "AgentToolCall", "AgentToolCallOutput"]
+__all__ = [
+    "Agent",
+    "AgentEventHandler",
+    "AgentToolCall",
+    "AgentToolCallOutput",
+    "AsyncAgent",
+    "AsyncAgentEventHandler",
+    "ThreadPool",
+    "ThreadPoolStats",
+]
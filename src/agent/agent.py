@@ -1,18 +1,16 @@
 import logging
+from typing import Optional
 from pydantic import BaseModel
-from openai import OpenAI
-from openai import OpenAI
-from openai.types.beta.threads import Message, Text, TextDelta
+from openai.types.beta import AssistantStreamEvent
+from openai.types.beta.threads import Text, TextDelta
 from typing_extensions import override
-from pydantic import BaseModel
 from openai import AssistantEventHandler, OpenAI
-from openai.types.beta.threads.runs import (
-    RunStep,
-    FunctionToolCall,
-    CodeInterpreterToolCall,
-    FileSearchToolCall,
-)
+from openai.types.beta.threads.runs import RunStep
 from .config import AgentConfiguration, RunConfiguration
+from .thread_pool import ThreadPool
+from .run_state import RunStateTracker, StreamSpans
+from ..tracing import tracer
+from ..logs import Payload
 
 Log = logging.getLogger("Agent")
 
@@ -65,46 +63,98 @@ class Agent:
         client: OpenAI,
         config: AgentConfiguration,
         thread_id: str = None,
+        thread_pool: ThreadPool = None,
     ):
         self.client = client
         self.agent_config = config
-        if not thread_id:
+        self.api_requests = 0
+        if not thread_id and thread_pool:
+            thread_id = thread_pool.take()
+        self.thread_id = thread_id
+        """
+        None until the first run creates the thread.
+        """
+
+    def reset_api_requests(self) -> int:
+        """
+        Returns the number of API requests made since the last reset.
+        """
+        api_requests, self.api_requests = self.api_requests, 0
+        return api_requests
+
+    def create_thread(self) -> str:
+        if not self.thread_id:
+            self.api_requests += 1
             thread = self.client.beta.threads.create()
             self.thread_id = thread.id
-        else:
-            self.thread_id = thread_id
+        return self.thread_id
 
     def add_message(self, content: list[dict]):
+        self.create_thread()
+        self.api_requests += 1
         self.client.beta.threads.messages.create(
             thread_id=self.thread_id, role="user", content=content
         )
-        Log.info(f"Message added > {content}")
+        Log.info("Message added > %s", Payload(content))
 
     def run(
         self,
         config: RunConfiguration,
         tools: list[dict],
         event_handler: AgentEventHandler,
+        messages: Optional[list[list[dict]]] = None,
     ):
-        Log.info(f"Run started with instructions > {config.instructions}")
-
-        event_handler.thread_id = self.thread_id
-        assistant_handler = EventHandler(
-            client=self.client, thread_id=self.thread_id, handler=event_handler
-        )
+        """
+        Streams a run. `messages`, the contents of user messages, are added to
+        the thread by the run request itself, and a thread that doesn't exist
+        yet is created by it too, so neither costs a round trip of its own.
+        """
+        messages = messages or []
+        Log.info("Run started with instructions > %s", Payload(config.instructions))
+
+        with tracer.span(
+            "agent.run", thread_id=self.thread_id, messages=len(messages)
+        ) as span:
+            event_handler.thread_id = self.thread_id
+            assistant_handler = EventHandler(
+                thread_id=self.thread_id, handler=event_handler
+            )
+            messages = [{"role": "user", "content": content} for content in messages]
+
+            self.api_requests += 1
+            if self.thread_id:
+                manager = self.client.beta.threads.runs.stream(
+                    assistant_id=self.agent_config.assistant_id,
+                    model=self.agent_config.model,
+                    instructions=self.agent_config.instructions,
+                    temperature=self.agent_config.temperature,
+                    additional_instructions=config.instructions,
+                    additional_messages=messages or None,
+                    parallel_tool_calls=config.parallel_tool_calls,
+                    event_handler=assistant_handler,
+                    tools=tools,
+                    thread_id=self.thread_id,
+                )
+            else:
+                manager = self.client.beta.threads.create_and_run_stream(
+                    assistant_id=self.agent_config.assistant_id,
+                    model=self.agent_config.model,
+                    instructions=_instructions(self.agent_config, config),
+                    temperature=self.agent_config.temperature,
+                    parallel_tool_calls=config.parallel_tool_calls,
+                    event_handler=assistant_handler,
+                    tools=tools,
+                    thread={"messages": messages},
+                )
 
-        with self.client.beta.threads.runs.stream(
-            assistant_id=self.agent_config.assistant_id,
-            model=self.agent_config.model,
-            instructions=self.agent_config.instructions,
-            temperature=self.agent_config.temperature,
-            additional_instructions=config.instructions,
-            parallel_tool_calls=config.parallel_tool_calls,
-            event_handler=assistant_handler,
-            tools=tools,
-            thread_id=self.thread_id,
-        ) as stream:
-            stream.until_done()
+            try:
+                with manager as stream:
+                    stream.until_done()
+            finally:
+                # Kept even if the stream fails after creating the thread, so
+                # the next run continues it rather than starting a new one.
+                self.thread_id = self.thread_id or assistant_handler.thread_id
+                span.set_attribute("thread_id", self.thread_id)
 
     def subbmit_tool_call_outputs(
         self,
@@ -112,121 +162,98 @@ class Agent:
         tool_call_outputs: list[AgentToolCallOutput],
         event_handler: AgentEventHandler,
     ):
-        Log.info(f"Tool call outputs > {tool_call_outputs}")
+        Log.info("Tool call outputs > %s", Payload(tool_call_outputs))
+        # Outputs of a run that created its thread are submitted while it streams.
+        self.thread_id = self.thread_id or event_handler.thread_id
         event_handler.thread_id = self.thread_id
-        assistant_handler = EventHandler(
-            client=self.client,
-            thread_id=self.thread_id,
-            handler=event_handler,
-            run_id=run_id,
-        )
 
-        with self.client.beta.threads.runs.submit_tool_outputs_stream(
-            run_id=run_id,
-            thread_id=self.thread_id,
-            tool_outputs=[tool_call.model_dump() for tool_call in tool_call_outputs],
-            event_handler=assistant_handler,
-        ) as stream:
-            stream.until_done()
+        self.api_requests += 1
+        with tracer.span(
+            "agent.submit_tool_outputs", run_id=run_id, outputs=len(tool_call_outputs)
+        ):
+            assistant_handler = EventHandler(
+                thread_id=self.thread_id,
+                handler=event_handler,
+                run_id=run_id,
+            )
+            with self.client.beta.threads.runs.submit_tool_outputs_stream(
+                run_id=run_id,
+                thread_id=self.thread_id,
+                tool_outputs=[
+                    tool_call.model_dump() for tool_call in tool_call_outputs
+                ],
+                event_handler=assistant_handler,
+            ) as stream:
+                stream.until_done()
 
     @classmethod
     def cancel_run(cls, client: OpenAI, thread_id: str, run_id: str):
         client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
-        Log.info(f"Run cancelled > {run_id}")
+        Log.info("Run cancelled > %s", run_id)
 
 
 class EventHandler(AssistantEventHandler):
 
     def __init__(
         self,
-        client: OpenAI,
-        thread_id: str,
+        thread_id: Optional[str],
         handler: AgentEventHandler,
         run_id: str = None,
     ):
         super().__init__()
-        self.client = client
         self.thread_id = thread_id
         self.handler = handler
         self.handler.thread_id = thread_id
-        self.run_id = run_id
-        self.run_step = None
-        self.tool_calls = []
+        self.run_state = RunStateTracker(run_id=run_id)
+        self.spans = StreamSpans()
+
+    @override
+    def on_event(self, event: AssistantStreamEvent) -> None:
+        self.run_state.on_event(event)
+        self.spans.on_event(event)
+        if self.run_state.run_id:
+            self.handler.run_id = self.run_state.run_id
+        if self.run_state.thread_id and not self.thread_id:
+            self.thread_id = self.handler.thread_id = self.run_state.thread_id
+        return super().on_event(event)
 
     @override
     def on_end(self):
-        if (
-            self.run_step
-            and self.run_step.status == "in_progress"
-            and len(self.tool_calls) > 0
-        ):
+        Log.info("Run status > %s", self.run_state.status)
+
+        if self.run_state.requires_action:
             tcs = [
                 AgentToolCall(
                     id=tool_call.id,
                     name=tool_call.function.name,
                     arguments=tool_call.function.arguments,
                 )
-                for tool_call in self.tool_calls
+                for tool_call in self.run_state.tool_calls
             ]
-            Log.info(f"Tool calls > {tcs}")
+            Log.info("Tool calls > %s", Payload(tcs))
             self.handler.on_tool_calls(tcs)
-            return super().on_end()
-
-        run = self.client.beta.threads.runs.retrieve(
-            thread_id=self.thread_id, run_id=self.run_id
-        )
-
-        if run.status == "completed":
+        elif self.run_state.is_complete:
             self.handler.on_run_done()
 
-        Log.info(f"Run status > {run.status}")
         return super().on_end()
 
     @override
     def on_exception(self, exception: Exception) -> None:
         """Fired whenever an exception happens during streaming"""
-        Log.exception(f"Exception > {exception}")
+        Log.exception("Exception > %s", exception)
         self.handler.on_error(exception)
         return super().on_exception(exception)
 
     @override
     def on_run_step_created(self, run_step: RunStep) -> None:
-        self.run_id = run_step.run_id
-        self.run_step = run_step
-        self.handler.run_id = run_step.run_id
-        self.tool_calls: list[FunctionToolCall] = []
-        Log.info(f"Run step created > {run_step.id}")
+        Log.info("Run step created > %s", run_step.id)
         return super().on_run_step_created(run_step)
 
     @override
     def on_run_step_done(self, run_step: RunStep) -> None:
-        Log.info(f"Run step done > {run_step.id}")
+        Log.info("Run step done > %s", run_step.id)
         return super().on_run_step_done(run_step)
 
-    # Mark - Tool events
-
-    @override
-    def on_tool_call_done(
-        self, tool_call: CodeInterpreterToolCall | FileSearchToolCall | FunctionToolCall
-    ) -> None:
-        if isinstance(tool_call, CodeInterpreterToolCall):
-            return super().on_tool_call_done(tool_call)
-        elif isinstance(tool_call, FileSearchToolCall):
-            return super().on_tool_call_done(tool_call)
-
-        run = self.client.beta.threads.runs.retrieve(
-            thread_id=self.thread_id, run_id=self.run_id
-        )
-
-        if run.status == "completed":
-            return
-        elif run.status == "in_progress":
-            self.tool_calls.append(tool_call)
-        elif run.status == "requires_action":
-            self.tool_calls.append(tool_call)
-
-        return super().on_tool_call_done(tool_call)
-
     # Mark: - Text Events
 
     @override
@@ -242,5 +269,12 @@ class EventHandler(AssistantEventHandler):
     @override
     def on_text_done(self, text: Text) -> None:
         self.handler.on_text_done(text.value)
-        Log.info(f"Text: {text.value}")
+        Log.info("Text: %s", Payload(text.value))
         return super().on_text_done(text)
+
+
+def _instructions(agent_config: AgentConfiguration, config: RunConfiguration) -> str:
+    # Creating a thread and run together doesn't take additional instructions.
+    if not config.instructions:
+        return agent_config.instructions
+    return f"{agent_config.instructions}\n\n{config.instructions}"
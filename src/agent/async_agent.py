@@ -0,0 +1,240 @@
+import logging
+from typing import Optional
+from contextlib import nullcontext
+from openai import AsyncAssistantEventHandler, AsyncOpenAI
+from openai.types.beta import AssistantStreamEvent
+from openai.types.beta.threads import Text, TextDelta
+from openai.types.beta.threads.runs import RunStep
+from typing_extensions import override
+from .agent import AgentToolCall, AgentToolCallOutput, _instructions
+from .config import AgentConfiguration, RunConfiguration
+from .thread_pool import ThreadPool
+from .run_state import RunStateTracker, StreamSpans
+from ..tracing import tracer
+from ..logs import Payload
+
+__all__ = ["AsyncAgent", "AsyncAgentEventHandler"]
+
+Log = logging.getLogger("AsyncAgent")
+
+
+class AsyncAgentEventHandler:
+
+    def __init__(self, thread_id: str = None):
+        self.thread_id = thread_id
+        self.run_id = None
+
+    async def on_run_done(self):
+        pass
+
+    async def on_error(self, error: Exception):
+        pass
+
+    async def on_text_started(self):
+        pass
+
+    async def on_text_changed(self, delta: str):
+        pass
+
+    async def on_text_done(self, text: str):
+        pass
+
+    async def on_tool_calls(
+        self, tool_calls: list[AgentToolCall]
+    ) -> list[AgentToolCallOutput]:
+        return []
+
+
+class AsyncAgent:
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        config: AgentConfiguration,
+        thread_id: str = None,
+        thread_pool: ThreadPool = None,
+    ):
+        self.client = client
+        self.agent_config = config
+        if not thread_id and thread_pool:
+            thread_id = thread_pool.take()
+        self.thread_id = thread_id
+        self.api_requests = 0
+
+    def reset_api_requests(self) -> int:
+        """
+        Returns the number of API requests made since the last reset.
+        """
+        api_requests, self.api_requests = self.api_requests, 0
+        return api_requests
+
+    async def create_thread(self) -> str:
+        if not self.thread_id:
+            self.api_requests += 1
+            thread = await self.client.beta.threads.create()
+            self.thread_id = thread.id
+        return self.thread_id
+
+    async def add_message(self, content: list[dict]):
+        await self.create_thread()
+        self.api_requests += 1
+        await self.client.beta.threads.messages.create(
+            thread_id=self.thread_id, role="user", content=content
+        )
+        Log.info("Message added > %s", Payload(content))
+
+    async def run(
+        self,
+        config: RunConfiguration,
+        tools: list[dict],
+        event_handler: AsyncAgentEventHandler,
+        messages: Optional[list[list[dict]]] = None,
+    ):
+        """
+        Streams a run until it is finished. Tool calls are resolved through
+        `event_handler.on_tool_calls` and their outputs submitted in a loop rather
+        than from inside the stream callbacks. `messages` and, for a new
+        conversation, the thread are created by the run request itself.
+        """
+        messages = messages or []
+        Log.info("Run started with instructions > %s", Payload(config.instructions))
+
+        with tracer.span(
+            "agent.run", thread_id=self.thread_id, messages=len(messages)
+        ) as span:
+            event_handler.thread_id = self.thread_id
+            assistant_handler = AsyncEventHandler(handler=event_handler)
+            messages = [{"role": "user", "content": content} for content in messages]
+
+            if self.thread_id:
+                manager = self.client.beta.threads.runs.stream(
+                    assistant_id=self.agent_config.assistant_id,
+                    model=self.agent_config.model,
+                    instructions=self.agent_config.instructions,
+                    temperature=self.agent_config.temperature,
+                    additional_instructions=config.instructions,
+                    additional_messages=messages or None,
+                    parallel_tool_calls=config.parallel_tool_calls,
+                    event_handler=assistant_handler,
+                    tools=tools,
+                    thread_id=self.thread_id,
+                )
+            else:
+                manager = self.client.beta.threads.create_and_run_stream(
+                    assistant_id=self.agent_config.assistant_id,
+                    model=self.agent_config.model,
+                    instructions=_instructions(self.agent_config, config),
+                    temperature=self.agent_config.temperature,
+                    parallel_tool_calls=config.parallel_tool_calls,
+                    event_handler=assistant_handler,
+                    tools=tools,
+                    thread={"messages": messages},
+                )
+
+            submitted = 0
+            while True:
+                self.api_requests += 1
+                with (
+                    tracer.span("agent.submit_tool_outputs", outputs=submitted)
+                    if submitted
+                    else nullcontext()
+                ):
+                    try:
+                        async with manager as stream:
+                            await stream.until_done()
+                    finally:
+                        # Kept even if the stream fails after creating the
+                        # thread, so the next run continues it.
+                        run_state = assistant_handler.run_state
+                        self.thread_id = self.thread_id or run_state.thread_id
+                        event_handler.thread_id = self.thread_id
+                        span.set_attribute("thread_id", self.thread_id)
+
+                Log.info("Run status > %s", run_state.status)
+
+                if run_state.is_complete:
+                    await event_handler.on_run_done()
+                    return
+
+                if not run_state.requires_action:
+                    return
+
+                tool_calls = [
+                    AgentToolCall(
+                        id=tool_call.id,
+                        name=tool_call.function.name,
+                        arguments=tool_call.function.arguments,
+                    )
+                    for tool_call in run_state.tool_calls
+                ]
+                Log.info("Tool calls > %s", Payload(tool_calls))
+                tool_call_outputs = await event_handler.on_tool_calls(tool_calls)
+                Log.info("Tool call outputs > %s", Payload(tool_call_outputs))
+                submitted = len(tool_call_outputs)
+
+                assistant_handler = AsyncEventHandler(handler=event_handler)
+                manager = self.client.beta.threads.runs.submit_tool_outputs_stream(
+                    run_id=run_state.run_id,
+                    thread_id=self.thread_id,
+                    tool_outputs=[output.model_dump() for output in tool_call_outputs],
+                    event_handler=assistant_handler,
+                )
+
+    async def cancel_run(self, run_id: str):
+        self.api_requests += 1
+        await self.client.beta.threads.runs.cancel(
+            thread_id=self.thread_id, run_id=run_id
+        )
+        Log.info("Run cancelled > %s", run_id)
+
+
+class AsyncEventHandler(AsyncAssistantEventHandler):
+
+    def __init__(self, handler: AsyncAgentEventHandler):
+        super().__init__()
+        self.handler = handler
+        self.run_state = RunStateTracker()
+        self.spans = StreamSpans()
+
+    @override
+    async def on_event(self, event: AssistantStreamEvent) -> None:
+        self.run_state.on_event(event)
+        self.spans.on_event(event)
+        if self.run_state.run_id:
+            self.handler.run_id = self.run_state.run_id
+        return await super().on_event(event)
+
+    @override
+    async def on_exception(self, exception: Exception) -> None:
+        """Fired whenever an exception happens during streaming"""
+        Log.exception("Exception > %s", exception)
+        await self.handler.on_error(exception)
+        return await super().on_exception(exception)
+
+    @override
+    async def on_run_step_created(self, run_step: RunStep) -> None:
+        Log.info("Run step created > %s", run_step.id)
+        return await super().on_run_step_created(run_step)
+
+    @override
+    async def on_run_step_done(self, run_step: RunStep) -> None:
+        Log.info("Run step done > %s", run_step.id)
+        return await super().on_run_step_done(run_step)
+
+    # Mark: - Text Events
+
+    @override
+    async def on_text_created(self, text: Text) -> None:
+        await self.handler.on_text_started()
+        return await super().on_text_created(text)
+
+    @override
+    async def on_text_delta(self, delta: TextDelta, snapshot: Text) -> None:
+        await self.handler.on_text_changed(delta.value)
+        return await super().on_text_delta(delta, snapshot)
+
+    @override
+    async def on_text_done(self, text: Text) -> None:
+        await self.handler.on_text_done(text.value)
+        Log.info("Text: %s", Payload(text.value))
+        return await super().on_text_done(text)
@@ -0,0 +1,114 @@
+from typing import Optional
+from openai.types.beta import AssistantStreamEvent
+from openai.types.beta.threads import Run
+from ..tracing import Span, tracer, meter
+
+__all__ = ["RunStateTracker", "StreamSpans"]
+
+
+TERMINAL_STATUSES = {"completed", "cancelled", "expired", "failed", "incomplete"}
+
+
+class RunStateTracker:
+    """
+    Follows a run purely from its streamed `thread.run.*` and `thread.run.step.*`
+    events, so deciding when to dispatch tools or when a run is over never needs
+    a `runs.retrieve` round trip.
+    """
+
+    def __init__(self, run_id: str = None):
+        self.run_id = run_id
+        self.thread_id: Optional[str] = None
+        self.run: Optional[Run] = None
+        self.run_step_id: Optional[str] = None
+
+    @property
+    def status(self) -> Optional[str]:
+        return self.run.status if self.run else None
+
+    @property
+    def requires_action(self) -> bool:
+        return (
+            self.status == "requires_action"
+            and self.run.required_action is not None
+            and self.run.required_action.type == "submit_tool_outputs"
+        )
+
+    @property
+    def is_complete(self) -> bool:
+        return self.status == "completed"
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def tool_calls(self) -> list:
+        """
+        The function tool calls the run is waiting on, as listed by the
+        `requires_action` event.
+        """
+        if not self.requires_action:
+            return []
+        return self.run.required_action.submit_tool_outputs.tool_calls
+
+    def on_event(self, event: AssistantStreamEvent):
+        if event.event == "thread.created":
+            self.thread_id = event.data.id
+        elif event.event.startswith("thread.run.step."):
+            self.run_step_id = event.data.id
+            self.run_id = getattr(event.data, "run_id", None) or self.run_id
+        elif event.event.startswith("thread.run."):
+            self.run = event.data
+            self.run_id = event.data.id
+            self.thread_id = event.data.thread_id
+
+
+class StreamSpans:
+    """
+    Spans for the phases of a streamed run: the wait for the first event, each
+    run step and each message, children of the span current when the stream
+    was opened.
+    """
+
+    def __init__(self):
+        self.parent = tracer.current_span
+        self.waiting: Optional[Span] = tracer.start_span(
+            "stream.first_event", parent=self.parent
+        )
+        self.steps: dict[str, Span] = {}
+        self.messages: dict[str, Span] = {}
+        self.events = meter.counter("stream.events")
+
+    def on_event(self, event: AssistantStreamEvent):
+        self.events.add(type=event.event)
+        if self.waiting:
+            self.waiting.set_attribute("event", event.event)
+            self.waiting.end()
+            self.waiting = None
+
+        name = event.event
+        if name == "thread.run.step.created":
+            self.steps[event.data.id] = tracer.start_span(
+                "stream.run_step", parent=self.parent, type=event.data.type
+            )
+        elif name.startswith("thread.run.step.") and name != "thread.run.step.delta":
+            self._end(self.steps, event.data.id, name)
+        elif name == "thread.message.created":
+            self.messages[event.data.id] = tracer.start_span(
+                "stream.message", parent=self.parent
+            )
+        elif name in ("thread.message.completed", "thread.message.incomplete"):
+            self._end(self.messages, event.data.id, name)
+        elif name == "thread.run.requires_action":
+            # The stream ends here, the tool call step completes on the stream
+            # of the submitted outputs.
+            for id in list(self.steps):
+                self._end(self.steps, id, name)
+
+    def _end(self, spans: dict[str, Span], id: str, name: str):
+        status = name.rsplit(".", 1)[-1]
+        if id in spans and status not in ("in_progress", "created"):
+            span = spans.pop(id)
+            span.set_attribute("status", status)
+            span.end()
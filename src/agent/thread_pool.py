@@ -0,0 +1,140 @@
+import time, logging, threading
+from typing import Optional
+from collections import deque
+from openai import OpenAI
+from pydantic import BaseModel
+
+__all__ = ["ThreadPool", "ThreadPoolStats"]
+
+Log = logging.getLogger("ThreadPool")
+
+
+class ThreadPoolStats(BaseModel):
+
+    hits: int = 0
+    misses: int = 0
+    """
+    Takes from an empty pool, whose conversations create their thread with
+    their first run instead.
+    """
+
+    created: int = 0
+    failures: int = 0
+    available: int = 0
+
+    refill_lag: float = 0.0
+    """
+    Mean seconds between a thread being taken and its replacement being ready.
+    """
+
+    max_refill_lag: float = 0.0
+
+
+class ThreadPool:
+    """
+    Keeps `size` empty Assistants threads created ahead of time, so new
+    conversations start with a thread without waiting for one. Taken threads
+    are replaced in the background.
+    """
+
+    def __init__(self, client: OpenAI, size: int = 8, max_backoff: float = 60):
+        self.client = client
+        self.size = size
+        self.max_backoff = max_backoff
+        self.threads: deque[str] = deque()
+        self.taken_at: deque[float] = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self._stats = ThreadPoolStats()
+        self._lag_total = 0.0
+        self._refills = 0
+
+        self.worker = threading.Thread(
+            target=self._refill, name="ThreadPool", daemon=True
+        )
+        self.worker.start()
+
+    @property
+    def stats(self) -> ThreadPoolStats:
+        with self.condition:
+            return self._stats.model_copy(update={"available": len(self.threads)})
+
+    def take(self) -> Optional[str]:
+        """
+        Returns the id of a pre-created thread, or None if none is ready.
+        """
+        with self.condition:
+            if not self.threads:
+                self._stats.misses += 1
+                return None
+
+            self._stats.hits += 1
+            self.taken_at.append(time.monotonic())
+            self.condition.notify()
+            return self.threads.popleft()
+
+    def close(self, delete: bool = True):
+        """
+        Stops refilling, and with `delete` deletes the threads nobody took.
+        """
+        with self.condition:
+            self.closed = True
+            threads, self.threads = list(self.threads), deque()
+            self.condition.notify()
+
+        for thread_id in threads if delete else []:
+            try:
+                self.client.beta.threads.delete(thread_id)
+            except Exception:
+                Log.exception("Failed to delete thread %s", thread_id)
+
+    # Mark: - Private
+
+    def _refill(self):
+        backoff = 0.0
+        while True:
+            with self.condition:
+                while not self.closed and len(self.threads) >= self.size:
+                    self.condition.wait()
+                if self.closed:
+                    return
+
+            if backoff:
+                # Woken early by close().
+                with self.condition:
+                    if self.condition.wait_for(lambda: self.closed, timeout=backoff):
+                        return
+
+            try:
+                thread = self.client.beta.threads.create()
+            except Exception:
+                backoff = min(max(1.0, backoff * 2), self.max_backoff)
+                with self.condition:
+                    self._stats.failures += 1
+                Log.exception("Failed to create a thread, retrying in %ss", backoff)
+                continue
+            backoff = 0.0
+
+            with self.condition:
+                closed = self.closed
+                if not closed:
+                    self.threads.append(thread.id)
+                self._stats.created += 1
+                if self.taken_at:
+                    self._record_lag(time.monotonic() - self.taken_at.popleft())
+
+            if closed:
+                # Created while closing, nobody will take it.
+                try:
+                    self.client.beta.threads.delete(thread.id)
+                except Exception:
+                    Log.exception("Failed to delete thread %s", thread.id)
+                return
+            Log.debug("Thread created > %s", thread.id)
+
+    def _record_lag(self, lag: float):
+        # Must be called with self.condition held.
+        self._lag_total += lag
+        self._refills += 1
+        self._stats.refill_lag = self._lag_total / self._refills
+        self._stats.max_refill_lag = max(self._stats.max_refill_lag, lag)
@@ -0,0 +1,210 @@
+import uuid, asyncio, logging
+from typing import Optional, override
+import openai
+from openai import AsyncOpenAI
+from .cache import ToolCache
+from .uploads import UploadCache, upload_cache
+from .context import current_conversation
+from .tracing import tracer
+from .budget import OutputBudget
+from .tools.fetch_tool_output import FetchToolOutput
+from .registry import Registry
+from .conductor import StreamHandler, PendingMessage
+from .executor import AsyncToolExecutor, ToolCallResult
+from .agent import (
+    AsyncAgent,
+    AsyncAgentEventHandler,
+    AgentToolCall,
+    AgentToolCallOutput,
+    ThreadPool,
+)
+from .agent.config import AgentConfiguration, RunConfiguration
+
+Log = logging.getLogger("AsyncConductor")
+
+__all__ = ["AsyncConductor"]
+
+
+class AsyncConductor:
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        config: AgentConfiguration,
+        stream_handler: StreamHandler,
+        thread_id: str = None,
+        thread_pool: ThreadPool = None,
+        max_tool_concurrency: int = 8,
+        tool_cache: ToolCache = None,
+        uploads: UploadCache = None,
+        output_budget: Optional[int] = 16_000,
+        max_output_tokens: int = 4_000,
+    ):
+        self.client = client
+        self.agent = AsyncAgent(
+            client=client, config=config, thread_id=thread_id, thread_pool=thread_pool
+        )
+        self.registry = Registry()
+        self.executor = AsyncToolExecutor(
+            registry=self.registry,
+            max_concurrency=max_tool_concurrency,
+            cache=tool_cache,
+        )
+        self.stream_handler = stream_handler
+        self.output_budget = output_budget
+        """
+        Tokens of tool output submitted per run before outputs are spilled. None
+        submits outputs as they are.
+        """
+        self.max_output_tokens = max_output_tokens
+        self.uploads = uploads or upload_cache
+        self.pending_messages: list[PendingMessage] = []
+        self.conversation_id = uuid.uuid4().hex
+        self.tool_call_results: list[ToolCallResult] = []
+        self.api_requests = 0
+
+    async def add_message(
+        self, text: str = None, image_file: str = None, image_files: list[str] = None
+    ):
+        """
+        Queues a user message, sent along with the next run. Images are
+        uploaded right away, concurrently, and only if their content wasn't
+        uploaded before.
+        """
+        paths = [path for path in [image_file, *(image_files or [])] if path]
+        with tracer.span("conductor.add_message", images=len(paths)):
+            file_ids = await self._upload(paths)
+        self.pending_messages.append(PendingMessage(text, paths, file_ids))
+
+    async def run(
+        self,
+        config: RunConfiguration = RunConfiguration(
+            instructions=None, parallel_tool_calls=True
+        ),
+    ):
+        event_handler = AsyncAgentHandler(
+            executor=self.executor,
+            stream_handler=self.stream_handler,
+            budget=self._budget(),
+        )
+
+        messages, self.pending_messages = self.pending_messages, []
+
+        conversation = current_conversation.set(self.conversation_id)
+        try:
+            with tracer.span("conductor.run", conversation=self.conversation_id):
+                await self._run(config, event_handler, messages)
+        except Exception as e:
+            Log.exception(e)
+            # Also errors raised outside the stream, e.g. opening it.
+            await event_handler.on_error(e)
+            if not event_handler.run_id:
+                # Nothing reached the thread, the messages go with the next run.
+                self.pending_messages = messages + self.pending_messages
+        finally:
+            current_conversation.reset(conversation)
+
+        self.tool_call_results = event_handler.tool_call_results
+        self.api_requests = self.agent.reset_api_requests()
+        Log.info("API requests this turn > %s", self.api_requests)
+
+    async def _run(
+        self,
+        config: RunConfiguration,
+        event_handler: "AsyncAgentHandler",
+        messages: list[PendingMessage],
+    ):
+        try:
+            await self.agent.run(
+                config=config,
+                tools=self.registry.agent_tools,
+                event_handler=event_handler,
+                messages=[message.content for message in messages],
+            )
+        except (openai.NotFoundError, openai.BadRequestError):
+            file_ids = [id for message in messages for id in message.file_ids]
+            if event_handler.run_id or not file_ids:
+                raise
+
+            # A cached file may have been deleted since it was last verified.
+            Log.info("Run rejected, uploading the images of its messages again.")
+            await asyncio.to_thread(self.uploads.forget, self.client, file_ids)
+            for message in messages:
+                message.file_ids = await self._upload(message.paths)
+            await self.agent.run(
+                config=config,
+                tools=self.registry.agent_tools,
+                event_handler=event_handler,
+                messages=[message.content for message in messages],
+            )
+
+    async def _upload(self, paths: list[str]) -> list[str]:
+        if not paths:
+            return []
+        file_ids, api_requests = await self.uploads.aupload(self.client, paths)
+        self.agent.api_requests += api_requests
+        return file_ids
+
+    def _budget(self) -> Optional[OutputBudget]:
+        if self.output_budget is None:
+            return None
+
+        # Spilled outputs are only useful if the model can page through them.
+        fetch_tool = FetchToolOutput.name()
+        if self.registry.registered_tools and (
+            fetch_tool not in self.registry.registered_tools
+        ):
+            self.registry.register_tool(fetch_tool)
+
+        return OutputBudget(
+            max_tokens=self.output_budget, max_output_tokens=self.max_output_tokens
+        )
+
+
+class AsyncAgentHandler(AsyncAgentEventHandler):
+
+    def __init__(
+        self,
+        executor: AsyncToolExecutor,
+        stream_handler: StreamHandler,
+        budget: Optional[OutputBudget] = None,
+    ):
+        super().__init__()
+        self.executor = executor
+        self.stream_handler = stream_handler
+        self.budget = budget
+        self.tool_call_results: list[ToolCallResult] = []
+        self.error: Optional[Exception] = None
+        """
+        The error reported to the stream handler, which streams and the run
+        itself may each pass on.
+        """
+
+    @override
+    async def on_tool_calls(
+        self, tool_calls: list[AgentToolCall]
+    ) -> list[AgentToolCallOutput]:
+        with tracer.span("conductor.tool_calls", count=len(tool_calls)):
+            results = await self.executor.execute(tool_calls)
+            if self.budget:
+                results = self.budget.apply(results)
+        self.tool_call_results.extend(results)
+        return [result.tool_call_output for result in results]
+
+    @override
+    async def on_error(self, error: Exception):
+        if error is not self.error:
+            self.error = error
+            self.stream_handler.on_error(error)
+
+    @override
+    async def on_text_started(self):
+        self.stream_handler.on_text_started()
+
+    @override
+    async def on_text_changed(self, delta: str):
+        self.stream_handler.on_text_changed(delta)
+
+    @override
+    async def on_text_done(self, text: str):
+        self.stream_handler.on_text_done(text)
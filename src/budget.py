@@ -0,0 +1,87 @@
+import logging
+from .spill import SpillStore, spill_store
+from .tokens import num_tokens, token_pages, token_pages_with_total
+from .executor import ToolCallResult
+from .tools.fetch_tool_output import FetchToolOutput
+
+__all__ = ["OutputBudget"]
+
+Log = logging.getLogger("OutputBudget")
+
+
+class OutputBudget:
+    """
+    Token budget for the tool outputs submitted during one run. Outputs over
+    the per-output limit, or over what is left of the run's budget, are spilled
+    to the store and replaced with a summary and a handle the model can page
+    through with `fetch_tool_output`.
+    """
+
+    preview_tokens = 200
+
+    def __init__(
+        self,
+        max_tokens: int = 16_000,
+        max_output_tokens: int = 4_000,
+        store: SpillStore = spill_store,
+    ):
+        self.max_tokens = max_tokens
+        self.max_output_tokens = max_output_tokens
+        self.store = store
+        self.used = 0
+        self.spilled = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.max_tokens - self.used)
+
+    def apply(self, results: list[ToolCallResult]) -> list[ToolCallResult]:
+        return [self._apply(result) for result in results]
+
+    # Mark: - Private
+
+    def _apply(self, result: ToolCallResult) -> ToolCallResult:
+        # Counted while splitting the output into the pages it is fetched in,
+        # so an output that is spilled is only tokenized once.
+        pages, tokens = token_pages_with_total(
+            result.output, FetchToolOutput.page_tokens
+        )
+
+        # Pages of spilled outputs are already bounded, spilling them again
+        # would only hand out another handle.
+        if (
+            result.error
+            or result.name == FetchToolOutput.name()
+            or tokens <= min(self.max_output_tokens, self.remaining)
+        ):
+            self.used += tokens
+            return result
+
+        handle = self.store.put(result.output)
+        FetchToolOutput.add_pages(handle, pages)
+        output = self._summary(result, pages, handle, tokens)
+        self.used += num_tokens(output)
+        self.spilled += 1
+        Log.info("Spilled output of %s (%d tokens) > %s", result.name, tokens, handle)
+
+        return result.model_copy(update={"output": output, "spill_handle": handle})
+
+    def _summary(
+        self,
+        result: ToolCallResult,
+        pages: list[tuple[int, int]],
+        handle: str,
+        tokens: int,
+    ) -> str:
+        output = result.output
+        # Only the first page is tokenized again, for the preview.
+        first = output[pages[0][0] : pages[0][1]]
+        start, end = token_pages(first, self.preview_tokens)[0]
+        preview = first[start:end] + ("\n..." if end < len(output) else "")
+
+        return (
+            f"[Output of {result.name} is too large to include: {tokens} tokens, "
+            f"{output.count(chr(10)) + 1} lines, {len(output)} characters. It is "
+            f'stored as handle "{handle}"; call {FetchToolOutput.name()} with '
+            f"pages 1 to {len(pages)} to read it. Preview:]\n{preview}"
+        )
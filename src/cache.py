@@ -0,0 +1,314 @@
+import os, json, time, asyncio, logging, threading
+from enum import Enum
+from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import Future
+from pydantic import BaseModel
+from .tracing import tracer
+
+__all__ = ["CacheMode", "CachePolicy", "CacheStats", "ToolCache"]
+
+Log = logging.getLogger("ToolCache")
+
+
+class CacheMode(str, Enum):
+    NEVER = "never"
+    MTIME = "mtime"
+    TTL = "ttl"
+
+
+class CachePolicy(BaseModel):
+    """
+    How results of a tool may be cached.
+    """
+
+    mode: CacheMode = CacheMode.NEVER
+
+    ttl: Optional[float] = None
+    """
+    Seconds a result stays fresh. Only used with `CacheMode.TTL`.
+    """
+
+    paths: list[str] = []
+    """
+    Names of the arguments holding filesystem paths. With `CacheMode.MTIME` a
+    result is only served while the mtime and size of these paths are unchanged.
+    """
+
+    invalidates: list[str] = []
+    """
+    Names of the arguments holding paths the tool mutates. Cached results that
+    depend on these paths are dropped once the tool has run.
+    """
+
+    @classmethod
+    def never(cls, invalidates: list[str] = []) -> "CachePolicy":
+        return cls(mode=CacheMode.NEVER, invalidates=invalidates)
+
+    @classmethod
+    def mtime(cls, paths: list[str]) -> "CachePolicy":
+        return cls(mode=CacheMode.MTIME, paths=paths)
+
+    @classmethod
+    def time_to_live(cls, ttl: float) -> "CachePolicy":
+        return cls(mode=CacheMode.TTL, ttl=ttl)
+
+
+class CacheStats(BaseModel):
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    """
+    Calls that waited on an identical call already in flight.
+    """
+
+    evictions: int = 0
+    invalidations: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class Entry:
+
+    def __init__(
+        self,
+        output: str,
+        validators: list[tuple],
+        expires_at: Optional[float],
+    ):
+        self.output = output
+        self.validators = validators
+        self.expires_at = expires_at
+
+
+class ToolCache:
+    """
+    LRU cache of tool outputs keyed by tool name and canonicalized arguments.
+    Identical calls issued while one is in flight share its result.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_size: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries: OrderedDict[str, Entry] = OrderedDict()
+        self.paths: dict[str, set[str]] = {}
+        self.in_flight: dict[str, Future] = {}
+        self.async_in_flight: dict[str, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        self.size = 0
+        self._stats = CacheStats()
+
+    @property
+    def stats(self) -> CacheStats:
+        with self.lock:
+            return self._stats.model_copy(
+                update={"entries": len(self.entries), "size": self.size}
+            )
+
+    def call(self, tool, args: dict) -> str:
+        policy: CachePolicy = tool.cache_policy
+        if policy.mode == CacheMode.NEVER:
+            try:
+                return tool.call(args)
+            finally:
+                self._invalidate_args(policy, args)
+
+        key = self._key(tool, policy, args)
+        with self.lock:
+            entry = self._lookup(key)
+            if entry:
+                _annotate("hit")
+                return entry.output
+
+            future = self.in_flight.get(key)
+            if future:
+                self._stats.coalesced += 1
+            else:
+                self._stats.misses += 1
+                self.in_flight[key] = Future()
+
+        _annotate("coalesced" if future else "miss")
+        if future:
+            return future.result()
+
+        return self._fill(key, policy, args, tool)
+
+    async def acall(self, tool, args: dict) -> str:
+        policy: CachePolicy = tool.cache_policy
+        if policy.mode == CacheMode.NEVER:
+            try:
+                return await tool.acall(args)
+            finally:
+                self._invalidate_args(policy, args)
+
+        key = self._key(tool, policy, args)
+        with self.lock:
+            entry = self._lookup(key)
+            if entry:
+                _annotate("hit")
+                return entry.output
+
+            future = self.async_in_flight.get(key)
+            if future:
+                self._stats.coalesced += 1
+            else:
+                self._stats.misses += 1
+                self.async_in_flight[key] = asyncio.get_running_loop().create_future()
+
+        _annotate("coalesced" if future else "miss")
+        if future:
+            return await future
+
+        validators = _validators(policy, args)
+        future = self.async_in_flight[key]
+        try:
+            output = await tool.acall(args)
+        except BaseException as e:
+            with self.lock:
+                self.async_in_flight.pop(key, None)
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting.
+            raise
+
+        with self.lock:
+            self._store(key, policy, args, output, validators)
+            self.async_in_flight.pop(key, None)
+        future.set_result(output)
+        return output
+
+    def invalidate(self, path: str):
+        """
+        Drops results that depend on `path` or on one of its parent directories.
+        """
+        path = _normalize(path)
+        with self.lock:
+            while True:
+                for key in list(self.paths.get(path, ())):
+                    if self._pop(key):
+                        self._stats.invalidations += 1
+                        Log.debug("Invalidated > %s", key)
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.paths.clear()
+            self.size = 0
+
+    # Mark: - Private
+
+    def _fill(self, key: str, policy: CachePolicy, args: dict, tool) -> str:
+        # Validators are captured before the call, so a change that lands while
+        # the tool runs invalidates the entry instead of being masked by it.
+        validators = _validators(policy, args)
+        future = self.in_flight[key]
+        try:
+            output = tool.call(args)
+        except BaseException as e:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self._store(key, policy, args, output, validators)
+            self.in_flight.pop(key, None)
+        future.set_result(output)
+        return output
+
+    def _key(self, tool, policy: CachePolicy, args: dict) -> str:
+        canonical = dict(args)
+        for name in policy.paths:
+            if isinstance(canonical.get(name), str):
+                canonical[name] = _normalize(canonical[name])
+        arguments = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+        return f"{tool.name()}:{arguments}"
+
+    def _lookup(self, key: str) -> Optional[Entry]:
+        # Must be called with self.lock held.
+        entry = self.entries.get(key)
+        if entry and (
+            (entry.expires_at is not None and time.monotonic() >= entry.expires_at)
+            or any(_stat(path) != stamp for path, stamp in entry.validators)
+        ):
+            self._pop(key)
+            entry = None
+
+        if entry:
+            self.entries.move_to_end(key)
+            self._stats.hits += 1
+        return entry
+
+    def _pop(self, key: str) -> Optional[Entry]:
+        # Must be called with self.lock held.
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.size -= len(entry.output)
+            for path, _ in entry.validators:
+                keys = self.paths.get(path)
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del self.paths[path]
+        return entry
+
+    def _store(
+        self, key: str, policy: CachePolicy, args: dict, output, validators: list
+    ):
+        # Must be called with self.lock held.
+        if not isinstance(output, str) or len(output) > self.max_size:
+            return
+
+        expires_at = None
+        if policy.mode == CacheMode.TTL and policy.ttl is not None:
+            expires_at = time.monotonic() + policy.ttl
+
+        self._pop(key)
+        self.entries[key] = Entry(output, validators, expires_at)
+        self.size += len(output)
+        for path, _ in validators:
+            self.paths.setdefault(path, set()).add(key)
+
+        while len(self.entries) > self.max_entries or self.size > self.max_size:
+            self._pop(next(iter(self.entries)))
+            self._stats.evictions += 1
+
+    def _invalidate_args(self, policy: CachePolicy, args: dict):
+        for name in policy.invalidates:
+            if isinstance(args.get(name), str):
+                self.invalidate(args[name])
+
+
+def _annotate(outcome: str):
+    # Tags the current span, i.e. the tool call.
+    span = tracer.current_span
+    if span:
+        span.set_attribute("cache", outcome)
+
+
+def _normalize(path: str) -> str:
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def _stat(path: str) -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _validators(policy: CachePolicy, args: dict) -> list[tuple]:
+    if policy.mode != CacheMode.MTIME:
+        return []
+
+    validators = []
+    for name in policy.paths:
+        if isinstance(args.get(name), str):
+            path = _normalize(args[name])
+            validators.append((path, _stat(path)))
+    return validators
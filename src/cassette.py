@@ -0,0 +1,424 @@
+import gzip, json, time, codecs, logging, threading
+from enum import Enum
+from typing import Annotated, Any, Iterator, Literal, Optional, Union
+from collections import defaultdict, deque
+import httpx
+import requests
+from openai import OpenAI, DefaultHttpxClient
+from pydantic import BaseModel, Field, TypeAdapter
+
+__all__ = ["Cassette", "CassetteMode", "CassetteError"]
+
+Log = logging.getLogger("Cassette")
+
+VERSION = 1
+
+# Hop-by-hop and framing headers no longer describe a replayed body.
+_dropped_headers = {
+    "connection",
+    "content-encoding",
+    "content-length",
+    "keep-alive",
+    "set-cookie",
+    "transfer-encoding",
+}
+
+
+class CassetteMode(str, Enum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class CassetteError(Exception):
+    """
+    Raised when replaying a request, tool call or turn that wasn't recorded.
+    """
+
+
+class OpenAIInteraction(BaseModel):
+
+    type: Literal["openai"] = "openai"
+    at: float
+    """
+    Seconds from the start of the recording to the request.
+    """
+
+    method: str
+    url: str
+    request: Optional[str] = None
+    """
+    The JSON body of the request, if it had one.
+    """
+
+    status: int
+    headers: dict[str, str]
+    latency: float
+    """
+    Seconds until the response headers arrived.
+    """
+
+    chunks: list[tuple[float, str]] = []
+    """
+    The body as it arrived: seconds after the headers, and text.
+    """
+
+
+class ToolInteraction(BaseModel):
+
+    type: Literal["tool"] = "tool"
+    at: float
+    name: str
+    arguments: str
+    output: str
+    error: Optional[str] = None
+    duration: float
+
+
+class HttpInteraction(BaseModel):
+    """
+    A response a `DataClient` got from a provider.
+    """
+
+    type: Literal["http"] = "http"
+    at: float
+    method: str
+    url: str
+    params: Optional[dict] = None
+    data: Optional[Any] = None
+    status: int
+    headers: dict[str, str]
+    body: str
+    latency: float
+
+
+class TurnInteraction(BaseModel):
+    """
+    The messages and configuration of a `Conductor.run`.
+    """
+
+    type: Literal["turn"] = "turn"
+    at: float
+    messages: list[dict]
+    config: dict
+
+
+Interaction = Annotated[
+    Union[OpenAIInteraction, ToolInteraction, HttpInteraction, TurnInteraction],
+    Field(discriminator="type"),
+]
+
+_interaction = TypeAdapter(Interaction)
+
+
+class Cassette:
+    """
+    Everything a `Conductor` session exchanged with the outside world: OpenAI
+    requests and their streamed responses, tool calls, `DataClient` responses
+    and the turns that caused them. Stored as JSON lines, gzipped when the path
+    ends in `.gz`.
+
+    Recording, the conductor's OpenAI client is wrapped to capture requests,
+    and tool calls and `DataClient` requests made during its runs are captured
+    through `current_cassette`. Replaying, responses, tool outputs and their
+    timing come from the cassette instead, at `speed` times the recorded
+    speed, or as fast as possible when `speed` is None. Requests are matched
+    by method and URL, tool calls by name and arguments, each in recorded
+    order.
+
+    Requests made with other clients aren't recorded, so a conductor with a
+    cassette doesn't take threads from a `ThreadPool`, and a `thread_id` passed
+    to it must be the same when replaying as when recording.
+    """
+
+    def __init__(self, path: str, mode: CassetteMode, speed: Optional[float] = 1.0):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.interactions: list[BaseModel] = []
+        self.queues: dict[tuple, deque] = defaultdict(deque)
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+        if mode == CassetteMode.REPLAY:
+            self._load()
+
+    @classmethod
+    def record(cls, path: str) -> "Cassette":
+        return cls(path, CassetteMode.RECORD)
+
+    @classmethod
+    def replay(cls, path: str, speed: Optional[float] = 1.0) -> "Cassette":
+        return cls(path, CassetteMode.REPLAY, speed=speed)
+
+    @property
+    def is_replaying(self) -> bool:
+        return self.mode == CassetteMode.REPLAY
+
+    @property
+    def turns(self) -> list[TurnInteraction]:
+        return [i for i in self.interactions if isinstance(i, TurnInteraction)]
+
+    @property
+    def remaining(self) -> int:
+        """
+        Recorded requests and tool calls not replayed yet.
+        """
+        with self.lock:
+            return sum(len(queue) for queue in self.queues.values())
+
+    def wrap(self, client: OpenAI) -> OpenAI:
+        """
+        A copy of `client` whose requests are recorded, or answered from the
+        cassette without touching the network.
+        """
+        transport = (
+            ReplayTransport(self)
+            if self.is_replaying
+            else RecordingTransport(httpx.HTTPTransport(), self)
+        )
+        return client.with_options(http_client=DefaultHttpxClient(transport=transport))
+
+    def save(self):
+        if self.is_replaying:
+            return
+
+        with self.lock:
+            lines = [
+                json.dumps({"version": VERSION}),
+                *(i.model_dump_json(exclude_none=True) for i in self.interactions),
+            ]
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "wt", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        Log.info("Recorded %d interactions > %s", len(lines) - 1, self.path)
+
+    def record_turn(self, messages: list[dict], config: dict):
+        self._append(TurnInteraction(at=self._now(), messages=messages, config=config))
+
+    def record_tool(
+        self,
+        name: str,
+        arguments: str,
+        output: str,
+        error: Optional[str],
+        duration: float,
+    ):
+        self._append(
+            ToolInteraction(
+                at=self._now() - duration,
+                name=name,
+                arguments=arguments,
+                output=output,
+                error=error,
+                duration=duration,
+            )
+        )
+
+    def replay_tool(self, name: str, arguments: str) -> ToolInteraction:
+        interaction = self._next(("tool", name, arguments))
+        self._sleep(interaction.duration)
+        return interaction
+
+    def record_http(
+        self,
+        method: str,
+        url: str,
+        params: Optional[dict],
+        data: Optional[Any],
+        response: requests.Response,
+    ):
+        latency = response.elapsed.total_seconds()
+        self._append(
+            HttpInteraction(
+                at=self._now() - latency,
+                method=method,
+                url=url,
+                params=params,
+                data=data,
+                status=response.status_code,
+                headers=_headers(response.headers),
+                body=response.content.decode("utf-8", "surrogateescape"),
+                latency=latency,
+            )
+        )
+
+    def replay_http(
+        self, method: str, url: str, params: Optional[dict]
+    ) -> requests.Response:
+        interaction = self._next(("http", method, url, _canonical(params)))
+        self._sleep(interaction.latency)
+
+        response = requests.Response()
+        response.status_code = interaction.status
+        response.headers.update(interaction.headers)
+        response._content = interaction.body.encode("utf-8", "surrogateescape")
+        response.url = url
+        response.encoding = "utf-8"
+        return response
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *args):
+        self.save()
+
+    # Mark: - Private
+
+    def _now(self) -> float:
+        return time.monotonic() - self.started
+
+    def _sleep(self, seconds: float):
+        if self.speed and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def _append(self, interaction: BaseModel):
+        with self.lock:
+            self.interactions.append(interaction)
+
+    def _next(self, key: tuple) -> Any:
+        with self.lock:
+            queue = self.queues.get(key)
+            if not queue:
+                raise CassetteError(f"Nothing recorded for {' '.join(key[:3])}")
+            return queue.popleft()
+
+    def _load(self):
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "rt", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != VERSION:
+                raise CassetteError(f"Unsupported cassette version in {self.path}")
+            interactions = [
+                _interaction.validate_json(line) for line in file if line.strip()
+            ]
+
+        # Interactions are written as they complete, replayed as they started.
+        self.interactions = sorted(interactions, key=lambda i: i.at)
+        for interaction in self.interactions:
+            key = _key(interaction)
+            if key:
+                self.queues[key].append(interaction)
+
+
+class RecordingTransport(httpx.BaseTransport):
+
+    def __init__(self, transport: httpx.BaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # Bodies are recorded as they are read, so they must not be compressed.
+        request.headers["Accept-Encoding"] = "identity"
+        at = self.cassette._now()
+        response = self.transport.handle_request(request)
+
+        interaction = OpenAIInteraction(
+            at=at,
+            method=request.method,
+            url=_path(request.url),
+            request=_body(request),
+            status=response.status_code,
+            headers=_headers(response.headers),
+            latency=self.cassette._now() - at,
+        )
+        stream = RecordingStream(response.stream, interaction, self.cassette)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=stream,
+            extensions=response.extensions,
+        )
+
+    def close(self):
+        self.transport.close()
+
+
+class RecordingStream(httpx.SyncByteStream):
+
+    def __init__(self, stream, interaction: OpenAIInteraction, cassette: Cassette):
+        self.stream = stream
+        self.interaction = interaction
+        self.cassette = cassette
+        self.decoder = codecs.getincrementaldecoder("utf-8")("surrogateescape")
+        self.started = time.monotonic()
+        self.closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.stream:
+            text = self.decoder.decode(chunk)
+            if text:
+                offset = time.monotonic() - self.started
+                self.interaction.chunks.append((offset, text))
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+        if not self.closed:
+            self.closed = True
+            self.cassette._append(self.interaction)
+
+
+class ReplayTransport(httpx.BaseTransport):
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        url = _path(request.url)
+        interaction = self.cassette._next(("openai", request.method, url))
+        self.cassette._sleep(interaction.latency)
+        return httpx.Response(
+            interaction.status,
+            headers=interaction.headers,
+            stream=ReplayStream(interaction, self.cassette),
+        )
+
+
+class ReplayStream(httpx.SyncByteStream):
+
+    def __init__(self, interaction: OpenAIInteraction, cassette: Cassette):
+        self.interaction = interaction
+        self.cassette = cassette
+
+    def __iter__(self) -> Iterator[bytes]:
+        started = time.monotonic()
+        for offset, text in self.interaction.chunks:
+            if self.cassette.speed:
+                delay = offset / self.cassette.speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield text.encode("utf-8", "surrogateescape")
+
+
+def _key(interaction: BaseModel) -> Optional[tuple]:
+    if isinstance(interaction, OpenAIInteraction):
+        return ("openai", interaction.method, interaction.url)
+    if isinstance(interaction, ToolInteraction):
+        return ("tool", interaction.name, interaction.arguments)
+    if isinstance(interaction, HttpInteraction):
+        return (
+            "http",
+            interaction.method,
+            interaction.url,
+            _canonical(interaction.params),
+        )
+    return None
+
+
+def _path(url: httpx.URL) -> str:
+    return url.raw_path.decode("ascii")
+
+
+def _canonical(params: Optional[dict]) -> str:
+    return json.dumps(params or {}, sort_keys=True, default=str)
+
+
+def _headers(headers) -> dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in _dropped_headers}
+
+
+def _body(request: httpx.Request) -> Optional[str]:
+    # Multipart uploads aren't kept, only their responses matter for replay.
+    if not request.headers.get("content-type", "").startswith("application/json"):
+        return None
+    return request.read().decode("utf-8", "surrogateescape")
@@ -1,8 +1,17 @@
-import json, weakref, logging
-from typing import override
+import uuid, weakref, logging
+from typing import Optional, override
+import openai
 from openai import OpenAI
+from .cache import ToolCache
+from .uploads import UploadCache, upload_cache
+from .context import current_conversation, current_cassette
+from .cassette import Cassette
+from .tracing import tracer
+from .budget import OutputBudget
+from .tools.fetch_tool_output import FetchToolOutput
 from .registry import Registry
-from .agent import Agent, AgentEventHandler, AgentToolCall, AgentToolCallOutput
+from .executor import ToolExecutor, ToolCallResult
+from .agent import Agent, AgentEventHandler, AgentToolCall, ThreadPool
 from .agent.config import AgentConfiguration, RunConfiguration
 
 Log = logging.getLogger("Conductor")
@@ -11,39 +20,78 @@ __all__ = ["Conductor", "StreamHandler"]
 
 
 class StreamHandler:
-    
+
     def on_text_started(self):
         pass
 
     def on_text_changed(self, delta: str):
         pass
-    
+
     def on_text_done(self, text: str):
         pass
 
+    def on_error(self, error: Exception):
+        pass
+
 
 class Conductor:
 
     def __init__(
-        self, client: OpenAI, config: AgentConfiguration, stream_handler: StreamHandler
+        self,
+        client: OpenAI,
+        config: AgentConfiguration,
+        stream_handler: StreamHandler,
+        thread_id: str = None,
+        thread_pool: ThreadPool = None,
+        max_tool_workers: int = 8,
+        tool_cache: ToolCache = None,
+        uploads: UploadCache = None,
+        output_budget: Optional[int] = 16_000,
+        max_output_tokens: int = 4_000,
+        cassette: Cassette = None,
     ):
+        self.cassette = cassette
+        """
+        Records the session, or replays a recorded one without network access.
+        """
+        if cassette:
+            client = cassette.wrap(client)
+            # Pooled threads are created by the pool's own client, outside the
+            # cassette, so the session creates its thread with its first run.
+            thread_pool = None
         self.client = client
-        self.agent = Agent(client=client, config=config)
+        self.agent = Agent(
+            client=client, config=config, thread_id=thread_id, thread_pool=thread_pool
+        )
         self.registry = Registry()
+        self.executor = ToolExecutor(
+            registry=self.registry, max_workers=max_tool_workers, cache=tool_cache
+        )
         self.stream_handler = stream_handler
+        self.output_budget = output_budget
+        """
+        Tokens of tool output submitted per run before outputs are spilled. None
+        submits outputs as they are.
+        """
+        self.max_output_tokens = max_output_tokens
+        self.uploads = uploads or upload_cache
+        self.pending_messages: list[PendingMessage] = []
+        self.conversation_id = uuid.uuid4().hex
+        self.tool_call_results: list[ToolCallResult] = []
+        self.api_requests = 0
 
-    def add_message(self, text: str = None, image_file: str = None):
-        content = []
-        if text:
-            content.append({"type": "text", "text": text})
-        if image_file:
-            upl_file = self.client.files.create(
-                file=open(image_file, "rb"), purpose="assistants"
-            )
-            content.append(
-                {"type": "image_file", "image_file": {"file_id": upl_file.id}}
-            )
-        self.agent.add_message(content=content)
+    def add_message(
+        self, text: str = None, image_file: str = None, image_files: list[str] = None
+    ):
+        """
+        Queues a user message, sent along with the next run. Images are
+        uploaded right away, concurrently, and only if their content wasn't
+        uploaded before.
+        """
+        paths = [path for path in [image_file, *(image_files or [])] if path]
+        with tracer.span("conductor.add_message", images=len(paths)):
+            file_ids = self._upload(paths)
+        self.pending_messages.append(PendingMessage(text, paths, file_ids))
 
     def run(
         self,
@@ -52,41 +100,137 @@ class Conductor:
         ),
     ):
         event_handler = AgentHandler(
-            agent=self.agent, registry=self.registry, stream_handler=self.stream_handler
+            agent=self.agent,
+            executor=self.executor,
+            stream_handler=self.stream_handler,
+            budget=self._budget(),
         )
 
+        messages, self.pending_messages = self.pending_messages, []
+        if self.cassette and not self.cassette.is_replaying:
+            self.cassette.record_turn(
+                [message.to_dict() for message in messages], config.model_dump()
+            )
+
+        conversation = current_conversation.set(self.conversation_id)
+        cassette = current_cassette.set(self.cassette)
+        try:
+            with tracer.span("conductor.run", conversation=self.conversation_id):
+                self._run(config, event_handler, messages)
+        except Exception as e:
+            Log.exception(e)
+            # Also errors raised outside the stream, e.g. opening it.
+            event_handler.on_error(e)
+            if not event_handler.run_id:
+                # Nothing reached the thread, the messages go with the next run.
+                self.pending_messages = messages + self.pending_messages
+        finally:
+            current_cassette.reset(cassette)
+            current_conversation.reset(conversation)
+
+        self.tool_call_results = event_handler.tool_call_results
+        self.api_requests = self.agent.reset_api_requests()
+        Log.info("API requests this turn > %s", self.api_requests)
+
+    def replay(self):
+        """
+        Runs the turns recorded in the cassette again, with the messages they
+        sent. Recorded image uploads are reused rather than uploaded.
+        """
+        if not (self.cassette and self.cassette.is_replaying):
+            raise ValueError("The conductor has no cassette to replay.")
+
+        for turn in self.cassette.turns:
+            self.pending_messages.extend(
+                PendingMessage(**message) for message in turn.messages
+            )
+            self.run(config=RunConfiguration(**turn.config))
+
+    def _run(
+        self,
+        config: RunConfiguration,
+        event_handler: "AgentHandler",
+        messages: list["PendingMessage"],
+    ):
         try:
             self.agent.run(
                 config=config,
                 tools=self.registry.agent_tools,
                 event_handler=weakref.proxy(event_handler),
+                messages=[message.content for message in messages],
             )
-        except Exception as e:
-            Log.exception(e)
+        except (openai.NotFoundError, openai.BadRequestError):
+            file_ids = [id for message in messages for id in message.file_ids]
+            if event_handler.run_id or not file_ids:
+                raise
+
+            # A cached file may have been deleted since it was last verified.
+            Log.info("Run rejected, uploading the images of its messages again.")
+            self.uploads.forget(self.client, file_ids)
+            for message in messages:
+                message.file_ids = self._upload(message.paths)
+            self.agent.run(
+                config=config,
+                tools=self.registry.agent_tools,
+                event_handler=weakref.proxy(event_handler),
+                messages=[message.content for message in messages],
+            )
+
+    def _upload(self, paths: list[str]) -> list[str]:
+        if not paths:
+            return []
+        file_ids, api_requests = self.uploads.upload(self.client, paths)
+        self.agent.api_requests += api_requests
+        return file_ids
+
+    def _budget(self) -> Optional[OutputBudget]:
+        if self.output_budget is None:
+            return None
+
+        # Spilled outputs are only useful if the model can page through them.
+        fetch_tool = FetchToolOutput.name()
+        if self.registry.registered_tools and (
+            fetch_tool not in self.registry.registered_tools
+        ):
+            self.registry.register_tool(fetch_tool)
+
+        return OutputBudget(
+            max_tokens=self.output_budget, max_output_tokens=self.max_output_tokens
+        )
 
 
 class AgentHandler(AgentEventHandler):
 
-    def __init__(self, agent: Agent, registry: Registry, stream_handler: StreamHandler):
+    def __init__(
+        self,
+        agent: Agent,
+        executor: ToolExecutor,
+        stream_handler: StreamHandler,
+        budget: Optional[OutputBudget] = None,
+    ):
+        super().__init__()
         self.agent = agent
-        self.registry = registry
+        self.executor = executor
         self.stream_handler = stream_handler
+        self.budget = budget
+        self.tool_call_results: list[ToolCallResult] = []
+        self.error: Optional[Exception] = None
+        """
+        The error reported to the stream handler, which streams and the run
+        itself may each pass on.
+        """
 
     @override
     def on_tool_calls(self, tool_calls: list[AgentToolCall]):
-        outputs = []
-        for tool_call in tool_calls:
-            tool = self.registry.registered_tools.get(tool_call.name)
-            args = json.loads(tool_call.arguments)
-            output = tool.call(args)
-
-            outputs.append(
-                AgentToolCallOutput(tool_call_id=tool_call.id, output=output)
-            )
+        with tracer.span("conductor.tool_calls", count=len(tool_calls)):
+            results = self.executor.execute(tool_calls)
+            if self.budget:
+                results = self.budget.apply(results)
+        self.tool_call_results.extend(results)
 
         self.agent.subbmit_tool_call_outputs(
             run_id=self.run_id,
-            tool_call_outputs=outputs,
+            tool_call_outputs=[result.tool_call_output for result in results],
             event_handler=weakref.proxy(self),
         )
         return super().on_tool_calls(tool_calls)
@@ -97,6 +241,9 @@ class AgentHandler(AgentEventHandler):
 
     @override
     def on_error(self, error: Exception):
+        if error is not self.error:
+            self.error = error
+            self.stream_handler.on_error(error)
         return super().on_error(error)
 
     @override
@@ -112,4 +259,27 @@ class AgentHandler(AgentEventHandler):
     @override
     def on_text_done(self, text: str):
         self.stream_handler.on_text_done(text)
-        return super().on_text_done(text)
\ No newline at end of file
+        return super().on_text_done(text)
+
+
+class PendingMessage:
+    """
+    A user message waiting for the next run, which adds it to the thread.
+    """
+
+    def __init__(self, text: Optional[str], paths: list[str], file_ids: list[str]):
+        self.text = text
+        self.paths = paths
+        self.file_ids = file_ids
+
+    def to_dict(self) -> dict:
+        return {"text": self.text, "paths": self.paths, "file_ids": self.file_ids}
+
+    @property
+    def content(self) -> list[dict]:
+        content = []
+        if self.text:
+            content.append({"type": "text", "text": self.text})
+        for file_id in self.file_ids:
+            content.append({"type": "image_file", "image_file": {"file_id": file_id}})
+        return content
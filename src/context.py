@@ -0,0 +1,19 @@
+from typing import Optional
+from contextvars import ContextVar
+
+__all__ = ["current_conversation", "current_cassette"]
+
+current_conversation: ContextVar[str] = ContextVar("conversation", default="default")
+"""
+The conversation a tool call is made on behalf of. Set by the conductors for
+the duration of a run, and used e.g. to share a provider's rate limit fairly
+between conversations.
+"""
+
+current_cassette: ContextVar[Optional["Cassette"]] = ContextVar(
+    "cassette", default=None
+)
+"""
+The cassette tool calls and `DataClient` requests are recorded to or replayed
+from. Set by the conductor for the duration of a run.
+"""
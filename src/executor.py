@@ -0,0 +1,162 @@
+import asyncio, json, time, logging, contextvars
+from typing import Optional
+from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from .cache import ToolCache
+from .context import current_cassette
+from .tracing import tracer
+from .registry import Registry
+from .agent import AgentToolCall, AgentToolCallOutput
+
+__all__ = ["ToolExecutor", "AsyncToolExecutor", "ToolCallResult"]
+
+Log = logging.getLogger("ToolExecutor")
+
+
+class ToolCallResult(BaseModel):
+
+    tool_call_id: str
+    name: str
+    output: str
+    error: Optional[str] = None
+    duration: float
+    """
+    Wall time of the tool call, in seconds.
+    """
+
+    spill_handle: Optional[str] = None
+    """
+    Handle of the full output when it was replaced by a summary to stay within
+    the run's output budget.
+    """
+
+    @property
+    def tool_call_output(self) -> AgentToolCallOutput:
+        return AgentToolCallOutput(tool_call_id=self.tool_call_id, output=self.output)
+
+
+class ToolExecutor:
+
+    def __init__(
+        self, registry: Registry, max_workers: int = 8, cache: ToolCache = None
+    ):
+        self.registry = registry
+        self.max_workers = max_workers
+        self.cache = cache or ToolCache()
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ToolExecutor"
+        )
+
+    def execute(self, tool_calls: list[AgentToolCall]) -> list[ToolCallResult]:
+        """
+        Runs all tool calls of a step at once. Results keep the order of `tool_calls`.
+        """
+        if len(tool_calls) == 1:
+            return [self._call(tool_calls[0])]
+
+        # Worker threads don't inherit context variables, e.g. the conversation.
+        futures = [
+            self.pool.submit(contextvars.copy_context().run, self._call, tool_call)
+            for tool_call in tool_calls
+        ]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait: bool = True):
+        self.pool.shutdown(wait=wait)
+
+    def _call(self, tool_call: AgentToolCall) -> ToolCallResult:
+        cassette = current_cassette.get()
+        if cassette and cassette.is_replaying:
+            return _replay(cassette, tool_call)
+
+        started = time.perf_counter()
+
+        with tracer.span("tool.call", tool=tool_call.name) as span:
+            try:
+                tool, args = _resolve(self.registry, tool_call)
+                output, error = self.cache.call(tool, args), None
+            except Exception as e:
+                span.record_exception(e)
+                output, error = _failure(tool_call, e)
+
+        result = _result(tool_call, output, error, time.perf_counter() - started)
+        if cassette:
+            cassette.record_tool(
+                tool_call.name,
+                tool_call.arguments,
+                result.output,
+                error,
+                result.duration,
+            )
+        return result
+
+
+class AsyncToolExecutor:
+
+    def __init__(
+        self, registry: Registry, max_concurrency: int = 8, cache: ToolCache = None
+    ):
+        self.registry = registry
+        self.max_concurrency = max_concurrency
+        self.cache = cache or ToolCache()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def execute(self, tool_calls: list[AgentToolCall]) -> list[ToolCallResult]:
+        """
+        Runs all tool calls of a step at once. Results keep the order of `tool_calls`.
+        """
+        return await asyncio.gather(
+            *[self._call(tool_call) for tool_call in tool_calls]
+        )
+
+    async def _call(self, tool_call: AgentToolCall) -> ToolCallResult:
+        async with self.semaphore:
+            started = time.perf_counter()
+
+            with tracer.span("tool.call", tool=tool_call.name) as span:
+                try:
+                    tool, args = _resolve(self.registry, tool_call)
+                    output, error = await self.cache.acall(tool, args), None
+                except Exception as e:
+                    span.record_exception(e)
+                    output, error = _failure(tool_call, e)
+
+            return _result(tool_call, output, error, time.perf_counter() - started)
+
+
+def _replay(cassette: "Cassette", tool_call: AgentToolCall) -> ToolCallResult:
+    with tracer.span("tool.call", tool=tool_call.name, replayed=True):
+        recorded = cassette.replay_tool(tool_call.name, tool_call.arguments)
+    return _result(tool_call, recorded.output, recorded.error, recorded.duration)
+
+
+def _resolve(registry: Registry, tool_call: AgentToolCall):
+    tool = registry.registered_tools.get(tool_call.name)
+    if not tool:
+        raise Exception(f"Tool with name {tool_call.name} not registered.")
+
+    args = json.loads(tool_call.arguments) if tool_call.arguments else {}
+    return tool, args
+
+
+def _failure(tool_call: AgentToolCall, e: Exception) -> tuple[str, str]:
+    Log.exception("Tool call failed > %s", tool_call.name)
+    error = f"{type(e).__name__}: {e}"
+    return f"Error: {error}", error
+
+
+def _result(
+    tool_call: AgentToolCall, output, error: Optional[str], duration: float
+) -> ToolCallResult:
+    if not isinstance(output, str):
+        output = json.dumps(output)
+
+    Log.info("Tool call %s took %.3fs", tool_call.name, duration)
+
+    return ToolCallResult(
+        tool_call_id=tool_call.id,
+        name=tool_call.name,
+        output=output,
+        error=error,
+        duration=duration,
+    )
@@ -0,0 +1,145 @@
+import os, re, sys, queue, atexit, logging
+from typing import Any, Optional
+from logging.handlers import QueueHandler, QueueListener
+from pydantic import BaseModel
+
+__all__ = ["Payload", "configure_logging", "redact", "truncate"]
+
+LOG_MAX_PAYLOAD = int(os.getenv("LOG_MAX_PAYLOAD") or 2_000)
+"""
+Characters of a payload kept in log messages. 0 keeps payloads whole.
+"""
+
+LOG_REDACT = os.getenv("LOG_REDACT")
+"""
+A regular expression whose matches are redacted from payloads, in addition to
+API keys, bearer tokens and OAuth secrets. Its first group, if any, is kept.
+"""
+
+REDACTED = "[REDACTED]"
+
+_patterns = [
+    re.compile(r"sk-[A-Za-z0-9_\-]{16,}"),
+    re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._~+/\-]+=*"),
+    re.compile(
+        r"(?i)(['\"]?(?:access_token|refresh_token|id_token|client_secret"
+        r"|api_key|password)['\"]?\s*[:=]\s*['\"]?)[^'\"\s,}]+"
+    ),
+] + ([re.compile(LOG_REDACT)] if LOG_REDACT else [])
+
+_listener: Optional[QueueListener] = None
+
+
+class Payload:
+    """
+    Wraps a value logged with `%s`, e.g. `Log.info("Outputs > %s", Payload(o))`.
+    It is only turned into a string if the record is emitted, on the logging
+    thread, and then redacted and truncated to `max_length` characters.
+    """
+
+    __slots__ = ("value", "max_length")
+
+    def __init__(self, value: Any, max_length: Optional[int] = None):
+        self.value = value
+        self.max_length = LOG_MAX_PAYLOAD if max_length is None else max_length
+
+    def __str__(self) -> str:
+        if not self.max_length:
+            return redact(str(self.value))
+        # Cut with some slack first, so secrets cut in half are still matched,
+        # without formatting or running the patterns over megabytes.
+        limit = self.max_length + 256
+        if isinstance(self.value, str):
+            return truncate(
+                redact(self.value[:limit]), self.max_length, len(self.value)
+            )
+
+        # The length of other values isn't known without formatting them whole,
+        # nested strings note how much of them was cut instead.
+        text = redact(str(_shorten(self.value, limit))[:limit])
+        if len(text) <= self.max_length:
+            return text
+        return f"{text[: self.max_length]}... [truncated]"
+
+
+def redact(text: str) -> str:
+    for pattern in _patterns:
+        text = pattern.sub(
+            lambda m: ((m.group(1) or "") if pattern.groups else "") + REDACTED,
+            text,
+        )
+    return text
+
+
+def truncate(text: str, max_length: int, length: Optional[int] = None) -> str:
+    """
+    `text` cut to `max_length` characters, noting how many were left out of
+    the `length` it had originally.
+    """
+    length = len(text) if length is None else length
+    if length <= max_length:
+        return text
+    return f"{text[:max_length]}... [{length - max_length} more characters]"
+
+
+def _shorten(value: Any, limit: int) -> Any:
+    # Long strings in lists, dicts and models are cut before the value is
+    # formatted, which would otherwise copy them whole.
+    if isinstance(value, str):
+        return truncate(value, limit)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_shorten(v, limit) for v in value)
+    if isinstance(value, dict):
+        return {k: _shorten(v, limit) for k, v in value.items()}
+    if isinstance(value, BaseModel):
+        return value.model_copy(update={k: _shorten(v, limit) for k, v in value})
+    return value
+
+
+class _QueueHandler(QueueHandler):
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default formats the message on the logging thread to make the
+        # record picklable. Records stay in this process, so formatting is
+        # left to the listener, off the thread that reads the stream.
+        return record
+
+
+def configure_logging(
+    level: Optional[str | int] = None, handler: Optional[logging.Handler] = None
+):
+    """
+    Like `logging.basicConfig`, but records are handed to `handler`, stderr by
+    default, through a queue and written from a listener thread, so logging
+    never blocks the caller on formatting or I/O. Records still queued are
+    written at exit. A lone stderr handler, as `logging.basicConfig` adds, is
+    moved behind the queue. Other handlers are left alone.
+    """
+    global _listener
+    root = logging.getLogger()
+    if _is_basic(root.handlers):
+        handler = handler or root.handlers[0]
+        root.removeHandler(root.handlers[0])
+    if root.handlers:
+        return
+
+    handler = handler or logging.StreamHandler()
+    if not handler.formatter:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    records = queue.SimpleQueue()
+    root.addHandler(_QueueHandler(records))
+    if level:
+        root.setLevel(level)
+
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _is_basic(handlers: list[logging.Handler]) -> bool:
+    return (
+        len(handlers) == 1
+        and type(handlers[0]) is logging.StreamHandler
+        and handlers[0].stream is sys.stderr
+    )
@@ -1,31 +1,67 @@
-import logging
+import logging, importlib
+from functools import cache
+from importlib.metadata import entry_points
+from pydantic import BaseModel
 from .tools import Tool
 
-__all__ = ["Registry"]
+__all__ = ["Registry", "ToolSpec"]
 
 Log = logging.getLogger("Registry")
 
+ENTRY_POINT_GROUP = "terrarium.tools"
+
+
+class ToolSpec(BaseModel):
+    """
+    Lightweight description of a tool. The module is only imported once the
+    tool is registered.
+    """
+
+    name: str
+    module: str
+    """
+    Fully qualified module path, e.g. `src.tools.read_file`.
+    """
+
+    attr: str
+    """
+    Name of the `Tool` subclass within the module.
+    """
+
+    def load(self) -> Tool:
+        tool_class = getattr(importlib.import_module(self.module), self.attr)
+        return tool_class()
+
 
 class Registry:
 
     def __init__(self):
         self.registered_tools: dict[str, Tool] = {}
-        self.tools: dict[str, Tool] = local_tools()
+        self.specs: dict[str, ToolSpec] = tool_specs()
 
     @property
     def available_tools(self) -> list[str]:
-        return list(self.tools.keys())
+        return list(self.specs.keys())
 
     def register_tool(self, name: str):
-        if not self.tools.get(name):
+        spec = self.specs.get(name)
+        if not spec:
             raise Exception(f"Tool with name {name} not found.")
 
-        self.registered_tools[name] = self.tools[name]
-        Log.info(f"Registered tool {name}")
+        self.registered_tools[name] = spec.load()
+        Log.info("Registered tool %s", name)
+
+    def add_tool(self, tool: Tool):
+        """
+        Registers an already instantiated tool, e.g. one that is not importable
+        by module path.
+        """
+        self.registered_tools[tool.name()] = tool
+        Log.info("Registered tool %s", tool.name())
 
     def deregister_tool(self, name: str):
         del self.registered_tools[name]
-        Log.info(f"Deregistered tool {name}")
+        Log.info("Deregistered tool %s", name)
 
     @property
     def agent_tools(self) -> list[dict]:
@@ -35,27 +71,42 @@ class Registry:
         ]
 
 
+def _local(name: str, module: str, attr: str) -> ToolSpec:
+    return ToolSpec(name=name, module=f"src.tools.{module}", attr=attr)
+
+
 # Local tools
-from .tools.current_date_time import CurrentDateTime
-from .tools.read_file import ReadFile
-from .tools.delete_file import DeleteFile
-from .tools.write_file import WriteFile
-from .tools.move_file import MoveFile
-from .tools.list_files import ListFiles
-
-# Remote tools
-from .tools.get_gh_commits import GetGitHubCommits
-from .tools.get_news import GetNews
-
-
-def local_tools() -> dict[str, Tool]:
-    return {
-        CurrentDateTime.name(): CurrentDateTime(),
-        ReadFile.name(): ReadFile(),
-        DeleteFile.name(): DeleteFile(),
-        WriteFile.name(): WriteFile(),
-        MoveFile.name(): MoveFile(),
-        ListFiles.name(): ListFiles(),
-        GetGitHubCommits.name(): GetGitHubCommits(),
-        GetNews.name(): GetNews(),
-    }
+LOCAL_TOOLS: list[ToolSpec] = [
+    _local("get_current_date_time", "current_date_time", "CurrentDateTime"),
+    _local("read_file", "read_file", "ReadFile"),
+    _local("delete_file", "delete_file", "DeleteFile"),
+    _local("write_file", "write_file", "WriteFile"),
+    _local("move_file", "move_file", "MoveFile"),
+    _local("list_files", "list_files", "ListFiles"),
+    _local("fetch_tool_output", "fetch_tool_output", "FetchToolOutput"),
+    # Remote tools
+    _local("get_github_commits", "get_gh_commits", "GetGitHubCommits"),
+    _local("get_news", "get_news", "GetNews"),
+]
+
+
+@cache
+def _entry_point_tools() -> tuple[ToolSpec, ...]:
+    # Third-party tools declare e.g.
+    # [project.entry-points."terrarium.tools"] my_tool = "my_package.tools:MyTool"
+    specs = []
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        module, _, attr = entry_point.value.partition(":")
+        if not attr:
+            Log.error(
+                f"Invalid tool entry point {entry_point.name} > {entry_point.value}"
+            )
+            continue
+        specs.append(ToolSpec(name=entry_point.name, module=module, attr=attr))
+    return tuple(specs)
+
+
+def tool_specs() -> dict[str, ToolSpec]:
+    specs = {spec.name: spec for spec in _entry_point_tools()}
+    specs.update({spec.name: spec for spec in LOCAL_TOOLS})
+    return specs
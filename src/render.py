@@ -0,0 +1,329 @@
+import sys, json, time, logging, threading
+from typing import IO, Optional, Protocol, override
+from collections import deque
+from .conductor import StreamHandler
+
+__all__ = [
+    "BufferedRenderer",
+    "TerminalSink",
+    "FileSink",
+    "WebSocketSink",
+    "MarkdownStyler",
+]
+
+Log = logging.getLogger("Renderer")
+
+RESET = "\033[0m"
+RED = "\033[91m"
+BOLD = "\033[1m"
+DIM = "\033[2m"
+YELLOW = "\033[93m"
+
+
+class BufferedRenderer(StreamHandler):
+    """
+    Coalesces streamed text and hands it to `sink`, another StreamHandler, from
+    its own thread: at most once per `frame_interval`, or as soon as a line is
+    complete. The thread reading the stream only appends to a buffer, so a slow
+    sink never holds up the stream.
+
+    `on_text_done` and `on_error` wait until the sink has caught up, so callers
+    can prompt for input once the run returns.
+    """
+
+    def __init__(self, sink: StreamHandler, frame_interval: float = 1 / 30):
+        self.sink = sink
+        self.frame_interval = frame_interval
+        self.events: deque[list] = deque()
+        self.condition = threading.Condition()
+        self.rendered = 0
+        self.queued = 0
+        self.next_frame = 0.0
+        self.thread = threading.Thread(
+            target=self._render, name="BufferedRenderer", daemon=True
+        )
+        self.thread.start()
+
+    @override
+    def on_text_started(self):
+        self._put("text_started")
+
+    @override
+    def on_text_changed(self, delta: str):
+        with self.condition:
+            if self.events and self.events[-1][0] == "text_changed":
+                self.events[-1][1] += delta
+            else:
+                self.events.append(["text_changed", delta])
+                self.queued += 1
+            if "\n" in delta or len(self.events) == 1:
+                self.condition.notify()
+
+    @override
+    def on_text_done(self, text: str):
+        self._put("text_done", text)
+        self.drain()
+
+    @override
+    def on_error(self, error: Exception):
+        self._put("error", error)
+        self.drain()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until everything queued so far has reached the sink.
+        """
+        with self.condition:
+            queued = self.queued
+            return self.condition.wait_for(
+                lambda: self.rendered >= queued, timeout=timeout
+            )
+
+    # Mark: - Private
+
+    def _put(self, kind: str, argument=None):
+        with self.condition:
+            self.events.append([kind, argument])
+            self.queued += 1
+            self.condition.notify_all()
+
+    def _render(self):
+        while True:
+            with self.condition:
+                while True:
+                    self.condition.wait_for(lambda: self.events)
+                    kind, argument = self.events[0]
+                    # Text waits for the next frame unless a line completed or
+                    # another event follows it.
+                    wait = self.next_frame - time.monotonic()
+                    if (
+                        kind != "text_changed"
+                        or len(self.events) > 1
+                        or "\n" in argument
+                        or wait <= 0
+                    ):
+                        break
+                    self.condition.wait(wait)
+                self.events.popleft()
+
+            try:
+                if kind == "text_changed":
+                    self.next_frame = time.monotonic() + self.frame_interval
+                    self.sink.on_text_changed(argument)
+                elif kind == "text_started":
+                    self.sink.on_text_started()
+                elif kind == "text_done":
+                    self.sink.on_text_done(argument)
+                elif kind == "error":
+                    self.sink.on_error(argument)
+            except Exception:
+                Log.exception(f"Sink failed to render {kind}")
+
+            with self.condition:
+                self.rendered += 1
+                self.condition.notify_all()
+
+
+class TerminalSink(StreamHandler):
+    """
+    Writes text to a terminal in one colored write per frame, optionally
+    styling markdown as it streams in.
+    """
+
+    def __init__(
+        self,
+        stream: IO[str] = None,
+        prefix: str = "\n🤖 Agent: ",
+        color: str = "\033[96m",
+        markdown: bool = False,
+    ):
+        self.stream = stream or sys.stdout
+        self.prefix = prefix
+        self.color = color
+        self.markdown = markdown
+        self.styler: Optional[MarkdownStyler] = None
+
+    @override
+    def on_text_started(self):
+        self.styler = MarkdownStyler(self.color) if self.markdown else None
+        self.stream.write(self.prefix)
+        self.stream.flush()
+
+    @override
+    def on_text_changed(self, delta: str):
+        text = self.styler.feed(delta) if self.styler else f"{self.color}{delta}"
+        self.stream.write(f"{text}{RESET}")
+        self.stream.flush()
+
+    @override
+    def on_text_done(self, text: str):
+        rest = self.styler.finish() if self.styler else ""
+        self.stream.write(f"{rest}{RESET}\n\n")
+        self.stream.flush()
+
+    @override
+    def on_error(self, error: Exception):
+        self.stream.write(f"\n{RED}{error}{RESET}\n")
+        self.stream.flush()
+
+
+class FileSink(StreamHandler):
+    """
+    Appends the plain text of each message to a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    @override
+    def on_text_changed(self, delta: str):
+        self._write(delta)
+
+    @override
+    def on_text_done(self, text: str):
+        self._write("\n\n")
+
+    @override
+    def on_error(self, error: Exception):
+        self._write(f"\n[error] {error}\n")
+
+    def _write(self, text: str):
+        with self.lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(text)
+
+
+class WebSocket(Protocol):
+
+    def send(self, data: str): ...
+
+
+class WebSocketSink(StreamHandler):
+    """
+    Sends events as JSON messages over a connected websocket, e.g. one of
+    `flask-sock` or `websockets.sync`, with the event names of the server's
+    SSE stream.
+    """
+
+    def __init__(self, socket: WebSocket):
+        self.socket = socket
+
+    @override
+    def on_text_started(self):
+        self._send("text_started", {})
+
+    @override
+    def on_text_changed(self, delta: str):
+        self._send("text_delta", {"delta": delta})
+
+    @override
+    def on_text_done(self, text: str):
+        self._send("text_done", {"text": text})
+
+    @override
+    def on_error(self, error: Exception):
+        self._send("error", {"error": str(error)})
+
+    def _send(self, event: str, data: dict):
+        self.socket.send(json.dumps({"event": event, "data": data}))
+
+
+class MarkdownStyler:
+    """
+    Turns streamed markdown into ANSI-styled text chunk by chunk: headings,
+    `**bold**`, `inline code` and fenced code blocks. Markers that could still
+    turn out to be part of a longer one, e.g. a lone trailing `*`, are held
+    back until the next chunk.
+    """
+
+    def __init__(self, color: str = ""):
+        self.color = color
+        self.pending = ""
+        self.line_start = True
+        self.heading = False
+        self.bold = False
+        self.code = False
+        self.fence = False
+
+    def feed(self, text: str) -> str:
+        """
+        Returns the styled text, starting with the style in effect, so chunks
+        can be written independently.
+        """
+        text, self.pending = self.pending + text, ""
+        out, i = [self._style()], 0
+        while i < len(text):
+            rest = text[i:]
+
+            if self.line_start and "```".startswith(rest):
+                self.pending = rest
+                break
+            if self.line_start and rest.startswith("```"):
+                if "\n" not in rest:
+                    self.pending = rest
+                    break
+                end = rest.index("\n") + 1
+                self.fence = not self.fence
+                out.append(f"{DIM}{rest[:end]}{self._style()}")
+                i += end
+                continue
+
+            if self.line_start and not self.fence and rest[0] == "#":
+                hashes = len(rest) - len(rest.lstrip("#"))
+                if hashes == len(rest):
+                    self.pending = rest
+                    break
+                if rest[hashes] == " ":
+                    self.heading = True
+                    out.append(self._style())
+                    i += hashes + 1
+                    self.line_start = False
+                    continue
+
+            char = text[i]
+            if char == "\n":
+                if self.heading:
+                    self.heading = False
+                    out.append(self._style())
+                out.append(char)
+                self.line_start = True
+                i += 1
+                continue
+            self.line_start = False
+
+            if self.fence:
+                out.append(char)
+            elif char == "`":
+                self.code = not self.code
+                out.append(self._style())
+            elif char == "*" and not self.code:
+                if i + 1 == len(text):
+                    self.pending = char
+                    break
+                if text[i + 1] == "*":
+                    self.bold = not self.bold
+                    out.append(self._style())
+                    i += 1
+                else:
+                    out.append(char)
+            else:
+                out.append(char)
+            i += 1
+
+        return "".join(out)
+
+    def finish(self) -> str:
+        text = f"{self._style()}{self.pending}"
+        self.pending = ""
+        self.bold = self.code = self.heading = self.fence = False
+        return text
+
+    def _style(self) -> str:
+        if self.fence:
+            return f"{RESET}{DIM}"
+        style = f"{RESET}{self.color}"
+        if self.bold or self.heading:
+            style += BOLD
+        if self.code:
+            style += YELLOW
+        return style
@@ -0,0 +1,88 @@
+import os, time, hashlib, logging, threading
+from typing import Optional
+
+__all__ = ["SpillStore", "spill_store"]
+
+Log = logging.getLogger("SpillStore")
+
+SPILL_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "terrarium", "spill"
+)
+
+
+class SpillStore:
+    """
+    Content-addressed storage for tool outputs too large to send to the model.
+    Outputs are keyed by their hash, so identical outputs are stored once and a
+    handle always refers to the same content.
+    """
+
+    def __init__(self, directory: str = SPILL_DIR, max_age: float = 24 * 60 * 60):
+        self.directory = directory
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.pruned_at = 0.0
+
+    def put(self, output: str) -> str:
+        data = output.encode("utf-8")
+        handle = hashlib.sha256(data).hexdigest()[:32]
+        path = self._path(handle)
+
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            self._make_directory()
+            # Written under a temporary name so readers never see partial files.
+            # Outputs may hold anything a tool read, so only the user can read
+            # them.
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(
+                os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb"
+            ) as f:
+                f.write(data)
+            os.replace(temporary, path)
+            Log.info("Spilled %d bytes > %s", len(data), handle)
+
+        self._prune()
+        return handle
+
+    def get(self, handle: str) -> Optional[str]:
+        if not handle.isalnum():
+            return None
+        try:
+            with open(self._path(handle), "rb") as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    # Mark: - Private
+
+    def _make_directory(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        # makedirs leaves an existing directory's mode alone.
+        if os.stat(self.directory).st_mode & 0o077:
+            os.chmod(self.directory, 0o700)
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.directory, f"{handle}.txt")
+
+    def _prune(self):
+        now = time.time()
+        with self.lock:
+            if now - self.pruned_at < self.max_age / 24:
+                return
+            self.pruned_at = now
+
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if now - entry.stat().st_mtime > self.max_age:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+
+spill_store = SpillStore()
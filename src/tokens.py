@@ -0,0 +1,85 @@
+import re
+from functools import cache
+
+__all__ = ["num_tokens", "token_pages", "token_pages_with_total"]
+
+# Words, runs of digits, and single symbols roughly match how BPE tokenizers
+# split English text and code.
+PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]|\s+")
+
+
+@cache
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+
+def num_tokens(text: str) -> int:
+    """
+    Number of tokens `text` occupies in a prompt. Exact when tiktoken is
+    installed, otherwise an estimate that errs on the high side.
+    """
+    if not text:
+        return 0
+
+    encoding = _encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    tokens = 0
+    for piece in PIECES.findall(text):
+        if piece[0].isalpha():
+            # Common words are a single token, long ones split every ~4 chars.
+            tokens += 1 + (len(piece) - 1) // 4
+        elif piece[0].isdigit():
+            tokens += (len(piece) + 2) // 3
+        elif piece[0].isspace():
+            tokens += 0 if piece == " " else 1
+        else:
+            tokens += 1
+    return tokens
+
+
+def token_pages(text: str, max_tokens: int) -> list[tuple[int, int]]:
+    """
+    Splits `text` into pages of at most `max_tokens`, preferably at line breaks.
+    Returns the start and end offset of each page.
+    """
+    return token_pages_with_total(text, max_tokens)[0]
+
+
+def token_pages_with_total(
+    text: str, max_tokens: int
+) -> tuple[list[tuple[int, int]], int]:
+    """
+    Like `token_pages`, also returning the tokens of `text`, counted line by
+    line in the same pass.
+    """
+    pages, start, position, tokens, total = [], 0, 0, 0, 0
+
+    for line in text.splitlines(keepends=True):
+        count = num_tokens(line)
+        total += count
+        if tokens and tokens + count > max_tokens:
+            pages.append((start, position))
+            start, tokens = position, 0
+
+        if count > max_tokens:
+            # A single line over the limit is cut into slices of roughly
+            # `max_tokens` each.
+            step = max(1, len(line) * max_tokens // count)
+            for offset in range(0, len(line), step):
+                pages.append(
+                    (position + offset, position + min(offset + step, len(line)))
+                )
+            start = position + len(line)
+        else:
+            tokens += count
+        position += len(line)
+
+    if start < position or not pages:
+        pages.append((start, position))
+    return pages, total
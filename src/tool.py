@@ -1,8 +1,13 @@
+import asyncio
+from .cache import CachePolicy
+
 __all__ = ["Tool"]
 
 
 class Tool:
 
+    cache_policy: CachePolicy = CachePolicy.never()
+
     def __init__(self):
         pass
 
@@ -16,3 +21,8 @@ class Tool:
 
     def call(self, args: dict) -> str:
         pass
+
+    async def acall(self, args: dict) -> str:
+        # Tools are synchronous by default and are offloaded to a worker thread.
+        # Override for native async support.
+        return await asyncio.to_thread(self.call, args)
@@ -1,5 +1,34 @@
-from .client import DataClient
-from .provider import Provider
+from .client import DataClient, HttpCacheStats, ProviderStats
+from .async_client import AsyncDataClient
+from .provider import (
+    Provider,
+    ClientConfig,
+    CacheConfig,
+    CacheBackend,
+    RateLimitConfig,
+)
+from .scheduler import (
+    RequestScheduler,
+    SchedulerStats,
+    RateLimitError,
+)
+from .providers import ProviderRegistry, providers
 from .auth.provider import ProviderAuthConfig
 
-__all__ = ["DataClient", "Provider", "ProviderAuthConfig"]
\ No newline at end of file
+__all__ = [
+    "DataClient",
+    "AsyncDataClient",
+    "HttpCacheStats",
+    "ProviderStats",
+    "Provider",
+    "ClientConfig",
+    "CacheConfig",
+    "CacheBackend",
+    "RateLimitConfig",
+    "RequestScheduler",
+    "SchedulerStats",
+    "RateLimitError",
+    "ProviderRegistry",
+    "providers",
+    "ProviderAuthConfig",
+]
@@ -0,0 +1,337 @@
+import time, asyncio, logging, threading
+from typing import AsyncIterator, Optional
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import httpx
+from .provider import Provider, CacheConfig, CacheBackend
+from .client import HttpCacheStats, ProviderStats, _is_auth_failure, _trace
+from .session import async_client_pool
+from .scheduler import RequestScheduler
+from .auth.sign import RequestSigner
+from ...tracing import tracer
+
+__all__ = ["AsyncDataClient"]
+
+Log = logging.getLogger("AsyncDataClient")
+
+
+class AsyncDataClient:
+    """
+    `DataClient` for asyncio, on a shared `httpx.AsyncClient` per host that
+    multiplexes requests over HTTP/2 when h2 is installed. Responses are cached
+    in memory following the provider's CacheConfig, whatever its backend.
+    """
+
+    def __init__(self, provider: Provider, scheduler: RequestScheduler = None):
+        self.provider = provider
+        self.request_signer = None
+        if provider.auth_config:
+            self.request_signer = RequestSigner(provider.auth_config)
+        self.scheduler = scheduler or RequestScheduler(provider.rate_limit)
+        self.cache = None
+        if provider.cache_config.backend != CacheBackend.NONE:
+            self.cache = ResponseCache(provider.cache_config)
+        self.revalidating: dict[str, asyncio.Task] = {}
+        self.lock = threading.Lock()
+        self._stats = HttpCacheStats()
+
+    @property
+    def stats(self) -> ProviderStats:
+        with self.lock:
+            cache = self._stats.model_copy()
+        return ProviderStats(cache=cache, scheduler=self.scheduler.stats)
+
+    async def get(self, params: dict = None, path: str = "") -> dict:
+        return await self.request("GET", path=path, params=params)
+
+    async def post(self, data: dict, path: str = "") -> dict:
+        return await self.request("POST", path=path, data=data)
+
+    async def put(self, data: dict, path: str = "") -> dict:
+        return await self.request("PUT", path=path, data=data)
+
+    async def delete(self, params: dict = None, path: str = "") -> dict:
+        return await self.request("DELETE", path=path, params=params)
+
+    async def request(
+        self,
+        method: str,
+        path: str = "",
+        params: Optional[dict] = None,
+        data: Optional[dict] = None,
+    ) -> dict:
+        url = f"{self.provider.endpoint}{path}"
+        response = await self._fetch(method, url, params, data)
+
+        if not response.is_success:
+            Log.error(f"Failed to get data from {self.provider.id}")
+            return
+
+        return response.json()
+
+    async def paginate(
+        self, path: str = "", params: Optional[dict] = None
+    ) -> AsyncIterator:
+        """
+        Yields the items of a paginated list endpoint, following `Link:
+        rel="next"` headers, and raises if a page can't be fetched. Pages are
+        only fetched as the iterator is consumed.
+        """
+        url = f"{self.provider.endpoint}{path}"
+        while url:
+            response = await self._fetch("GET", url, params, None)
+            if not response.is_success:
+                Log.error(f"Failed to get data from {self.provider.id}")
+                # Stopping here would look like the end of the list.
+                response.raise_for_status()
+
+            for item in response.json():
+                yield item
+
+            # The next link already carries the query parameters.
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+    # Mark: - Private
+
+    async def _fetch(
+        self, method: str, url: str, params: Optional[dict], data: Optional[dict]
+    ) -> httpx.Response:
+        key = self.cache.key(method, url, params) if self.cache else None
+        entry = self.cache.get(key) if key else None
+
+        with tracer.span(
+            "http.request", provider=self.provider.id, method=method, url=url
+        ):
+            if entry and entry.is_fresh():
+                self._record("hits")
+                return entry.response()
+
+            if entry and entry.is_usable_stale():
+                self._record("stale")
+                self._revalidate_in_background(key, url, params, entry)
+                return entry.response()
+
+            return await self._fetch_origin(method, url, params, data, key, entry)
+
+    async def _fetch_origin(
+        self,
+        method: str,
+        url: str,
+        params: Optional[dict],
+        data: Optional[dict],
+        key: Optional[str],
+        entry: Optional["Entry"],
+    ) -> httpx.Response:
+        deadline = time.monotonic() + self.provider.rate_limit.max_wait
+        refreshed = False
+
+        span = tracer.current_span
+        attempts = 0
+        while True:
+            attempts += 1
+            span.set_attribute("attempts", attempts)
+            await self.scheduler.acquire_async(deadline)
+            response = await self._send(method, url, params, data, entry)
+
+            if response.status_code == 304 and entry:
+                # Revalidations don't use up the quota.
+                self.scheduler.refund()
+                self.cache.refresh(key, entry, response)
+                self._record("revalidations")
+                return entry.response()
+
+            if self.scheduler.observe(response):
+                Log.info(f"Rate limited by {self.provider.id}. Retrying.")
+                continue
+
+            if _is_auth_failure(response) and self.request_signer and not refreshed:
+                Log.info("Token expired. Refreshing token.")
+                # Deleting the token takes the file lock, off the event loop.
+                await asyncio.to_thread(self.request_signer.clear)
+                refreshed = True
+                continue
+
+            span.set_attribute("status_code", response.status_code)
+            self._record("misses")
+            if key:
+                self.cache.store(key, response)
+            return response
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        params: Optional[dict],
+        data: Optional[dict],
+        entry: Optional["Entry"],
+    ) -> httpx.Response:
+        headers = dict(self.provider.headers)
+        if self.request_signer:
+            headers.update(await self.request_signer.asign())
+        if entry:
+            headers.update(entry.validators())
+
+        client = async_client_pool.get(
+            self.provider.endpoint, self.provider.client_config
+        )
+        response = await client.request(
+            method, url, params=params, json=data, headers=headers
+        )
+        await response.aread()
+        return response
+
+    def _revalidate_in_background(
+        self, key: str, url: str, params: Optional[dict], entry: "Entry"
+    ):
+        if key in self.revalidating:
+            return
+
+        async def revalidate():
+            try:
+                with tracer.span("http.revalidate", provider=self.provider.id, url=url):
+                    await self._fetch_origin("GET", url, params, None, key, entry)
+            except Exception:
+                Log.exception(f"Failed to revalidate {url}")
+            finally:
+                self.revalidating.pop(key, None)
+
+        # Referenced until done, so the task isn't garbage collected.
+        self.revalidating[key] = asyncio.create_task(revalidate())
+
+    def _record(self, outcome: str):
+        with self.lock:
+            setattr(self._stats, outcome, getattr(self._stats, outcome) + 1)
+        _trace(self.provider.id, outcome, 0)
+
+
+class Entry:
+
+    def __init__(self, url: str, response: httpx.Response, expires_at: float):
+        self.url = url
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.expires_at = expires_at
+        self.stale_until = expires_at
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def is_usable_stale(self) -> bool:
+        return time.time() < self.stale_until
+
+    def validators(self) -> dict:
+        validators = {}
+        if "ETag" in self.headers:
+            validators["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            validators["If-Modified-Since"] = self.headers["Last-Modified"]
+        return validators
+
+    def response(self) -> httpx.Response:
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=httpx.Request("GET", self.url),
+        )
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache of successful GET responses.
+    """
+
+    def __init__(self, config: CacheConfig, max_entries: int = 1024):
+        self.config = config
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, Entry] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, method: str, url: str, params: Optional[dict]) -> Optional[str]:
+        if method != "GET":
+            return None
+        request = httpx.Request(method, url, params=params)
+        return str(request.url)
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+            return entry
+
+    def store(self, key: str, response: httpx.Response):
+        if response.status_code != 200:
+            return
+
+        expires_at = self._expires_at(response)
+        if expires_at is None:
+            return
+
+        entry = Entry(key, response, expires_at)
+        entry.stale_until = self._stale_until(response.headers, expires_at)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def refresh(self, key: str, entry: Entry, response: httpx.Response):
+        """
+        Extends `entry` after a 304.
+        """
+        headers = httpx.Headers(entry.headers)
+        headers.update(response.headers)
+        entry.headers = headers
+
+        expires_at = self._expires_at(response) or time.time()
+        entry.expires_at = expires_at
+        entry.stale_until = self._stale_until(headers, expires_at)
+        with self.lock:
+            self.entries[key] = entry
+
+    def _stale_until(self, headers: httpx.Headers, expires_at: float) -> float:
+        # `no-cache` responses must be revalidated before every use, they are
+        # never served stale.
+        if self.config.cache_control and "no-cache" in _cache_control(
+            headers.get("Cache-Control")
+        ):
+            return expires_at
+        return expires_at + (self.config.stale_while_revalidate or 0)
+
+    def _expires_at(self, response: httpx.Response) -> Optional[float]:
+        # Returns None for responses that must not be stored.
+        now = time.time()
+        if self.config.cache_control:
+            directives = _cache_control(response.headers.get("Cache-Control"))
+            if "no-store" in directives:
+                return None
+            if "no-cache" in directives:
+                return now
+            if "max-age" in directives:
+                try:
+                    return now + int(directives["max-age"])
+                except ValueError:
+                    pass
+            if "Expires" in response.headers:
+                try:
+                    return parsedate_to_datetime(
+                        response.headers["Expires"]
+                    ).timestamp()
+                except (TypeError, ValueError):
+                    return now
+
+        if self.config.ttl is None:
+            return float("inf")
+        return now + self.config.ttl
+
+
+def _cache_control(value: Optional[str]) -> dict[str, str]:
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
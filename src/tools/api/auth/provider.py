@@ -23,3 +23,9 @@ class ProviderAuthConfig(BaseModel):
     redirect_uri: Optional[str]
     header: str = "Authorization"
     token_prefix: str = ""
+    ephemeral_port: bool = False
+    """
+    Listen for the OAuth callback on a free port instead of the port of
+    `redirect_uri`, so concurrent processes don't collide. The provider must
+    accept loopback redirects on any port.
+    """
@@ -1,103 +1,234 @@
-import logging, base64, hashlib, secrets
-from threading import Event, Thread
+import logging, base64, hashlib, secrets, threading
+from typing import Callable, Optional
+from threading import Event
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import webbrowser
 import urllib.parse
 import requests
-from flask import Flask, request
 from .token import TokenStore
 from .provider import AuthType, ProviderAuthConfig
 
-
-__all__ = ["AuthServer", "active_server"]
+__all__ = ["AuthServer", "CallbackListener", "active_server"]
 
 Log = logging.getLogger("AuthServer")
 
 
-class AuthServer:
+class CallbackListener:
+    """
+    Minimal HTTP server receiving OAuth redirects on a loopback address. Port 0
+    binds an ephemeral port.
+    """
 
-    def __init__(self):
-        self.app = Flask(__name__)
-        self.token_received_events: dict[str, Event] = {}
-        self.states: dict[str, str] = {}
-        self.providers: dict[str, ProviderAuthConfig] = {}
-        self.token_stores: dict[str, TokenStore] = {}
-        self.code_verifiers: dict[str, str] = {}
-
-        self.app.add_url_rule(
-            "/<provider>/callback",
-            "oauth_callback",
-            self.oauth_callback,
-            methods=["GET"],
+    def __init__(self, host: str, port: int, handler: Callable[[str, dict], tuple]):
+        listener = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                status, body = listener.handler(url.path, query)
+
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                Log.debug(format % args)
+
+        self.handler = handler
+        self.server = ThreadingHTTPServer((host, port), RequestHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="CallbackListener", daemon=True
         )
+        self.key: Optional[tuple[str, int]] = None
+        self.flows = 0
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
 
     def start(self):
-        self.app.run(port=5000, host="127.0.0.1")
-
-    def oauth_callback(self, provider: str):
-        error = request.args.get("error")
-        if error:
-            Log.error(f"Error during OAuth authorization")
-            self._cleanup(provider)
-            return (
-                "Authentication failed. Please check the console for details.",
-                400,
+        self.thread.start()
+        Log.info(f"Listening for OAuth callbacks on port {self.port}.")
+
+    def close(self):
+        # Shutting down from a request thread is fine, serve_forever runs on
+        # its own thread.
+        self.server.shutdown()
+        self.server.server_close()
+        Log.info(f"Stopped listening for OAuth callbacks on port {self.port}.")
+
+
+class Flow:
+
+    def __init__(
+        self,
+        provider: ProviderAuthConfig,
+        token_store: TokenStore,
+        token_received_event: Event,
+        redirect_uri: str,
+        listener: CallbackListener,
+    ):
+        self.provider = provider
+        self.token_store = token_store
+        self.token_received_event = token_received_event
+        self.redirect_uri = redirect_uri
+        self.listener = listener
+        self.code_verifier: Optional[str] = None
+
+
+class AuthServer:
+    """
+    Runs OAuth authorization flows. A callback listener is only started while a
+    flow is waiting for its redirect, and stopped once the last one completes.
+    """
+
+    def __init__(self):
+        self.flows: dict[str, Flow] = {}
+        self.listeners: dict[tuple[str, int], CallbackListener] = {}
+        self.lock = threading.Lock()
+
+    def authorize(
+        self,
+        provider: ProviderAuthConfig,
+        token_store: TokenStore,
+        token_received_event: Event,
+    ):
+        if provider.type not in (AuthType.OAUTH_CLIENT_SECRET, AuthType.OAUTH_PKCE):
+            raise ValueError("Invalid OAuth type.")
+
+        redirect = urllib.parse.urlsplit(provider.redirect_uri)
+        host = redirect.hostname or "127.0.0.1"
+        port = 0 if provider.ephemeral_port else redirect.port or 80
+
+        state = secrets.token_urlsafe(32)
+        with self.lock:
+            listener = self._listener(host, port)
+            listener.flows += 1
+            redirect_uri = urllib.parse.urlunsplit(
+                redirect._replace(netloc=f"{host}:{listener.port}")
+            )
+            flow = Flow(
+                provider, token_store, token_received_event, redirect_uri, listener
             )
+            self.flows[state] = flow
+
+        params = {
+            "client_id": provider.client_id,
+            "response_type": "code",
+            "redirect_uri": redirect_uri,
+            "scope": provider.scope,
+            "state": state,
+        }
+        if provider.type == AuthType.OAUTH_PKCE:
+            flow.code_verifier, params["code_challenge"] = _pkce_pair()
+            params["code_challenge_method"] = "S256"
+
+        auth_url = f"{provider.authorization_endpoint}?{urllib.parse.urlencode(params)}"
+
+        webbrowser.open(auth_url)
+        Log.info("Browser opened for OAuth authorization.")
+
+    def cancel(self, token_received_event: Event):
+        """
+        Abandons the flows waiting on `token_received_event`.
+        """
+        with self.lock:
+            states = [
+                state
+                for state, flow in self.flows.items()
+                if flow.token_received_event is token_received_event
+            ]
+        for state in states:
+            self._finish(state)
+
+    def oauth_callback(self, path: str, query: dict) -> tuple[int, str]:
+        with self.lock:
+            flow = self.flows.get(query.get("state"))
 
-        received_state = request.args.get("state")
-        if received_state != self.states.get(provider):
+        if not flow:
             Log.error("State parameter mismatch. Potential CSRF attack.")
-            self._cleanup(provider)
-            return "Invalid state parameter.", 400
-
-        code = request.args.get("code")
-        if not code:
-            Log.error("No authorization code received.")
-            self._cleanup(provider)
-            return "Authorization code not found.", 400
-
-        token_data = self._exchange_code_for_token(provider, code)
-        if token_data:
-            if self.token_stores.get(provider) is None:
-                Log.error(f"Token store not found for provider {provider}.")
+            return 400, "Invalid state parameter."
+
+        if path != urllib.parse.urlsplit(flow.redirect_uri).path:
+            Log.error(f"Unexpected OAuth callback path {path}.")
+            return 404, "Not found."
+
+        state = query["state"]
+        try:
+            if query.get("error"):
+                Log.error(f"Error during OAuth authorization")
+                return (
+                    400,
+                    "Authentication failed. Please check the console for details.",
+                )
+
+            code = query.get("code")
+            if not code:
+                Log.error("No authorization code received.")
+                return 400, "Authorization code not found."
+
+            token_data = self._exchange_code_for_token(flow, code)
+            if not token_data:
+                return 400, "Failed to obtain access token."
+
+            flow.token_store.save(token_data)
+            return 200, "Authentication successful! You may close this window."
+        finally:
+            # The signer is woken up either way, and finds out from the token
+            # store whether it succeeded.
+            self._finish(state)
+
+    # Mark: - Private
+
+    def _listener(self, host: str, port: int) -> CallbackListener:
+        # Must be called with self.lock held.
+        listener = self.listeners.get((host, port)) if port else None
+        if not listener:
+            listener = CallbackListener(host, port, self.oauth_callback)
+            listener.start()
+            listener.key = (host, listener.port)
+            self.listeners[listener.key] = listener
+        return listener
+
+    def _finish(self, state: str):
+        with self.lock:
+            flow = self.flows.pop(state, None)
+            if not flow:
+                return
+
+            listener = flow.listener
+            listener.flows -= 1
+            if listener.flows == 0:
+                self.listeners.pop(listener.key)
             else:
-                self.token_stores[provider].save(token_data)
-            self.token_received_events[provider].set()
-            self._cleanup(provider)
-            return "Authentication successful! You may close this window."
-        else:
-            self._cleanup(provider)
-            return "Failed to obtain access token.", 400
-
-    def _generate_pkce_pair(self, provider: str):
-        code_verifier = secrets.token_urlsafe(64)
-        self.code_verifiers[provider] = code_verifier
-        code_challenge = (
-            base64.urlsafe_b64encode(
-                hashlib.sha256(code_verifier.encode("utf-8")).digest()
-            )
-            .decode("utf-8")
-            .rstrip("=")
-        )
-        return code_challenge
+                listener = None
+
+        flow.token_received_event.set()
+        if listener:
+            threading.Thread(target=listener.close, daemon=True).start()
 
-    def _exchange_code_for_token(self, provider_id: str, code: str):
-        provider = self.providers[provider_id]
+    def _exchange_code_for_token(self, flow: Flow, code: str):
+        provider = flow.provider
         if provider.type == AuthType.OAUTH_CLIENT_SECRET:
             data = {
                 "code": code,
-                "redirect_uri": provider.redirect_uri,
+                "redirect_uri": flow.redirect_uri,
                 "client_id": provider.client_id,
                 "client_secret": provider.client_secret,
             }
-        elif provider.type == AuthType.OAUTH_PKCE:
+        else:
             data = {
                 "code": code,
-                "redirect_uri": provider.redirect_uri,
+                "redirect_uri": flow.redirect_uri,
                 "client_id": provider.client_id,
-                "code_verifier": provider.code_verifiers[provider.id],
+                "code_verifier": flow.code_verifier,
             }
-        else:
-            raise ValueError("Invalid OAuth type.")
 
         headers = {"Accept": "application/json"}
         response = requests.post(provider.token_endpoint, data=data, headers=headers)
@@ -111,57 +242,15 @@ class AuthServer:
             Log.error(response.text)
             return None
 
-    def _cleanup(self, provider: str):
-        try:
-            self.states.pop(provider)
-            self.providers.pop(provider)
-            self.code_verifiers.pop(provider)
-            self.token_stores.pop(provider)
-            self.token_received_events.pop(provider)
-        except KeyError:
-            Log.error("Failed to clean up OAuth state.")
-
-    def authorize(
-        self,
-        provider: ProviderAuthConfig,
-        token_store: TokenStore,
-        token_received_event: Event,
-    ):
-        self.token_received_events[provider.id] = token_received_event
-        state = secrets.token_urlsafe(32)
-        self.states[provider.id] = state
-        self.providers[provider.id] = provider
-        self.token_stores[provider.id] = token_store
-
-        if provider.type == AuthType.OAUTH_CLIENT_SECRET:
-            params = {
-                "client_id": provider.client_id,
-                "response_type": "code",
-                "redirect_uri": provider.redirect_uri,
-                "scope": provider.scope,
-                "state": state,
-            }
-        elif provider.type == AuthType.OAUTH_PKCE:
-            code_challenge = self._generate_pkce_pair(provider=provider.id)
-            params = {
-                "client_id": provider.client_id,
-                "response_type": "code",
-                "redirect_uri": provider.redirect_uri,
-                "scope": provider.scope,
-                "state": state,
-                "code_challenge": code_challenge,
-                "code_challenge_method": "S256",
-            }
-        else:
-            self._cleanup(provider)
-            raise ValueError("Invalid OAuth type.")
-        auth_url = f"{provider.authorization_endpoint}?{urllib.parse.urlencode(params)}"
 
-        webbrowser.open(auth_url)
-        Log.info("Browser opened for OAuth authorization.")
+def _pkce_pair() -> tuple[str, str]:
+    code_verifier = secrets.token_urlsafe(64)
+    code_challenge = (
+        base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode("utf-8")).digest())
+        .decode("utf-8")
+        .rstrip("=")
+    )
+    return code_verifier, code_challenge
 
 
-# Start the server
-Log.info("Starting OAuth server.")
 active_server = AuthServer()
-Thread(target=active_server.start, daemon=True).start()
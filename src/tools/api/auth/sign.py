@@ -1,10 +1,9 @@
-import logging
+import asyncio, logging
 from threading import Event
 from .token import TokenStore
 from .server import active_server
 from .provider import ProviderAuthConfig, AuthType
 
-
 __all__ = ["RequestSigner"]
 
 
@@ -13,6 +12,11 @@ Log = logging.getLogger("RequestSigner")
 
 class RequestSigner:
 
+    authorization_timeout = 300
+    """
+    Seconds to wait for the user to complete an OAuth authorization.
+    """
+
     def __init__(self, config: ProviderAuthConfig):
         self.config = config
         self.token_store = TokenStore(
@@ -25,25 +29,43 @@ class RequestSigner:
 
     def sign(self) -> dict:
         if self.config.type == AuthType.API_KEY:
-            return {self.config.header: f"{self.config.token_prefix}{self.config.api_key}"}
-        
+            return {
+                self.config.header: f"{self.config.token_prefix}{self.config.api_key}"
+            }
+
         access_token = self.token_store.access_token()
         if not access_token:
             token_received_event = Event()
             active_server.authorize(
-                provider=self.config, 
+                provider=self.config,
                 token_store=self.token_store,
-                token_received_event=token_received_event
+                token_received_event=token_received_event,
             )
-            token_received_event.wait()
+            if not token_received_event.wait(timeout=self.authorization_timeout):
+                active_server.cancel(token_received_event)
             access_token = self.token_store.access_token()
 
             if not access_token:
                 Log.error("Failed to obtain access token.")
                 raise ValueError("Failed to obtain access token.")
 
-        return {self.config.header: f"{self.config.token_prefix}{access_token}"}
+        return self._header(access_token)
+
+    async def asign(self) -> dict:
+        if self.config.type == AuthType.API_KEY:
+            return self.sign()
+
+        # Tokens are almost always in memory. Refreshes and authorization
+        # flows, which wait on the network, locks or the user, are moved off
+        # the event loop.
+        access_token = self.token_store.cached_access_token()
+        if not access_token:
+            return await asyncio.to_thread(self.sign)
+        return self._header(access_token)
 
     def clear(self):
         self.token_store.delete()
         Log.info(f"Token cleared for provider {self.config.id}.")
+
+    def _header(self, access_token: str) -> dict:
+        return {self.config.header: f"{self.config.token_prefix}{access_token}"}
@@ -1,5 +1,14 @@
-import os, json, logging, time
+import os, json, logging, time, threading
+from typing import Optional
+from contextlib import contextmanager, suppress
 import requests
+from ....tracing import tracer
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where only refreshes within this process are coordinated.
+    fcntl = None
 
 __all__ = ["TokenStore"]
 
@@ -9,11 +18,41 @@ app_name = os.getenv("APP_NAME")
 creds_dir = os.path.expanduser(f"~/.{app_name}")
 os.makedirs(creds_dir, exist_ok=True)
 
+_locks: dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def _provider_lock(provider: str) -> threading.Lock:
+    # Shared by every TokenStore of a provider in this process.
+    with _locks_lock:
+        return _locks.setdefault(provider, threading.Lock())
+
 
 class TokenStore:
+    """
+    Tokens of a provider, persisted in `~/.{APP_NAME}/{provider}.json`. The file
+    is only re-read when its mtime or size changes, e.g. after another process
+    refreshed the token.
+    """
+
+    expiry_margin = 10
+    """
+    Seconds before `expires_at` at which a token is no longer used.
+    """
+
+    refresh_ahead = 300
+    """
+    Seconds before `expires_at` at which a token is refreshed in the background,
+    while requests keep using it.
+    """
 
     def __init__(
-        self, provider: str, client_id: str, client_secret: str, redirect_uri: str, token_endpoint: str
+        self,
+        provider: str,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str,
+        token_endpoint: str,
     ):
         self.provider = provider
         self.client_id = client_id
@@ -21,7 +60,13 @@ class TokenStore:
         self.redirect_uri = redirect_uri
         self.token_endpoint = token_endpoint
         self.provider_file = os.path.join(creds_dir, f"{provider}.json")
-        
+        self.lock_file = os.path.join(creds_dir, f"{provider}.lock")
+        self.lock = _provider_lock(provider)
+        self.token_data: Optional[dict] = None
+        self.stamp: Optional[tuple[int, int]] = None
+        self.refreshing = False
+        self.refreshing_lock = threading.Lock()
+
         # Create path of file if it doesn't exist
         os.makedirs(os.path.dirname(self.provider_file), exist_ok=True)
 
@@ -33,23 +78,27 @@ class TokenStore:
         if "expires_in" in token_data:
             token_data["expires_at"] = int(time.time()) + token_data["expires_in"]
 
-        with open(self.provider_file, "w") as file:
-            json.dump(token_data, file)
+        # Written to a temporary file first, so other processes never read a
+        # partial token. It is only ever readable by the user.
+        temporary = f"{self.provider_file}.{os.getpid()}.tmp"
+        try:
+            with open(
+                os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w"
+            ) as file:
+                json.dump(token_data, file)
+            os.replace(temporary, self.provider_file)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(temporary)
+            raise
 
-        os.chmod(self.provider_file, 0o600)
+        self.token_data, self.stamp = token_data, _stat(self.provider_file)
         Log.info(f"Token saved successfully for provider {self.provider}.")
 
     def access_token(self):
-        self.provider_file = os.path.join(creds_dir, f"{self.provider}.json")
-        if not os.path.exists(self.provider_file):
-            Log.info(f"No token found for provider {self.provider}.")
-            return None
-
-        with open(self.provider_file, "r") as file:
-            token_data = json.load(file)
-
+        token_data = self._load()
         if not token_data:
-            Log.info(f"Token data is missing for provider {self.provider}.")
+            Log.info(f"No token found for provider {self.provider}.")
             return None
 
         if not token_data.get("access_token"):
@@ -57,21 +106,119 @@ class TokenStore:
             return None
 
         if "expires_at" in token_data:
-            # if expires in 10 seconds, refresh token
-            if token_data["expires_at"] - int(time.time()) < 10:
-                token_data = self._refresh_access_token()
+            expires_in = token_data["expires_at"] - int(time.time())
+            if expires_in < self.expiry_margin:
+                token_data = self._refresh()
                 if not token_data:
                     return None
+            elif expires_in < self.refresh_ahead:
+                self._refresh_in_background()
 
-                self.save(token_data)
+        Log.debug(f"Access token retrieved for provider {self.provider}.")
+        return token_data["access_token"]
+
+    def cached_access_token(self) -> Optional[str]:
+        """
+        The access token if it can be used without refreshing it first, or
+        None. Never waits on a refresh, so it is safe to call on an event loop.
+        """
+        token_data = self._load()
+        if not token_data or not token_data.get("access_token"):
+            return None
 
-        Log.info(f"Access token retrieved for provider {self.provider}.")
+        if "expires_at" in token_data:
+            expires_in = token_data["expires_at"] - int(time.time())
+            if expires_in < self.expiry_margin:
+                return None
+            if expires_in < self.refresh_ahead:
+                self._refresh_in_background()
         return token_data["access_token"]
 
+    def delete(self):
+        self.token_data, self.stamp = None, None
+        if os.path.exists(self.provider_file):
+            os.remove(self.provider_file)
+            Log.info(f"Token deleted for provider {self.provider}.")
+        else:
+            Log.info(f"No token found for provider {self.provider}.")
+
+    # Mark: - Private
+
+    def _load(self) -> Optional[dict]:
+        stamp = _stat(self.provider_file)
+        if stamp is None:
+            self.token_data, self.stamp = None, None
+            return None
+        if stamp == self.stamp:
+            return self.token_data
+
+        try:
+            with open(self.provider_file, "r") as file:
+                token_data = json.load(file)
+        except (OSError, ValueError):
+            Log.error(f"Failed to read token for provider {self.provider}.")
+            return None
+
+        self.token_data, self.stamp = token_data, stamp
+        return token_data
+
+    def _refresh(self, ahead: bool = False) -> Optional[dict]:
+        # Whoever gets the locks first refreshes. Everyone else finds the new
+        # token in the file once they get their turn.
+        with tracer.span(
+            "token.refresh", provider=self.provider, ahead=ahead
+        ) as span, self.lock, self._file_lock():
+            token_data = self._load()
+            if not token_data:
+                return None
+
+            margin = self.refresh_ahead if ahead else self.expiry_margin
+            if token_data.get("expires_at", 0) - int(time.time()) >= margin:
+                span.set_attribute("refreshed", False)
+                return token_data
+
+            span.set_attribute("refreshed", True)
+            token_data = self._refresh_access_token(token_data)
+            if not token_data:
+                return None
+
+            self.save(token_data)
+            return token_data
+
+    def _refresh_in_background(self):
+        with self.refreshing_lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def refresh():
+            try:
+                self._refresh(ahead=True)
+            except Exception:
+                Log.exception(f"Failed to refresh token for provider {self.provider}.")
+            finally:
+                with self.refreshing_lock:
+                    self.refreshing = False
+
+        threading.Thread(
+            target=refresh, name=f"TokenRefresh-{self.provider}", daemon=True
+        ).start()
+
+    @contextmanager
+    def _file_lock(self):
+        if not fcntl:
+            yield
+            return
+
+        with open(self.lock_file, "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
     def _refresh_access_token(self, token_data: dict) -> dict:
         Log.info(f"Refreshing token for provider {self.provider}.")
-        with open(self.provider_file, "r") as file:
-            token_data = json.load(file)
 
         if not token_data.get("refresh_token"):
             Log.info(f"Refresh token is missing for provider {self.provider}.")
@@ -100,10 +247,10 @@ class TokenStore:
             Log.error(f"Failed to refresh token for provider {self.provider}.")
             return None
 
-    def delete(self):
-        self.provider_file = os.path.join(creds_dir, f"{self.provider}.json")
-        if os.path.exists(self.provider_file):
-            os.remove(self.provider_file)
-            Log.info(f"Token deleted for provider {self.provider}.")
-        else:
-            Log.info(f"No token found for provider {self.provider}.")
+
+def _stat(path: str) -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
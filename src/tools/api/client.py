@@ -1,83 +1,93 @@
-import logging
-import requests
+import time, logging, threading
+from typing import Iterator, Optional
 import requests_cache
-from retry_requests import retry
-
-import urllib.parse
+from pydantic import BaseModel
 from .provider import Provider
+from .session import session_pool
+from .scheduler import RequestScheduler, SchedulerStats
 from .auth.sign import RequestSigner
+from ...tracing import tracer, meter
+from ...context import current_cassette
 
-__all__ = ["DataClient"]
+__all__ = ["DataClient", "HttpCacheStats", "ProviderStats"]
 
 Log = logging.getLogger("DataClient")
 
-cache_session = requests_cache.CachedSession('.cache', expire_after = 300)
-retry_session = retry(cache_session, retries = 3, backoff_factor = 0.2)
-
-class DataClient:
-
-    def __init__(self, provider: Provider):
-        self.provider = provider
-        if provider.auth_config:
-            self.request_signer = RequestSigner(provider.auth_config)
-
-    def get(self, params: dict) -> dict:
-        query_params = urllib.parse.urlencode(params)
-        url = f"{self.provider.endpoint}?{query_params}"
-        headers = self.provider.headers or {}
-
-        if self.request_signer:
-            headers.update(self.request_signer.sign())
 
-        response = retry_session.get(url, headers=headers)
+class HttpCacheStats(BaseModel):
 
-        if response.status_code == 403 and self.request_signer:
-            Log.info("Token expired. Refreshing token.")
-            self.request_signer.clear()
-            headers.update(self.request_signer.sign())
-            response = retry_session.get(url, headers=headers)
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    """
+    Expired responses refreshed by a 304 to a conditional request.
+    """
 
-        if not response.ok:
-            Log.error(f"Failed to get data from {self.provider.id}")
-            return
+    stale: int = 0
+    """
+    Expired responses served while being refreshed in the background.
+    """
 
-        return response.json()
+    def __add__(self, other: "HttpCacheStats") -> "HttpCacheStats":
+        return HttpCacheStats(
+            **{
+                name: getattr(self, name) + getattr(other, name)
+                for name in HttpCacheStats.model_fields
+            }
+        )
 
-    def post(self, data: dict) -> dict:
-        headers = self.provider.headers or {}
-        url = self.provider.endpoint
 
-        if self.request_signer:
-            headers.update(self.request_signer.sign())
+class ProviderStats(BaseModel):
 
-        response = retry_session.post(url, json=data, headers=headers)
+    cache: HttpCacheStats
+    scheduler: SchedulerStats
 
-        if response.status_code == 403 and self.request_signer:
-            Log.info("Token expired. Refreshing token.")
-            self.request_signer.clear()
-            headers.update(self.request_signer.sign())
-            response = retry_session.post(url, json=data, headers=headers)
 
-        if not response.ok:
-            Log.error(f"Failed to get data from {self.provider.id}")
-            return
-
-        return response.json()
-
-    def put(self, data: dict) -> dict:
-        headers = self.provider.headers or {}
-        url = self.provider.endpoint
-
-        if self.request_signer:
-            headers.update(self.request_signer.sign())
-
-        response = retry_session.put(url, json=data, headers=headers)
+class DataClient:
 
-        if response.status_code == 403 and self.request_signer:
-            Log.info("Token expired. Refreshing token.")
-            self.request_signer.clear()
-            headers.update(self.request_signer.sign())
-            response = retry_session.put(url, json=data, headers=headers)
+    def __init__(self, provider: Provider, scheduler: RequestScheduler = None):
+        self.provider = provider
+        self.request_signer = None
+        if provider.auth_config:
+            self.request_signer = RequestSigner(provider.auth_config)
+        self.session = session_pool.get(
+            provider.endpoint, provider.client_config, provider.cache_config
+        )
+        self.timeout = (
+            provider.client_config.connect_timeout,
+            provider.client_config.read_timeout,
+        )
+        self.scheduler = scheduler or RequestScheduler(provider.rate_limit)
+        self.lock = threading.Lock()
+        self._stats = HttpCacheStats()
+
+    @property
+    def stats(self) -> ProviderStats:
+        with self.lock:
+            cache = self._stats.model_copy()
+        return ProviderStats(cache=cache, scheduler=self.scheduler.stats)
+
+    def get(self, params: dict = None, path: str = "") -> dict:
+        return self.request("GET", path=path, params=params)
+
+    def post(self, data: dict, path: str = "") -> dict:
+        return self.request("POST", path=path, data=data)
+
+    def put(self, data: dict, path: str = "") -> dict:
+        return self.request("PUT", path=path, data=data)
+
+    def delete(self, params: dict = None, path: str = "") -> dict:
+        return self.request("DELETE", path=path, params=params)
+
+    def request(
+        self,
+        method: str,
+        path: str = "",
+        params: Optional[dict] = None,
+        data: Optional[dict] = None,
+    ) -> dict:
+        url = f"{self.provider.endpoint}{path}"
+        response = self._fetch(method, url, params, data)
 
         if not response.ok:
             Log.error(f"Failed to get data from {self.provider.id}")
@@ -85,24 +95,154 @@ class DataClient:
 
         return response.json()
 
-    def delete(self, params: dict) -> dict:
-        query_params = urllib.parse.urlencode(params)
-        url = f"{self.provider.endpoint}?{query_params}"
-        headers = self.provider.headers or {}
-
+    def paginate(self, path: str = "", params: Optional[dict] = None) -> Iterator:
+        """
+        Yields the items of a paginated list endpoint, following `Link:
+        rel="next"` headers, and raises if a page can't be fetched. Pages are
+        only fetched as the iterator is consumed, so a caller that stops early
+        never requests the remaining pages.
+        """
+        url = f"{self.provider.endpoint}{path}"
+        while url:
+            response = self._fetch("GET", url, params, None)
+            if not response.ok:
+                Log.error(f"Failed to get data from {self.provider.id}")
+                # Stopping here would look like the end of the list.
+                response.raise_for_status()
+
+            yield from response.json()
+
+            # The next link already carries the query parameters.
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+    def _fetch(
+        self, method: str, url: str, params: Optional[dict], data: Optional[dict]
+    ):
+        deadline = time.monotonic() + self.provider.rate_limit.max_wait
+        refreshed = False
+
+        with tracer.span(
+            "http.request", provider=self.provider.id, method=method, url=url
+        ) as span:
+            # Responses the cache can answer neither wait for nor use up the
+            # quota, even while the provider asks us to back off.
+            response = self._send_cached(method, url, params)
+            if response is not None:
+                return response
+
+            attempts = 0
+            while True:
+                attempts += 1
+                span.set_attribute("attempts", attempts)
+                self.scheduler.acquire(deadline)
+                response = self._send(method, url, params, data)
+
+                if getattr(response, "from_cache", False):
+                    # Revalidated by a 304, which doesn't use up the quota.
+                    self.scheduler.refund()
+                    return response
+
+                if self.scheduler.observe(response):
+                    Log.info(f"Rate limited by {self.provider.id}. Retrying.")
+                    continue
+
+                if _is_auth_failure(response) and self.request_signer and not refreshed:
+                    Log.info("Token expired. Refreshing token.")
+                    self.request_signer.clear()
+                    refreshed = True
+                    continue
+
+                span.set_attribute("status_code", response.status_code)
+                return response
+
+    def _send_cached(self, method: str, url: str, params: Optional[dict]):
+        # Returns None unless the cache has a response it may serve as it is.
+        cassette = current_cassette.get()
+        if (
+            method != "GET"
+            or not isinstance(self.session, requests_cache.CachedSession)
+            or (cassette and cassette.is_replaying)
+        ):
+            return None
+
+        response = self._send(method, url, params, None, only_if_cached=True)
+        if response.status_code == 504:
+            # Not cached, or expired beyond stale-while-revalidate.
+            return None
+        return response
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        params: Optional[dict],
+        data: Optional[dict],
+        **kwargs,
+    ):
+        cassette = current_cassette.get()
+        if cassette and cassette.is_replaying:
+            response = cassette.replay_http(method, url, params)
+            self._record(response)
+            return response
+
+        headers = dict(self.provider.headers)
         if self.request_signer:
             headers.update(self.request_signer.sign())
 
-        response = retry_session.delete(url, headers=headers)
-
-        if response.status_code == 403 and self.request_signer:
-            Log.info("Token expired. Refreshing token.")
-            self.request_signer.clear()
-            headers.update(self.request_signer.sign())
-            response = retry_session.delete(url, headers=headers)
-
-        if not response.ok:
-            Log.error(f"Failed to get data from {self.provider.id}")
-            return
-
-        return response.json()
+        response = self.session.request(
+            method,
+            url,
+            params=params,
+            json=data,
+            headers=headers,
+            timeout=self.timeout,
+            **kwargs,
+        )
+        if kwargs.get("only_if_cached") and response.status_code == 504:
+            # A cache miss, not a response, so it isn't recorded or counted.
+            return response
+        if cassette:
+            cassette.record_http(method, url, params, data, response)
+        self._record(response)
+        return response
+
+    def _record(self, response):
+        if not getattr(response, "from_cache", False):
+            outcome = "misses"
+        elif getattr(response, "revalidated", False):
+            outcome = "revalidations"
+        elif getattr(response, "is_expired", False):
+            outcome = "stale"
+        else:
+            outcome = "hits"
+
+        with self.lock:
+            setattr(self._stats, outcome, getattr(self._stats, outcome) + 1)
+
+        # Retries urllib3 made for connection errors and 5xx responses.
+        retry = getattr(getattr(response, "raw", None), "retries", None)
+        retries = len(retry.history) if retry else 0
+        _trace(self.provider.id, outcome, retries)
+
+
+def _is_auth_failure(response) -> bool:
+    # A 403 with rate-limit headers is a secondary limit the scheduler didn't
+    # recognise, not a reason to throw away a valid token.
+    if response.status_code == 401:
+        return True
+    return response.status_code == 403 and not any(
+        name.lower().startswith("x-ratelimit-") or name.lower() == "retry-after"
+        for name in response.headers
+    )
+
+
+def _trace(provider: str, outcome: str, retries: int):
+    meter.counter("http.cache").add(provider=provider, outcome=outcome)
+    if retries:
+        meter.counter("http.retries").add(retries, provider=provider)
+
+    span = tracer.current_span
+    if span:
+        span.set_attribute("cache", outcome)
+        span.set_attribute("retries", span.attributes.get("retries", 0) + retries)
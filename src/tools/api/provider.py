@@ -1,8 +1,115 @@
+import os
+from enum import Enum
 from typing import Optional
 from pydantic import BaseModel
 from .auth.provider import ProviderAuthConfig
 
-__all__ = ["Provider"]
+__all__ = [
+    "Provider",
+    "ClientConfig",
+    "CacheConfig",
+    "CacheBackend",
+    "RateLimitConfig",
+]
+
+CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "terrarium", "http"
+)
+
+
+class CacheBackend(str, Enum):
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+    FILESYSTEM = "filesystem"
+    NONE = "none"
+
+
+class CacheConfig(BaseModel):
+    """
+    HTTP cache of a provider's GET responses.
+    """
+
+    backend: CacheBackend = CacheBackend.SQLITE
+
+    location: str = CACHE_DIR
+    """
+    Directory of the sqlite and filesystem backends.
+    """
+
+    ttl: Optional[float] = 300
+    """
+    Seconds a response stays fresh when the server gives no Cache-Control
+    directive, or always if `cache_control` is False. None never expires.
+    Expired responses carrying an ETag or Last-Modified are revalidated with a
+    conditional request, and a 304 refreshes them without a new body.
+    """
+
+    cache_control: bool = True
+    """
+    Honor Cache-Control and Expires headers of responses.
+    """
+
+    stale_while_revalidate: Optional[float] = 60
+    """
+    Seconds past expiry a response is still served while it is refreshed in
+    the background. None always waits for revalidation.
+    """
+
+
+class ClientConfig(BaseModel):
+    """
+    Connection settings of the session serving a provider's host.
+    """
+
+    pool_connections: int = 4
+    """
+    Number of connection pools to cache, one per host.
+    """
+
+    pool_maxsize: int = 16
+    """
+    Maximum number of connections kept alive per host.
+    """
+
+    pool_block: bool = False
+    """
+    Whether to wait for a free connection instead of opening an extra one.
+    """
+
+    keep_alive: bool = True
+
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    retries: int = 3
+    backoff_factor: float = 0.2
+
+
+class RateLimitConfig(BaseModel):
+    """
+    Scheduling of a provider's requests. The limits below apply until the
+    provider's X-RateLimit headers report a tighter budget.
+    """
+
+    rate: float = 10.0
+    """
+    Requests per second.
+    """
+
+    burst: int = 10
+    """
+    Requests that may be sent at once after a quiet period.
+    """
+
+    max_wait: float = 30.0
+    """
+    Seconds a request may wait for its turn, including pauses imposed by the
+    provider, before it fails.
+    """
+
+    backoff: float = 60.0
+    """
+    Seconds to pause after a rate-limit response without a Retry-After header.
+    """
 
 
 class Provider(BaseModel):
@@ -10,4 +117,7 @@ class Provider(BaseModel):
     name: str
     auth_config: Optional[ProviderAuthConfig]
     endpoint: str
-    headers: dict
\ No newline at end of file
+    headers: dict
+    client_config: ClientConfig = ClientConfig()
+    cache_config: CacheConfig = CacheConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
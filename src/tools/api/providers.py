@@ -0,0 +1,141 @@
+import os, logging, threading
+from typing import Callable
+from .client import DataClient, HttpCacheStats, ProviderStats
+from .async_client import AsyncDataClient
+from .scheduler import RequestScheduler
+from .provider import Provider
+from .auth.provider import ProviderAuthConfig, AuthType
+
+__all__ = ["ProviderRegistry", "providers"]
+
+Log = logging.getLogger("ProviderRegistry")
+
+
+class ProviderRegistry:
+    """
+    Builds each provider and its clients once, on first use, and hands out
+    the same instances afterwards. The sync and async client of a provider
+    share its rate limit.
+    """
+
+    def __init__(self):
+        self.factories: dict[str, Callable[[], Provider]] = {}
+        self.providers: dict[str, Provider] = {}
+        self.schedulers: dict[str, RequestScheduler] = {}
+        self.clients: dict[str, DataClient] = {}
+        self.async_clients: dict[str, AsyncDataClient] = {}
+        self.lock = threading.Lock()
+
+    def register(self, id: str, factory: Callable[[], Provider]):
+        with self.lock:
+            self.factories[id] = factory
+            self.providers.pop(id, None)
+            self.schedulers.pop(id, None)
+            self.clients.pop(id, None)
+            self.async_clients.pop(id, None)
+
+    def client(self, id: str) -> DataClient:
+        with self.lock:
+            client = self.clients.get(id)
+            if not client:
+                provider = self._provider(id)
+                client = DataClient(provider, scheduler=self.schedulers[id])
+                self.clients[id] = client
+            return client
+
+    def async_client(self, id: str) -> AsyncDataClient:
+        with self.lock:
+            client = self.async_clients.get(id)
+            if not client:
+                provider = self._provider(id)
+                client = AsyncDataClient(provider, scheduler=self.schedulers[id])
+                self.async_clients[id] = client
+            return client
+
+    def stats(self) -> dict[str, ProviderStats]:
+        """
+        Cache and scheduling statistics of each provider used so far.
+        """
+        with self.lock:
+            ids = list(self.providers)
+            clients = dict(self.clients)
+            async_clients = dict(self.async_clients)
+
+        stats = {}
+        for id in ids:
+            cache = HttpCacheStats()
+            for client in (clients.get(id), async_clients.get(id)):
+                if client:
+                    cache += client.stats.cache
+            stats[id] = ProviderStats(cache=cache, scheduler=self.schedulers[id].stats)
+        return stats
+
+    # Mark: - Private
+
+    def _provider(self, id: str) -> Provider:
+        # Must be called with self.lock held.
+        provider = self.providers.get(id)
+        if provider:
+            return provider
+
+        factory = self.factories.get(id)
+        if not factory:
+            raise Exception(f"Provider with id {id} not found.")
+
+        provider = factory()
+        self.providers[id] = provider
+        self.schedulers[id] = RequestScheduler(provider.rate_limit)
+        Log.info(f"Provider created > {id}")
+        return provider
+
+
+def github() -> Provider:
+    return Provider(
+        id="github",
+        name="GitHub",
+        auth_config=ProviderAuthConfig(
+            id="github",
+            type=AuthType.OAUTH_CLIENT_SECRET,
+            client_id=os.getenv("GITHUB_CLIENT_ID"),
+            client_secret=os.getenv("GITHUB_CLIENT_SECRET"),
+            api_key=None,
+            authorization_endpoint="https://github.com/login/oauth/authorize",
+            token_endpoint="https://github.com/login/oauth/access_token",
+            scope="repo",
+            redirect_uri="http://127.0.0.1:5000/github/callback",
+            header="Authorization",
+            token_prefix="Bearer ",
+        ),
+        endpoint="https://api.github.com",
+        headers={
+            "X-GitHub-Api-Version": "2022-11-28",
+            "Accept": "application/vnd.github+json",
+        },
+    )
+
+
+def news() -> Provider:
+    return Provider(
+        id="news",
+        name="News",
+        auth_config=ProviderAuthConfig(
+            id="news",
+            type=AuthType.API_KEY,
+            client_id=None,
+            client_secret=None,
+            api_key=os.getenv("NEWS_API_KEY"),
+            authorization_endpoint=None,
+            token_endpoint=None,
+            scope=None,
+            redirect_uri=None,
+            header="Authorization",
+            token_prefix="",
+        ),
+        endpoint="https://newsapi.org/v2",
+        headers={},
+    )
+
+
+providers = ProviderRegistry()
+providers.register("github", github)
+providers.register("news", news)
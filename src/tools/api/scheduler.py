@@ -0,0 +1,277 @@
+import time, asyncio, logging, threading
+from typing import Callable, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from collections import deque
+from pydantic import BaseModel
+from .provider import RateLimitConfig
+from ...context import current_conversation
+
+__all__ = ["RequestScheduler", "SchedulerStats", "RateLimitError"]
+
+Log = logging.getLogger("RequestScheduler")
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class SchedulerStats(BaseModel):
+
+    requests: int = 0
+    throttled: int = 0
+    """
+    Requests that had to wait for their turn.
+    """
+
+    rate_limited: int = 0
+    """
+    Responses telling us to slow down, i.e. 429s and secondary-limit 403s.
+    """
+
+    rejected: int = 0
+    """
+    Requests that failed because their turn would come after their deadline.
+    """
+
+    wait_time: float = 0.0
+    """
+    Total seconds requests spent waiting for their turn.
+    """
+
+    max_wait_time: float = 0.0
+    queued: int = 0
+
+
+class Waiter:
+
+    __slots__ = ("conversation", "started", "granted", "wake")
+
+    def __init__(self, conversation: str, wake: Optional[Callable] = None):
+        self.conversation = conversation
+        self.started = time.monotonic()
+        self.granted = False
+        self.wake = wake
+
+
+class RequestScheduler:
+    """
+    Token bucket in front of a provider. The bucket is refilled at the rate the
+    provider's remaining quota allows until its reset, and drained entirely
+    while the provider asks us to back off. Waiting requests are queued per
+    conversation and the conversations take turns, so one busy conversation
+    can't starve the others.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.rate = config.rate
+        self.tokens = float(config.burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.queues: dict[str, deque[Waiter]] = {}
+        self.turns: deque[str] = deque()
+        self.condition = threading.Condition()
+        self._stats = SchedulerStats()
+
+    @property
+    def stats(self) -> SchedulerStats:
+        with self.condition:
+            queued = sum(len(queue) for queue in self.queues.values())
+            return self._stats.model_copy(update={"queued": queued})
+
+    def acquire(self, deadline: float):
+        """
+        Blocks until the calling conversation may send a request. Raises
+        `RateLimitError` if that would be after `deadline`, a `time.monotonic()`
+        timestamp.
+        """
+        waiter = self._join()
+        try:
+            with self.condition:
+                while (wait := self._poll(waiter, deadline)) is not None:
+                    self.condition.wait(wait)
+        finally:
+            self._leave(waiter)
+
+    async def acquire_async(self, deadline: float):
+        """
+        Like `acquire`, without blocking the event loop.
+        """
+        # Coroutines can't wait on the condition, they are woken up through an
+        # event set on their own loop instead.
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._join(wake=lambda: loop.call_soon_threadsafe(event.set))
+        try:
+            while True:
+                with self.condition:
+                    event.clear()
+                    wait = self._poll(waiter, deadline)
+                if wait is None:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._leave(waiter)
+
+    def refund(self):
+        """
+        Returns the slot of a request that never reached the provider, e.g. one
+        served from cache.
+        """
+        with self.condition:
+            self.tokens = min(self.tokens + 1, self.config.burst)
+            self._notify()
+
+    def observe(self, response) -> bool:
+        """
+        Updates the bucket from the rate-limit headers of `response`. Returns
+        whether the provider rejected the request for exceeding a limit.
+        """
+        headers = response.headers
+        remaining = _number(headers.get("X-RateLimit-Remaining"))
+        reset = _number(headers.get("X-RateLimit-Reset"))
+        retry_after = _retry_after(headers.get("Retry-After"))
+
+        limited = response.status_code == 429 or (
+            response.status_code == 403 and (retry_after is not None or remaining == 0)
+        )
+
+        with self.condition:
+            now = time.monotonic()
+            self._refill(now)
+
+            blocked = False
+            if remaining is not None and reset is not None:
+                window = max(1.0, reset - time.time())
+                # Spread what is left of the quota over the rest of the window.
+                self.rate = min(self.config.rate, max(remaining, 1) / window)
+                self.tokens = min(self.tokens, remaining)
+                if remaining == 0:
+                    self._block(now + window)
+                    blocked = True
+
+            if limited:
+                self._stats.rate_limited += 1
+                if retry_after is not None:
+                    self._block(now + retry_after)
+                elif not blocked:
+                    self._block(now + self.config.backoff)
+
+            self._notify()
+        return limited
+
+    # Mark: - Private
+
+    def _join(self, wake: Optional[Callable] = None) -> Waiter:
+        waiter = Waiter(current_conversation.get(), wake)
+        with self.condition:
+            self._stats.requests += 1
+            self._enqueue(waiter)
+        return waiter
+
+    def _poll(self, waiter: Waiter, deadline: float) -> Optional[float]:
+        # Must be called with self.condition held. Returns None once `waiter`
+        # may go, or how long to wait before asking again.
+        now = time.monotonic()
+        delay = None
+        if self._next() is waiter:
+            delay = self._delay(now)
+            if delay == 0:
+                self.tokens -= 1
+                waiter.granted = True
+                return None
+            if now + delay > deadline:
+                self._stats.rejected += 1
+                raise RateLimitError(f"Rate limited for another {delay:.0f}s.")
+
+        if now >= deadline:
+            self._stats.rejected += 1
+            raise RateLimitError("Timed out waiting for a request slot.")
+        return min(delay or deadline - now, deadline - now)
+
+    def _leave(self, waiter: Waiter):
+        with self.condition:
+            self._dequeue(waiter)
+            self._notify()
+
+            waited = time.monotonic() - waiter.started
+            if waiter.granted and waited > 0.001:
+                self._stats.throttled += 1
+                self._stats.wait_time += waited
+                self._stats.max_wait_time = max(self._stats.max_wait_time, waited)
+
+    def _notify(self):
+        # Must be called with self.condition held.
+        self.condition.notify_all()
+        for queue in self.queues.values():
+            for waiter in queue:
+                if waiter.wake:
+                    waiter.wake()
+
+    def _enqueue(self, waiter: Waiter):
+        queue = self.queues.setdefault(waiter.conversation, deque())
+        queue.append(waiter)
+        if len(queue) == 1:
+            self.turns.append(waiter.conversation)
+
+    def _dequeue(self, waiter: Waiter):
+        queue = self.queues[waiter.conversation]
+        served = queue[0] is waiter
+        queue.remove(waiter)
+
+        if not queue:
+            del self.queues[waiter.conversation]
+            self.turns.remove(waiter.conversation)
+        elif served and self.turns[0] == waiter.conversation:
+            # The conversation goes to the back of the line for its next request.
+            self.turns.rotate(-1)
+
+    def _next(self) -> Optional[Waiter]:
+        if not self.turns:
+            return None
+        return self.queues[self.turns[0]][0]
+
+    def _delay(self, now: float) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.config.burst, self.tokens + elapsed * self.rate)
+        self.updated_at = max(self.updated_at, now)
+
+    def _block(self, until: float):
+        if until > self.blocked_until:
+            # One request may go right after the pause, then the bucket refills.
+            self.blocked_until = until
+            self.tokens = 1
+            self.updated_at = until
+            Log.info(f"Paused for {until - time.monotonic():.1f}s")
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    # Either a number of seconds or an HTTP date.
+    seconds = _number(value)
+    if seconds is not None or value is None:
+        return seconds
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,186 @@
+import os, asyncio, weakref, logging, itertools, threading, urllib.parse
+import importlib.util
+from functools import cache
+import httpx
+import requests
+import requests_cache
+from urllib3 import Retry
+from requests.adapters import HTTPAdapter
+from .provider import ClientConfig, CacheConfig, CacheBackend
+
+__all__ = ["SessionPool", "session_pool", "AsyncClientPool", "async_client_pool"]
+
+Log = logging.getLogger("SessionPool")
+
+
+class SessionPool:
+    """
+    One long-lived, connection-pooled session per host and configuration,
+    shared by every DataClient talking to that host.
+    """
+
+    def __init__(self):
+        self.sessions: dict[tuple[str, str, str], requests.Session] = {}
+        self.lock = threading.Lock()
+
+    def get(
+        self, url: str, config: ClientConfig, cache_config: CacheConfig = CacheConfig()
+    ) -> requests.Session:
+        host = urllib.parse.urlsplit(url).netloc
+        key = (host, config.model_dump_json(), cache_config.model_dump_json())
+        with self.lock:
+            session = self.sessions.get(key)
+            if not session:
+                session = self._build(host, config, cache_config)
+                self.sessions[key] = session
+                Log.info(f"Session created for {host}")
+            return session
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+    def _build(
+        self, host: str, config: ClientConfig, cache_config: CacheConfig
+    ) -> requests.Session:
+        session = _cached_session(host, cache_config)
+
+        retry = Retry(
+            total=config.retries,
+            read=config.retries,
+            connect=config.retries,
+            backoff_factor=config.backoff_factor,
+            status_forcelist=(500, 502, 504),
+            allowed_methods=None,
+            # Rate limits are handled by the provider's RequestScheduler.
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            max_retries=retry,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        if not config.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+
+def _cached_session(host: str, config: CacheConfig) -> requests.Session:
+    if config.backend == CacheBackend.NONE:
+        return requests.Session()
+
+    cache_name = host.replace(":", "_")
+    if config.backend == CacheBackend.SQLITE:
+        os.makedirs(config.location, exist_ok=True)
+        cache_name = os.path.join(config.location, f"{cache_name}.sqlite")
+    elif config.backend == CacheBackend.FILESYSTEM:
+        cache_name = os.path.join(config.location, cache_name)
+
+    return requests_cache.CachedSession(
+        cache_name,
+        backend=config.backend.value,
+        expire_after=-1 if config.ttl is None else config.ttl,
+        cache_control=config.cache_control,
+        stale_while_revalidate=(
+            False
+            if config.stale_while_revalidate is None
+            else config.stale_while_revalidate
+        ),
+    )
+
+
+class AsyncClientPool:
+    """
+    Long-lived `httpx.AsyncClient`s per host, configuration and event loop.
+    Connections belong to the loop they were opened on, so loops don't share
+    clients.
+
+    httpcore scans every connection for every queued request, which costs more
+    than the requests themselves past a few dozen HTTP/1.1 connections. The
+    connections of a host are therefore split across several clients of at
+    most `connections_per_client` each, used in turn.
+    """
+
+    connections_per_client = 10
+
+    def __init__(self):
+        self.clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[tuple[str, str], "Shards"]
+        ] = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def get(self, url: str, config: ClientConfig) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        host = urllib.parse.urlsplit(url).netloc
+        key = (host, config.model_dump_json())
+        with self.lock:
+            clients = self.clients.setdefault(loop, {})
+            shards = clients.get(key)
+            if not shards or shards.is_closed:
+                shards = Shards(config, self.connections_per_client)
+                clients[key] = shards
+                Log.info(
+                    f"{len(shards.clients)} async clients created for {host} "
+                    f"(HTTP/2: {_http2()})"
+                )
+            return shards.next()
+
+    async def aclose(self):
+        """
+        Closes the clients of the running event loop.
+        """
+        with self.lock:
+            clients = self.clients.pop(asyncio.get_running_loop(), {})
+        for shards in clients.values():
+            for client in shards.clients:
+                await client.aclose()
+
+
+class Shards:
+
+    def __init__(self, config: ClientConfig, connections_per_client: int):
+        # HTTP/2 multiplexes requests over a single connection, so one client
+        # does.
+        count = 1 if _http2() else -(-config.pool_maxsize // connections_per_client)
+        self.clients = [_async_client(config, count) for _ in range(count)]
+        self.turn = itertools.count()
+
+    @property
+    def is_closed(self) -> bool:
+        return any(client.is_closed for client in self.clients)
+
+    def next(self) -> httpx.AsyncClient:
+        return self.clients[next(self.turn) % len(self.clients)]
+
+
+@cache
+def _http2() -> bool:
+    # HTTP/2 support is optional, it needs the h2 package.
+    return importlib.util.find_spec("h2") is not None
+
+
+def _async_client(config: ClientConfig, shards: int) -> httpx.AsyncClient:
+    # Like requests' pools, only a blocking pool caps the connections, otherwise
+    # extra connections are opened and dropped after use.
+    connections = -(-config.pool_maxsize // shards)
+    limits = httpx.Limits(
+        max_connections=connections if config.pool_block else None,
+        max_keepalive_connections=connections if config.keep_alive else 0,
+    )
+    transport = httpx.AsyncHTTPTransport(
+        http2=_http2(), limits=limits, retries=config.retries
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+    )
+
+
+session_pool = SessionPool()
+async_client_pool = AsyncClientPool()
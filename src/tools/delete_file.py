@@ -1,6 +1,7 @@
 import os
 from typing import override
 from ..tool import Tool
+from ..cache import CachePolicy
 
 
 __all__ = ["DeleteFile"]
@@ -8,6 +9,8 @@ __all__ = ["DeleteFile"]
 
 class DeleteFile(Tool):
 
+    cache_policy = CachePolicy.never(invalidates=["path"])
+
     @override
     @classmethod
     def name(self) -> str:
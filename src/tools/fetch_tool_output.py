@@ -0,0 +1,97 @@
+import threading
+from typing import override
+from collections import OrderedDict
+from ..tool import Tool
+from ..spill import spill_store
+from ..tokens import token_pages
+
+__all__ = ["FetchToolOutput"]
+
+
+class FetchToolOutput(Tool):
+
+    page_tokens = 2_000
+
+    @override
+    @classmethod
+    def name(self) -> str:
+        return "fetch_tool_output"
+
+    @override
+    @property
+    def obj(self) -> dict:
+        return {
+            "name": FetchToolOutput.name(),
+            "description": (
+                "Reads a page of a tool output that was too large to return "
+                "directly. Use the handle given in place of the output."
+            ),
+            "strict": True,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "handle": {
+                        "type": "string",
+                        "description": "The handle of the stored output.",
+                    },
+                    "page": {
+                        "type": ["integer", "null"],
+                        "description": "The page to read, starting at 1. Defaults to 1.",
+                    },
+                },
+                "additionalProperties": False,
+                "required": ["handle", "page"],
+            },
+        }
+
+    @classmethod
+    def add_pages(cls, handle: str, pages: list[tuple[int, int]]):
+        """
+        Caches the pages of a stored output, split by `token_pages` at
+        `page_tokens`, so they aren't split again when first fetched.
+        """
+        _cache_pages(handle, pages)
+
+    @override
+    def call(self, args: dict) -> str:
+        handle = args["handle"]
+        output = spill_store.get(handle)
+        if output is None:
+            raise Exception(f"No stored output with handle {handle}.")
+
+        pages = _pages(handle, output)
+        page = min(max(1, args.get("page") or 1), len(pages))
+        start, end = pages[page - 1]
+
+        return f"[{handle}: page {page} of {len(pages)}]\n{output[start:end]}"
+
+
+_max_cached_pages = 10_000
+
+# Page offsets of recent handles, least recently used first. Only offsets are
+# kept, outputs are read back from the spill store.
+_cached_pages: OrderedDict[str, list[tuple[int, int]]] = OrderedDict()
+_cached_pages_lock = threading.Lock()
+
+
+def _pages(handle: str, output: str) -> list[tuple[int, int]]:
+    # Handles are content addresses, so their pages never change.
+    with _cached_pages_lock:
+        pages = _cached_pages.get(handle)
+        if pages:
+            _cached_pages.move_to_end(handle)
+            return pages
+
+    pages = token_pages(output, FetchToolOutput.page_tokens)
+    _cache_pages(handle, pages)
+    return pages
+
+
+def _cache_pages(handle: str, pages: list[tuple[int, int]]):
+    with _cached_pages_lock:
+        _cached_pages[handle] = pages
+        # Bounded by the offsets held rather than by handles, so a few huge
+        # outputs can't hold as much as many small ones.
+        count = sum(len(p) for p in _cached_pages.values())
+        while count > _max_cached_pages and len(_cached_pages) > 1:
+            count -= len(_cached_pages.popitem(last=False)[1])
@@ -1,14 +1,25 @@
-import os, json
+import json
 from typing import override
+from itertools import islice
+from contextlib import aclosing
 from ..tool import Tool
-from .api import Provider, DataClient
-from .api.auth.provider import ProviderAuthConfig, AuthType
+from ..cache import CachePolicy
+from .api import providers
 
 __all__ = ["GetGitHubCommits"]
 
 
 class GetGitHubCommits(Tool):
 
+    cache_policy = CachePolicy.time_to_live(300)
+
+    default_max_commits = 30
+    max_commits = 500
+    per_page = 100
+    """
+    Largest page size GitHub allows.
+    """
+
     @override
     @classmethod
     def name(self) -> str:
@@ -19,54 +30,92 @@ class GetGitHubCommits(Tool):
     def obj(self) -> dict:
         return {
             "name": GetGitHubCommits.name(),
-            "description": "Get the commits of a GitHub repository.",
+            "description": (
+                "Get the commits of a GitHub repository, newest first, with their "
+                "sha, author, date and the first line of their message."
+            ),
             "strict": True,
             "parameters": {
                 "type": "object",
                 "properties": {
                     "repo": {
                         "type": "string",
-                        "description": "The repository to get the commits from.",
+                        "description": "The repository to get the commits from, e.g. `owner/name`.",
                     },
                     "since": {
-                        "type": "string",
+                        "type": ["string", "null"],
                         "description": "Only commits after this date will be returned. Format: YYYY-MM-DDTHH:MM:SSZ",
                     },
+                    "until": {
+                        "type": ["string", "null"],
+                        "description": "Only commits before this date will be returned. Format: YYYY-MM-DDTHH:MM:SSZ",
+                    },
+                    "author": {
+                        "type": ["string", "null"],
+                        "description": "Only commits by this GitHub login or email address.",
+                    },
+                    "path": {
+                        "type": ["string", "null"],
+                        "description": "Only commits touching this file or directory.",
+                    },
+                    "max_commits": {
+                        "type": ["integer", "null"],
+                        "description": "Maximum number of commits to return. Defaults to 30.",
+                    },
                 },
                 "additionalProperties": False,
-                "required": ["repo", "since"],
+                "required": ["repo", "since", "until", "author", "path", "max_commits"],
             },
         }
 
     @override
     def call(self, args: dict) -> str:
         repo = args["repo"]
-        since = args["since"]
-
-        gh_provider = Provider(
-            id="github",
-            name="GitHub",
-            auth_config=ProviderAuthConfig(
-                id="github",
-                type=AuthType.OAUTH_CLIENT_SECRET,
-                client_id=os.getenv("GITHUB_CLIENT_ID"),
-                client_secret=os.getenv("GITHUB_CLIENT_SECRET"),
-                api_key=None,
-                authorization_endpoint="https://github.com/login/oauth/authorize",
-                token_endpoint="https://github.com/login/oauth/access_token",
-                scope="repo",
-                redirect_uri="http://127.0.0.1:5000/github/callback",
-                header="Authorization",
-                token_prefix="Bearer ",
-            ),
-            endpoint=f"https://api.github.com/repos/{repo}/commits",
-            headers={
-                "X-GitHub-Api-Version": "2022-11-28",
-                "Accept": "application/vnd.github+json",
-            },
+
+        client = providers.client("github")
+        commits = client.paginate(f"/repos/{repo}/commits", self._params(args))
+
+        # islice stops consuming, and with it fetching pages, at the limit.
+        max_commits = self._max_commits(args)
+        return json.dumps([_project(c) for c in islice(commits, max_commits)])
+
+    @override
+    async def acall(self, args: dict) -> str:
+        repo = args["repo"]
+        max_commits = self._max_commits(args)
+
+        client = providers.async_client("github")
+        commits = []
+        pages = client.paginate(f"/repos/{repo}/commits", self._params(args))
+        async with aclosing(pages):
+            async for commit in pages:
+                commits.append(_project(commit))
+                # Stop before the next item, which may be on a page not fetched yet.
+                if len(commits) == max_commits:
+                    break
+        return json.dumps(commits)
+
+    def _max_commits(self, args: dict) -> int:
+        return min(
+            args.get("max_commits") or self.default_max_commits, self.max_commits
         )
 
-        client = DataClient(provider=gh_provider)
+    def _params(self, args: dict) -> dict:
+        params = {
+            name: args[name]
+            for name in ("since", "until", "author", "path")
+            if args.get(name)
+        }
+        params["per_page"] = min(self._max_commits(args), self.per_page)
+        return params
+
 
-        response = client.get({"since": since})
-        return json.dumps(response)
+def _project(commit: dict) -> dict:
+    details = commit.get("commit") or {}
+    author = details.get("author") or {}
+    return {
+        "sha": commit.get("sha"),
+        "author": (commit.get("author") or {}).get("login") or author.get("name"),
+        "date": author.get("date"),
+        "message": (details.get("message") or "").split("\n", 1)[0],
+    }
@@ -1,14 +1,16 @@
-import os, json
+import json
 from typing import override
 from ..tool import Tool
-from .api import Provider, DataClient
-from .api.auth.provider import ProviderAuthConfig, AuthType
+from ..cache import CachePolicy
+from .api import providers
 
 __all__ = ["GetNews"]
 
 
 class GetNews(Tool):
 
+    cache_policy = CachePolicy.time_to_live(300)
+
     @override
     @classmethod
     def name(self) -> str:
@@ -38,27 +40,16 @@ class GetNews(Tool):
     def call(self, args: dict) -> str:
         query = args["query"]
 
-        news_provider = Provider(
-            id="news",
-            name="News",
-            auth_config=ProviderAuthConfig(
-                id="news",
-                type=AuthType.API_KEY,
-                client_id=None,
-                client_secret=None,
-                api_key=os.getenv("NEWS_API_KEY"),
-                authorization_endpoint=None,
-                token_endpoint=None,
-                scope=None,
-                redirect_uri=None,
-                header="Authorization",
-                token_prefix="",
-            ),
-            endpoint=f"https://newsapi.org/v2/top-headlines",
-            headers={},
-        )
+        client = providers.client("news")
+
+        response = client.get({"q": query}, path="/top-headlines")
+        return json.dumps(response)
+
+    @override
+    async def acall(self, args: dict) -> str:
+        query = args["query"]
 
-        client = DataClient(provider=news_provider)
+        client = providers.async_client("news")
 
-        response = client.get({"q": query})
+        response = await client.get({"q": query}, path="/top-headlines")
         return json.dumps(response)
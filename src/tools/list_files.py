@@ -1,13 +1,177 @@
-import os
-from typing import override
+import os, re, json, threading
+from typing import Optional, override
+from datetime import datetime, timezone
+from collections import OrderedDict
 from ..tool import Tool
 
+__all__ = ["ListFiles", "DirectoryIndex", "IgnoreRules"]
 
-__all__ = ["ListFiles"]
+
+class Entry:
+
+    __slots__ = ("name", "type")
+
+    def __init__(self, name: str, type: str):
+        self.name = name
+        self.type = type
+
+
+class Snapshot:
+
+    def __init__(self, mtime: int, entries: list[Entry]):
+        self.mtime = mtime
+        self.entries = entries
+        self.gitignore: Optional[tuple[tuple, "IgnoreRules"]] = None
+
+
+class DirectoryIndex:
+    """
+    In-memory listing of the names and types of directories' entries. A
+    directory is only re-scanned once its mtime changes, i.e. when entries are
+    added, removed or renamed, so walking a large workspace costs one stat per
+    directory. Sizes and mtimes change without the directory's mtime changing,
+    so they aren't kept: listings stat the entries they return.
+    """
+
+    def __init__(self, max_directories: int = 10_000):
+        self.max_directories = max_directories
+        self.snapshots: OrderedDict[str, Snapshot] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def scan(self, path: str) -> Snapshot:
+        mtime = os.stat(path).st_mtime_ns
+
+        with self.lock:
+            snapshot = self.snapshots.get(path)
+            if snapshot and snapshot.mtime == mtime:
+                self.snapshots.move_to_end(path)
+                return snapshot
+
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_symlink():
+                        type = "symlink"
+                    elif entry.is_dir():
+                        type = "dir"
+                    else:
+                        type = "file"
+                except OSError:
+                    continue
+                entries.append(Entry(entry.name, type))
+        entries.sort(key=lambda e: e.name)
+
+        snapshot = Snapshot(mtime, entries)
+        with self.lock:
+            self.snapshots[path] = snapshot
+            self.snapshots.move_to_end(path)
+            while len(self.snapshots) > self.max_directories:
+                self.snapshots.popitem(last=False)
+        return snapshot
+
+    def gitignore(self, path: str, snapshot: Snapshot) -> Optional["IgnoreRules"]:
+        if not any(e.name == ".gitignore" for e in snapshot.entries):
+            return None
+
+        file = os.path.join(path, ".gitignore")
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return None
+
+        # .gitignore edits don't change the directory mtime, so the file is
+        # validated on its own.
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if snapshot.gitignore and snapshot.gitignore[0] == stamp:
+            return snapshot.gitignore[1]
+
+        with open(file, "r", errors="replace") as f:
+            rules = IgnoreRules(f.read().splitlines())
+        snapshot.gitignore = (stamp, rules)
+        return rules
+
+
+class IgnoreRules:
+    """
+    The subset of .gitignore syntax most repositories use: globs with `*`, `?`,
+    `**` and character classes, leading `/` anchors, trailing `/` for
+    directories and `!` negation.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.rules: list[tuple[re.Pattern, bool, bool]] = []
+        for pattern in patterns:
+            pattern = pattern.rstrip()
+            if not pattern or pattern.startswith("#"):
+                continue
+
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+
+            self.rules.append((glob_regex(pattern), negate, dir_only))
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Whether the last matching rule ignores the path, or None if none match.
+        """
+        ignored = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(relative_path):
+                ignored = not negate
+        return ignored
+
+    def ignored(self, relative_path: str, is_dir: bool) -> bool:
+        return bool(self.match(relative_path, is_dir))
+
+
+def glob_regex(pattern: str) -> re.Pattern:
+    # Patterns without a slash match at any depth, others are anchored.
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex, i = "", 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1 :]:
+            end = pattern.index("]", i + 1)
+            regex += "[" + pattern[i + 1 : end].replace("!", "^", 1) + "]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex)
+
+
+directory_index = DirectoryIndex()
 
 
 class ListFiles(Tool):
 
+    default_limit = 200
+    max_limit = 1000
+
     @override
     @classmethod
     def name(self) -> str:
@@ -18,7 +182,11 @@ class ListFiles(Tool):
     def obj(self) -> dict:
         return {
             "name": ListFiles.name(),
-            "description": "Lists the files amd directories in a directory.",
+            "description": (
+                "Lists the files and directories in a directory, optionally "
+                "recursively, with their type, size and modification time. Results "
+                "are paginated; pass `next_cursor` back as `cursor` for more."
+            ),
             "strict": True,
             "parameters": {
                 "type": "object",
@@ -27,14 +195,145 @@ class ListFiles(Tool):
                         "type": "string",
                         "description": "The path of the directory.",
                     },
+                    "depth": {
+                        "type": ["integer", "null"],
+                        "description": "Levels to descend. 1, the default, lists only the directory itself.",
+                    },
+                    "pattern": {
+                        "type": ["string", "null"],
+                        "description": "Only return entries matching this glob, e.g. `**/*.py`.",
+                    },
+                    "ignore": {
+                        "type": ["array", "null"],
+                        "items": {"type": "string"},
+                        "description": "Additional .gitignore-style patterns to skip.",
+                    },
+                    "respect_gitignore": {
+                        "type": ["boolean", "null"],
+                        "description": "Skip entries ignored by .gitignore files. Defaults to true.",
+                    },
+                    "limit": {
+                        "type": ["integer", "null"],
+                        "description": "Maximum number of entries to return. Defaults to 200.",
+                    },
+                    "cursor": {
+                        "type": ["string", "null"],
+                        "description": "The `next_cursor` of a previous call.",
+                    },
                 },
                 "additionalProperties": False,
-                "required": ["path"],
+                "required": [
+                    "path",
+                    "depth",
+                    "pattern",
+                    "ignore",
+                    "respect_gitignore",
+                    "limit",
+                    "cursor",
+                ],
             },
         }
 
     @override
     def call(self, args: dict) -> str:
-        path = args["path"]
+        path = os.path.abspath(os.path.expanduser(args["path"]))
+        depth = max(1, args.get("depth") or 1)
+        pattern = glob_regex(args["pattern"]) if args.get("pattern") else None
+        extra = IgnoreRules(args.get("ignore") or [])
+        respect_gitignore = args.get("respect_gitignore") is not False
+        limit = min(args.get("limit") or self.default_limit, self.max_limit)
+        # The cursor is the last path returned, the walk resumes after it.
+        after = tuple(args["cursor"].split("/")) if args.get("cursor") else ()
+
+        entries, last, more = [], None, False
+        walk = self._walk(path, depth, pattern, extra, respect_gitignore, after)
+        for relative_path, entry in walk:
+            if len(entries) == limit:
+                more = True
+                break
+            try:
+                stat = os.stat(os.path.join(path, relative_path), follow_symlinks=False)
+            except OSError:
+                # Removed since its directory was scanned.
+                continue
+            entries.append(
+                {
+                    "path": relative_path + ("/" if entry.type == "dir" else ""),
+                    "type": entry.type,
+                    "size": stat.st_size,
+                    "modified": datetime.fromtimestamp(
+                        stat.st_mtime, tz=timezone.utc
+                    ).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }
+            )
+            last = relative_path
+
+        return json.dumps(
+            {
+                "path": path,
+                "entries": entries,
+                "next_cursor": last if more else None,
+            }
+        )
+
+    def _walk(
+        self,
+        root: str,
+        depth: int,
+        pattern: Optional[re.Pattern],
+        extra: IgnoreRules,
+        respect_gitignore: bool,
+        after: tuple[str, ...] = (),
+    ):
+        # Depth-first in name order, i.e. in the order of the paths' components,
+        # so subtrees before the cursor `after` can be skipped without a scan.
+        def visit(directory: str, relative: str, level: int, rules: list):
+            snapshot = directory_index.scan(directory)
+            if respect_gitignore:
+                gitignore = directory_index.gitignore(directory, snapshot)
+                if gitignore:
+                    rules = rules + [(relative, gitignore)]
+
+            for entry in snapshot.entries:
+                relative_path = f"{relative}/{entry.name}" if relative else entry.name
+                is_dir = entry.type == "dir"
+
+                parts = tuple(relative_path.split("/"))
+                position = after[: len(parts)]
+                if parts < position:
+                    continue
+
+                if entry.name == ".git" or extra.ignored(relative_path, is_dir):
+                    continue
+                if _gitignored(rules, relative_path, is_dir):
+                    continue
+
+                # The cursor itself and its parents were returned already.
+                if parts != position and (
+                    not pattern or pattern.fullmatch(relative_path)
+                ):
+                    yield relative_path, entry
+
+                if is_dir and level < depth:
+                    try:
+                        yield from visit(
+                            os.path.join(directory, entry.name),
+                            relative_path,
+                            level + 1,
+                            rules,
+                        )
+                    except OSError:
+                        continue
+
+        yield from visit(root, "", 1, [])
+
 
-        return str(os.listdir(path))
+def _gitignored(rules: list, relative_path: str, is_dir: bool) -> bool:
+    # Rules of deeper .gitignore files take precedence over their parents'.
+    ignored = False
+    for base, gitignore in rules:
+        path = relative_path[len(base) + 1 :] if base else relative_path
+        match = gitignore.match(path, is_dir)
+        if match is not None:
+            ignored = match
+    return ignored
@@ -1,6 +1,7 @@
 import os
 from typing import override
 from ..tool import Tool
+from ..cache import CachePolicy
 
 
 __all__ = ["MoveFile"]
@@ -8,6 +9,8 @@ __all__ = ["MoveFile"]
 
 class MoveFile(Tool):
 
+    cache_policy = CachePolicy.never(invalidates=["from_path", "to_path"])
+
     @override
     @classmethod
     def name(self) -> str:
@@ -1,12 +1,114 @@
-from typing import override
+import os, threading
+from array import array
+from typing import Optional, override
+from itertools import accumulate, count, islice
+from collections import OrderedDict
 from ..tool import Tool
+from ..cache import CachePolicy
 
+__all__ = ["ReadFile", "LineIndex"]
 
-__all__ = ["ReadFile"]
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class LineIndex:
+    """
+    Sparse index of line start offsets. Every `stride`-th line start is kept, so
+    any line is reached with one seek and at most `stride` line reads.
+    """
+
+    stride = 256
+
+    def __init__(self, path: str, size: int, mtime: int):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.lines = 0
+        self.checkpoints = array("Q", [0])
+
+    @classmethod
+    def build(cls, path: str) -> "LineIndex":
+        stat = os.stat(path)
+        index = cls(path, stat.st_size, stat.st_mtime_ns)
+        newlines, position, last = 0, 0, b""
+
+        with open(path, "rb") as file:
+            while chunk := file.read(CHUNK_SIZE):
+                segments = chunk.split(b"\n")
+                # Start offset of the line following each newline in the chunk.
+                starts = map(
+                    int.__add__,
+                    accumulate(map(len, segments[:-1])),
+                    count(position + 1),
+                )
+                first = (-(newlines + 1)) % cls.stride
+                index.checkpoints.extend(islice(starts, first, None, cls.stride))
+
+                newlines += len(segments) - 1
+                position += len(chunk)
+                last = chunk[-1:]
+
+        # A trailing newline does not start another line.
+        index.lines = newlines + (1 if position and last != b"\n" else 0)
+        return index
+
+    def offset(self, line: int) -> tuple[int, int]:
+        """
+        Returns the checkpoint offset at or before the 1-based `line`, and the
+        number of lines to skip from there.
+        """
+        checkpoint = (line - 1) // self.stride
+        return self.checkpoints[checkpoint], (line - 1) % self.stride
+
+
+class LineIndexCache:
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, LineIndex] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str) -> LineIndex:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        with self.lock:
+            index = self.entries.get(path)
+            if index and (index.size, index.mtime) == (stat.st_size, stat.st_mtime_ns):
+                self.entries.move_to_end(path)
+                return index
+
+        index = LineIndex.build(path)
+        with self.lock:
+            self.entries[path] = index
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return index
+
+    def cached(self, path: str) -> Optional[LineIndex]:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            index = self.entries.get(path)
+        if index and (index.size, index.mtime) == (stat.st_size, stat.st_mtime_ns):
+            return index
+        return None
+
+
+line_indexes = LineIndexCache()
 
 
 class ReadFile(Tool):
 
+    cache_policy = CachePolicy.mtime(paths=["path"])
+
+    max_bytes = 100_000
+    """
+    Upper bound on the content returned by a single call.
+    """
+
     @override
     @classmethod
     def name(self) -> str:
@@ -17,7 +119,10 @@ class ReadFile(Tool):
     def obj(self) -> dict:
         return {
             "name": ReadFile.name(),
-            "description": "Reads a file.",
+            "description": (
+                "Reads a file. Large files are returned in pages: pass a line range, "
+                "a byte range or `tail`, and use the reported totals to page."
+            ),
             "strict": True,
             "parameters": {
                 "type": "object",
@@ -26,17 +131,133 @@ class ReadFile(Tool):
                         "type": "string",
                         "description": "The path of the file.",
                     },
+                    "start_line": {
+                        "type": ["integer", "null"],
+                        "description": "First line to read, starting at 1.",
+                    },
+                    "end_line": {
+                        "type": ["integer", "null"],
+                        "description": "Last line to read, inclusive.",
+                    },
+                    "offset": {
+                        "type": ["integer", "null"],
+                        "description": "Byte offset to start reading at.",
+                    },
+                    "length": {
+                        "type": ["integer", "null"],
+                        "description": "Number of bytes to read from `offset`.",
+                    },
+                    "tail": {
+                        "type": ["integer", "null"],
+                        "description": "Read only the last N lines.",
+                    },
                 },
                 "additionalProperties": False,
-                "required": ["path"],
+                "required": [
+                    "path",
+                    "start_line",
+                    "end_line",
+                    "offset",
+                    "length",
+                    "tail",
+                ],
             },
         }
 
     @override
     def call(self, args: dict) -> str:
         path = args["path"]
+        size = os.path.getsize(path)
+
+        if args.get("tail") is not None:
+            if args["tail"] < 1:
+                raise Exception("`tail` must be at least 1.")
+            return self._tail(path, size, args["tail"])
+        if args.get("start_line") or args.get("end_line"):
+            return self._lines(path, size, args.get("start_line"), args.get("end_line"))
+        if args.get("offset") is not None or args.get("length") is not None:
+            return self._bytes(path, size, args.get("offset") or 0, args.get("length"))
+
+        if size <= self.max_bytes:
+            with open(path, "r") as f:
+                content = f.read()
+            return content
+
+        return self._bytes(path, size, 0, None)
+
+    def _bytes(self, path: str, size: int, offset: int, length: Optional[int]) -> str:
+        offset = max(0, min(offset, size))
+        length = self.max_bytes if length is None else max(0, length)
+        length = min(length, self.max_bytes, size - offset)
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+
+        header = f"[{path}: bytes {offset}-{offset + len(data)} of {size}"
+        index = line_indexes.cached(path)
+        if index:
+            header += f", {index.lines} lines"
+        return f"{header}]\n{_decode(data)}"
+
+    def _lines(
+        self, path: str, size: int, start: Optional[int], end: Optional[int]
+    ) -> str:
+        index = line_indexes.get(path)
+        start = max(1, start or 1)
+        end = min(end or index.lines, index.lines)
+
+        lines, read = [], 0
+        if start <= end:
+            offset, skip = index.offset(start)
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for _ in range(skip):
+                    f.readline()
+                position = f.tell()
+                for _ in range(start, end + 1):
+                    line = f.readline(self.max_bytes - read + 1)
+                    if not line or read + len(line) > self.max_bytes:
+                        break
+                    lines.append(line)
+                    read += len(line)
+
+        if start <= end and not lines:
+            # The first line alone exceeds the limit, page through it by bytes.
+            return self._bytes(path, size, position, None)
+
+        last = start + len(lines) - 1
+        header = f"[{path}: lines {start}-{last} of {index.lines}, {size} bytes"
+        if last < end:
+            header += f", truncated at {self.max_bytes} bytes"
+        return f"{header}]\n{_decode(b''.join(lines))}"
+
+    def _tail(self, path: str, size: int, count: int) -> str:
+        # Reads backwards in chunks until enough newlines are seen, so the tail of
+        # a huge file never requires a full scan.
+        data, position = b"", size
+        with open(path, "rb") as f:
+            while position > 0 and data.count(b"\n", 0, len(data) - 1) < count:
+                if len(data) >= self.max_bytes:
+                    break
+                step = min(CHUNK_SIZE, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+
+        content = b"".join(data.splitlines(keepends=True)[-count:])
+        truncated = len(content) > self.max_bytes
+        content = content[-self.max_bytes :]
+
+        # Counted after the cut, so the header matches what is returned.
+        header = f"[{path}: last {len(content.splitlines())} lines, {size} bytes"
+        index = line_indexes.cached(path)
+        if index:
+            header += f", {index.lines} lines"
+        if truncated:
+            header += f", truncated at {self.max_bytes} bytes"
+        return f"{header}]\n{_decode(content)}"
 
-        with open(path, "r") as f:
-            content = f.read()
 
-        return content
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
@@ -0,0 +1,404 @@
+import os, json, math, time, queue, atexit, logging, secrets, threading
+from enum import Enum
+from typing import Any, Optional
+from contextvars import ContextVar
+from pydantic import BaseModel
+
+__all__ = [
+    "Span",
+    "SpanStatus",
+    "Tracer",
+    "SpanProcessor",
+    "JsonlExporter",
+    "SpanSummary",
+    "SpanStats",
+    "Histogram",
+    "Counter",
+    "Meter",
+    "tracer",
+    "meter",
+    "span_summary",
+]
+
+Log = logging.getLogger("Tracer")
+
+TRACES_FILE = os.getenv("TRACES_FILE")
+"""
+Spans are appended to this JSONL file when set.
+"""
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+class SpanStatus(str, Enum):
+    UNSET = "UNSET"
+    OK = "OK"
+    ERROR = "ERROR"
+
+
+class Span:
+    """
+    A timed operation, modelled after OpenTelemetry spans. Used as a context
+    manager it becomes the parent of spans started inside it, including in
+    threads and tasks that copy the context.
+    """
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_time",
+        "end_time",
+        "attributes",
+        "status",
+        "token",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: Optional["Span"],
+        attributes: dict[str, Any],
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.attributes = attributes
+        self.status = SpanStatus.UNSET
+        self.token = None
+
+    @property
+    def duration(self) -> float:
+        """
+        Seconds from start to end, or until now while the span is open.
+        """
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException):
+        self.status = SpanStatus.ERROR
+        self.attributes["exception.type"] = type(exception).__name__
+        self.attributes["exception.message"] = str(exception)
+
+    def end(self):
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        if self.status == SpanStatus.UNSET:
+            self.status = SpanStatus.OK
+        self.tracer._end(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "duration": self.duration,
+            "status": {"status_code": self.status.value},
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self) -> "Span":
+        self.token = _current_span.set(self)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if value is not None:
+            self.record_exception(value)
+        _current_span.reset(self.token)
+        self.end()
+
+
+class SpanProcessor:
+
+    def on_end(self, span: Span):
+        pass
+
+    def flush(self):
+        pass
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to its processors.
+    """
+
+    def __init__(self):
+        self.processors: list[SpanProcessor] = []
+
+    def add_processor(self, processor: SpanProcessor):
+        self.processors.append(processor)
+
+    def span(self, name: str, **attributes) -> Span:
+        """
+        A span to use as a context manager, child of the current span.
+        """
+        return Span(self, name, _current_span.get(), attributes)
+
+    def start_span(
+        self, name: str, parent: Optional[Span] = None, **attributes
+    ) -> Span:
+        """
+        A span that is ended explicitly, for operations that start and end in
+        different callbacks. It doesn't become the current span.
+        """
+        return Span(self, name, parent or _current_span.get(), attributes)
+
+    @property
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def flush(self):
+        for processor in self.processors:
+            processor.flush()
+
+    def _end(self, span: Span):
+        for processor in self.processors:
+            try:
+                processor.on_end(span)
+            except Exception:
+                Log.exception(f"Span processor failed > {span.name}")
+
+
+class Histogram:
+    """
+    Log-bucketed histogram: values are counted in buckets 5% wide, so
+    percentiles are within 5% of the exact value at constant memory.
+    """
+
+    growth = 1.05
+    resolution = 1e-6
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, value: float):
+        index = math.ceil(
+            math.log(max(value, self.resolution) / self.resolution, self.growth)
+        )
+        with self.lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(p / 100 * self.count))
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= rank:
+                    value = self.resolution * self.growth**index
+                    return min(max(value, self.min), self.max)
+            return self.max
+
+
+class Counter:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.values: dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def add(self, amount: float = 1, **attributes):
+        key = tuple(sorted(attributes.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self) -> list[dict]:
+        with self.lock:
+            return [
+                {"attributes": dict(key), "value": value}
+                for key, value in self.values.items()
+            ]
+
+
+class Meter:
+    """
+    Named counters and histograms, created on first use.
+    """
+
+    def __init__(self):
+        self.counters: dict[str, Counter] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self.lock:
+            counter = self.counters.get(name)
+            if not counter:
+                counter = self.counters[name] = Counter(name)
+            return counter
+
+    def histogram(self, name: str) -> Histogram:
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if not histogram:
+                histogram = self.histograms[name] = Histogram()
+            return histogram
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        return {
+            "counters": {name: c.snapshot() for name, c in counters.items()},
+            "histograms": {
+                name: _stats(h).model_dump() for name, h in histograms.items()
+            },
+        }
+
+
+class SpanStats(BaseModel):
+    """
+    Durations are in seconds.
+    """
+
+    count: int = 0
+    errors: int = 0
+    mean: float = 0.0
+    p50: float = 0.0
+    p95: float = 0.0
+    p99: float = 0.0
+    max: float = 0.0
+
+
+class SpanSummary(SpanProcessor):
+    """
+    Keeps a duration histogram per span name in memory.
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, Histogram] = {}
+        self.errors: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def on_end(self, span: Span):
+        self.record(span.name, span.duration, span.status == SpanStatus.ERROR)
+
+    def record(self, name: str, duration: float, error: bool = False):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if not histogram:
+                histogram = self.histograms[name] = Histogram()
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        histogram.record(duration)
+
+    def summary(self) -> dict[str, SpanStats]:
+        with self.lock:
+            histograms = dict(self.histograms)
+            errors = dict(self.errors)
+        return {
+            name: _stats(histogram, errors.get(name, 0))
+            for name, histogram in sorted(histograms.items())
+        }
+
+
+class JsonlExporter(SpanProcessor):
+    """
+    Appends finished spans to a JSONL file, one object per line. Spans are
+    queued and written in batches by a background thread, at most
+    `flush_interval` seconds apart, so the threads ending them, e.g. the one
+    reading a stream, never wait on serialising or file I/O. Queued spans are
+    written at exit.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_batch: int = 512):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.spans = queue.SimpleQueue()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        threading.Thread(
+            target=self._write_loop, name="JsonlExporter", daemon=True
+        ).start()
+        atexit.register(self.flush)
+
+    def on_end(self, span: Span):
+        self.spans.put(span.to_dict())
+
+    def flush(self):
+        """
+        Blocks until the spans queued so far are written.
+        """
+        written = threading.Event()
+        self.spans.put(written)
+        written.wait()
+
+    # Mark: - Private
+
+    def _write_loop(self):
+        # The only thread writing to the file, so batches never interleave.
+        batch: list[dict] = []
+        deadline = 0.0
+        while True:
+            try:
+                timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                item = self.spans.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.max_batch:
+                    continue
+
+            self._write(batch)
+            batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _write(self, batch: list[dict]):
+        if not batch:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(
+                    "\n".join(json.dumps(span, default=str) for span in batch) + "\n"
+                )
+        except Exception:
+            Log.exception("Failed to write %d spans > %s", len(batch), self.path)
+
+
+def _stats(histogram: Histogram, errors: int = 0) -> SpanStats:
+    return SpanStats(
+        count=histogram.count,
+        errors=errors,
+        mean=histogram.sum / histogram.count if histogram.count else 0.0,
+        p50=histogram.percentile(50),
+        p95=histogram.percentile(95),
+        p99=histogram.percentile(99),
+        max=histogram.max,
+    )
+
+
+tracer = Tracer()
+meter = Meter()
+span_summary = SpanSummary()
+
+tracer.add_processor(span_summary)
+if TRACES_FILE:
+    tracer.add_processor(JsonlExporter(os.path.expanduser(TRACES_FILE)))
@@ -0,0 +1,363 @@
+import os, json, time, asyncio, hashlib, logging, threading
+from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import openai
+from openai import OpenAI, AsyncOpenAI
+from pydantic import BaseModel
+from .tracing import tracer
+
+__all__ = ["UploadCache", "UploadStats", "upload_cache"]
+
+Log = logging.getLogger("UploadCache")
+
+UPLOADS_FILE = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "terrarium",
+    "uploads.json",
+)
+
+
+class Upload(BaseModel):
+
+    file_id: str
+    size: int
+    uploaded_at: float
+    verified_at: float
+    expires_at: Optional[float] = None
+
+
+class UploadStats(BaseModel):
+
+    hits: int = 0
+    uploads: int = 0
+    reuploads: int = 0
+    """
+    Uploads of files whose previous upload had expired or was deleted.
+    """
+
+    coalesced: int = 0
+    """
+    Uploads that waited on an identical upload already in flight.
+    """
+
+
+class UploadCache:
+    """
+    Maps the SHA-256 of files to the ids they were uploaded as, persisted in
+    `~/.cache/terrarium/uploads.json`, so a file is only uploaded once per
+    OpenAI project. Cached ids are checked with the Files API at most every
+    `verify_after` seconds, and files that expired or were deleted are uploaded
+    again.
+    """
+
+    def __init__(
+        self,
+        path: str = UPLOADS_FILE,
+        verify_after: float = 60 * 60,
+        max_workers: int = 4,
+    ):
+        self.path = path
+        self.verify_after = verify_after
+        self.max_workers = max_workers
+        self.uploads: Optional[dict[str, dict[str, Upload]]] = None
+        self.changed: set[tuple[str, str]] = set()
+        """
+        Namespaces and digests changed since the file was last written.
+        """
+        self.in_flight: dict[str, Future] = {}
+        self.async_in_flight: dict[str, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self._stats = UploadStats()
+
+    @property
+    def stats(self) -> UploadStats:
+        with self.lock:
+            return self._stats.model_copy()
+
+    def upload(self, client: OpenAI, paths: list[str]) -> tuple[list[str], int]:
+        """
+        Returns the file ids of `paths`, uploading those not uploaded yet
+        concurrently, and the number of API requests made.
+        """
+        try:
+            if len(paths) <= 1:
+                results = [self._upload(client, path) for path in paths]
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(self.max_workers, len(paths)),
+                    thread_name_prefix="Upload",
+                ) as pool:
+                    results = list(pool.map(lambda p: self._upload(client, p), paths))
+        finally:
+            self._save()
+        return [file_id for file_id, _ in results], sum(r for _, r in results)
+
+    async def aupload(
+        self, client: AsyncOpenAI, paths: list[str]
+    ) -> tuple[list[str], int]:
+        try:
+            results = await asyncio.gather(*[self._aupload(client, p) for p in paths])
+        finally:
+            await asyncio.to_thread(self._save)
+        return [file_id for file_id, _ in results], sum(r for _, r in results)
+
+    def forget(self, client: OpenAI | AsyncOpenAI, file_ids: list[str]):
+        """
+        Drops cached uploads, e.g. after the API rejected their ids.
+        """
+        namespace = _namespace(client)
+        with self.lock:
+            uploads = self._load().get(namespace, {})
+            digests = [d for d, u in uploads.items() if u.file_id in file_ids]
+            for digest in digests:
+                del uploads[digest]
+            self._changed(namespace, digests)
+        self._save()
+
+    # Mark: - Private
+
+    def _upload(self, client: OpenAI, path: str) -> tuple[str, int]:
+        with tracer.span("upload", path=path) as span:
+            file_id, requests = self._upload_file(client, path)
+            span.set_attribute("requests", requests)
+            return file_id, requests
+
+    async def _aupload(self, client: AsyncOpenAI, path: str) -> tuple[str, int]:
+        with tracer.span("upload", path=path) as span:
+            file_id, requests = await self._aupload_file(client, path)
+            span.set_attribute("requests", requests)
+            return file_id, requests
+
+    def _upload_file(self, client: OpenAI, path: str) -> tuple[str, int]:
+        digest, size = _digest(path)
+        key = f"{_namespace(client)}:{digest}"
+        requests = 0
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future:
+                self._stats.coalesced += 1
+            else:
+                self.in_flight[key] = Future()
+
+        if future:
+            return future.result(), 0
+
+        future = self.in_flight[key]
+        try:
+            upload = self._lookup(client, digest)
+            if upload and self._is_stale(upload):
+                requests += 1
+                upload = self._verify(client, digest, upload)
+
+            if upload:
+                self._record("hits")
+            else:
+                requests += 1
+                with open(path, "rb") as file:
+                    # An open file is streamed by httpx instead of read at once.
+                    file_object = client.files.create(file=file, purpose="assistants")
+                upload = self._store(client, digest, size, file_object)
+        except BaseException as e:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.in_flight.pop(key, None)
+        future.set_result(upload.file_id)
+        return upload.file_id, requests
+
+    async def _aupload_file(self, client: AsyncOpenAI, path: str) -> tuple[str, int]:
+        digest, size = await asyncio.to_thread(_digest, path)
+        key = f"{_namespace(client)}:{digest}"
+        requests = 0
+
+        with self.lock:
+            future = self.async_in_flight.get(key)
+            if future:
+                self._stats.coalesced += 1
+            else:
+                self.async_in_flight[key] = asyncio.get_running_loop().create_future()
+
+        if future:
+            return await future, 0
+
+        future = self.async_in_flight[key]
+        try:
+            # Bookkeeping may read the cache file and wait for uploading
+            # threads, so it runs off the event loop.
+            upload = await asyncio.to_thread(self._lookup, client, digest)
+            if upload and self._is_stale(upload):
+                requests += 1
+                upload = await self._averify(client, digest, upload)
+
+            if upload:
+                self._record("hits")
+            else:
+                requests += 1
+                file = await asyncio.to_thread(open, path, "rb")
+                try:
+                    file_object = await client.files.create(
+                        file=file, purpose="assistants"
+                    )
+                finally:
+                    file.close()
+                upload = await asyncio.to_thread(
+                    self._store, client, digest, size, file_object
+                )
+        except BaseException as e:
+            with self.lock:
+                self.async_in_flight.pop(key, None)
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting.
+            raise
+
+        with self.lock:
+            self.async_in_flight.pop(key, None)
+        future.set_result(upload.file_id)
+        return upload.file_id, requests
+
+    def _lookup(self, client, digest: str) -> Optional[Upload]:
+        with self.lock:
+            upload = self._load().get(_namespace(client), {}).get(digest)
+
+        # Expiry is known upfront for files uploaded with `expires_after`.
+        if upload and upload.expires_at and upload.expires_at <= time.time():
+            self._expire(client, digest)
+            return None
+        return upload
+
+    def _is_stale(self, upload: Upload) -> bool:
+        return time.time() - upload.verified_at >= self.verify_after
+
+    def _verify(self, client: OpenAI, digest: str, upload: Upload) -> Optional[Upload]:
+        try:
+            client.files.retrieve(upload.file_id)
+        except openai.NotFoundError:
+            self._expire(client, digest)
+            return None
+        return self._verified(client, digest, upload)
+
+    async def _averify(
+        self, client: AsyncOpenAI, digest: str, upload: Upload
+    ) -> Optional[Upload]:
+        try:
+            await client.files.retrieve(upload.file_id)
+        except openai.NotFoundError:
+            await asyncio.to_thread(self._expire, client, digest)
+            return None
+        return await asyncio.to_thread(self._verified, client, digest, upload)
+
+    def _verified(self, client, digest: str, upload: Upload) -> Upload:
+        namespace = _namespace(client)
+        with self.lock:
+            upload.verified_at = time.time()
+            self._changed(namespace, [digest])
+        return upload
+
+    def _expire(self, client, digest: str):
+        namespace = _namespace(client)
+        with self.lock:
+            if self._load().get(namespace, {}).pop(digest, None):
+                self._stats.reuploads += 1
+                self._changed(namespace, [digest])
+        Log.info("Upload of %s expired, uploading again.", digest[:12])
+
+    def _store(self, client, digest: str, size: int, file_object) -> Upload:
+        now = time.time()
+        upload = Upload(
+            file_id=file_object.id,
+            size=size,
+            uploaded_at=now,
+            verified_at=now,
+            expires_at=getattr(file_object, "expires_at", None),
+        )
+        namespace = _namespace(client)
+        with self.lock:
+            self._load().setdefault(namespace, {})[digest] = upload
+            self._stats.uploads += 1
+            self._changed(namespace, [digest])
+        Log.info("Uploaded %d bytes > %s", size, upload.file_id)
+        return upload
+
+    def _record(self, outcome: str):
+        with self.lock:
+            setattr(self._stats, outcome, getattr(self._stats, outcome) + 1)
+
+    def _load(self) -> dict[str, dict[str, Upload]]:
+        # Must be called with self.lock held.
+        if self.uploads is None:
+            self.uploads = self._read()
+        return self.uploads
+
+    def _read(self) -> dict[str, dict[str, Upload]]:
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            return {
+                namespace: {d: Upload.model_validate(u) for d, u in uploads.items()}
+                for namespace, uploads in data.items()
+            }
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            Log.error("Failed to read %s, starting afresh.", self.path)
+            return {}
+
+    def _changed(self, namespace: str, digests: list[str]):
+        # Must be called with self.lock held. Written by the next `_save`, once
+        # for all the files of a message.
+        self.changed.update((namespace, digest) for digest in digests)
+
+    def _save(self):
+        # Changed entries are merged into the file as it is now, so other
+        # processes' uploads aren't lost. The file is read and written outside
+        # self.lock, which uploads on event loops wait for too.
+        with self.save_lock:
+            with self.lock:
+                if not self.changed:
+                    return
+                changed, self.changed = self.changed, set()
+
+            data = self._read()
+            with self.lock:
+                # Entries changed meanwhile are kept as well, and written again
+                # by the next save.
+                for namespace, digest in changed | self.changed:
+                    upload = self.uploads.get(namespace, {}).get(digest)
+                    merged = data.setdefault(namespace, {})
+                    if upload:
+                        merged[digest] = upload
+                    else:
+                        merged.pop(digest, None)
+                self.uploads = data
+                content = json.dumps(
+                    {
+                        namespace: {d: u.model_dump() for d, u in uploads.items()}
+                        for namespace, uploads in data.items()
+                    }
+                )
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "w") as file:
+                file.write(content)
+            os.replace(temporary, self.path)
+
+
+def _digest(path: str) -> tuple[str, int]:
+    with open(path, "rb") as file:
+        digest = hashlib.file_digest(file, "sha256")
+        return digest.hexdigest(), file.tell()
+
+
+def _namespace(client: OpenAI | AsyncOpenAI) -> str:
+    # File ids are only valid within the project of the API key.
+    key = f"{client.base_url}|{client.organization}|{client.project}|{client.api_key}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+upload_cache = UploadCache()